@@ -10,6 +10,8 @@ from datetime import timedelta
 from pathlib import Path
 from typing import Any, Optional, Type
 
+from sqlalchemy.pool import StaticPool
+
 logger = logging.getLogger(__name__)
 
 
@@ -34,6 +36,10 @@ class BaseConfig:
     }
     SQLALCHEMY_RECORD_QUERIES = True
     SQLALCHEMY_SLOW_QUERY_THRESHOLD = 0.5
+    # WAL with synchronous=NORMAL can lose the last commits on power loss
+    SQLITE_PERFORMANCE_PRAGMAS = (
+        os.getenv("SQLITE_PERFORMANCE_PRAGMAS", "false").lower() == "true"
+    )
     WTF_CSRF_ENABLED = True
     WTF_CSRF_TIME_LIMIT = 3600
     SESSION_COOKIE_SECURE = True
@@ -240,9 +246,11 @@ class TestingConfig(BaseConfig):
     DEBUG = True
     TESTING = True
     ENV = "testing"
-    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    # One in-memory database shared by every connection and thread in the run
+    SQLALCHEMY_DATABASE_URI = "sqlite://"
     SQLALCHEMY_ENGINE_OPTIONS = {
-        "pool_pre_ping": True,
+        "poolclass": StaticPool,
+        "connect_args": {"check_same_thread": False},
     }
     WTF_CSRF_ENABLED = False
     SESSION_COOKIE_SECURE = False
@@ -25,6 +25,7 @@ from src.routes.compliance import compliance_bp
 from src.routes.market import market_bp
 from src.routes.trading import trading_bp
 from src.routes.user import user_bp
+from src.utils import DatabaseOptimizer, PaginationOffsetError, clear_request_cache
 
 logging.basicConfig(
     level=logging.INFO,
@@ -106,6 +107,11 @@ def create_app(config_name: Optional[str] = None) -> Flask:
             logger.info(f"Response: {response.status_code} in {duration:.2f}ms")
         return response
 
+    @app.teardown_request
+    def drop_request_cache(error):
+        # g outlives the request when an app context was already pushed
+        clear_request_cache()
+
     @app.errorhandler(400)
     def bad_request(error):
         return (
@@ -119,6 +125,19 @@ def create_app(config_name: Optional[str] = None) -> Flask:
             400,
         )
 
+    @app.errorhandler(PaginationOffsetError)
+    def pagination_offset_exceeded(error):
+        return (
+            jsonify(
+                {
+                    "error": "Bad Request",
+                    "message": str(error),
+                    "status_code": 400,
+                }
+            ),
+            400,
+        )
+
     @app.errorhandler(401)
     def unauthorized(error):
         return (
@@ -270,6 +289,8 @@ def create_app(config_name: Optional[str] = None) -> Flask:
                 )
 
     with app.app_context():
+        if app.config.get("SQLITE_PERFORMANCE_PRAGMAS"):
+            DatabaseOptimizer.apply_sqlite_pragmas(db.engine)
         try:
             db.create_all()
             logger.info("Database tables created successfully")
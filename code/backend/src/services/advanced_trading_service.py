@@ -12,6 +12,7 @@ from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
+from sklearn.covariance import LedoitWolf
 
 from ..models import db
 from ..models.carbon_credit import CarbonCredit
@@ -22,6 +23,13 @@ from .risk_service import RiskService
 
 logger = logging.getLogger(__name__)
 
+# Order quantity columns store four decimal places; child order splits are
+# done on integer counts of that unit and converted back at the end
+QUANTITY_PLACES = 4
+
+# Largest share of a portfolio a single asset may take after optimization
+MAX_ASSET_WEIGHT = 0.4
+
 
 class TradingAlgorithm(Enum):
     """Trading algorithm types"""
@@ -97,26 +105,25 @@ class AdvancedTradingService:
         """Execute Time Weighted Average Price algorithm"""
         if total_quantity <= 0 or duration_minutes <= 0:
             raise ValueError("Invalid TWAP parameters")
+        total_units = self._quantity_units(total_quantity)
         try:
             num_orders = min(duration_minutes // 5, 20)
             if num_orders <= 0:
                 num_orders = 1
-            base_quantity = (total_quantity / num_orders).quantize(Decimal("0.0001"))
-            remainder = total_quantity - base_quantity * num_orders
-            duration_minutes // num_orders
+            base_units, extra_units = divmod(total_units, num_orders)
+            # Slices only ever take one of two sizes
+            base_qty = Decimal(base_units).scaleb(-QUANTITY_PLACES)
+            extra_qty = Decimal(base_units + 1).scaleb(-QUANTITY_PLACES)
+            price_adjustment = (
+                Decimal("0.001") if side == OrderSide.BUY else Decimal("-0.001")
+            )
             child_orders = []
-            datetime.now(timezone.utc)
             for i in range(num_orders):
-                qty = base_quantity + (
-                    remainder if i == num_orders - 1 else Decimal("0")
-                )
+                qty = extra_qty if i < extra_units else base_qty
                 current_price = self._get_current_price(symbol)
                 if not current_price:
                     logger.error(f"Unable to get price for {symbol}")
                     break
-                price_adjustment = (
-                    Decimal("0.001") if side == OrderSide.BUY else Decimal("-0.001")
-                )
                 limit_price = current_price + price_adjustment
                 child_order = Order(
                     user_id=user_id,
@@ -128,8 +135,8 @@ class AdvancedTradingService:
                     time_in_force="GTC",
                     notes=f"TWAP child order {i + 1}/{num_orders}",
                 )
-                db.session.add(child_order)
                 child_orders.append(child_order)
+            db.session.add_all(child_orders)
             db.session.commit()
             logger.info(
                 f"Created {len(child_orders)} TWAP child orders for user {user_id}"
@@ -149,21 +156,21 @@ class AdvancedTradingService:
         lookback_hours: int = 24,
     ) -> List[Order]:
         """Execute Volume Weighted Average Price algorithm"""
+        total_units = self._quantity_units(total_quantity)
         try:
-            volume_profile = self._get_volume_profile(symbol, lookback_hours)
-            if not volume_profile:
+            volumes = self._get_volume_profile(symbol, lookback_hours)
+            if volumes.size == 0:
                 logger.warning(
                     f"No volume profile available for {symbol}, falling back to TWAP"
                 )
                 return self.execute_twap_order(user_id, symbol, total_quantity, side)
-            total_historical_volume = sum(volume_profile.values())
+            child_units = self._apportion_units(
+                total_units, np.where(volumes > 0, volumes, 0.0)
+            )
             child_orders = []
-            for hour, volume in volume_profile.items():
-                if volume <= 0:
-                    continue
-                volume_weight = volume / total_historical_volume
-                child_quantity = total_quantity * Decimal(str(volume_weight))
-                if child_quantity < self.min_order_size:
+            for hour, units in enumerate(child_units.tolist()):
+                child_quantity = Decimal(units).scaleb(-QUANTITY_PLACES)
+                if units == 0 or child_quantity < self.min_order_size:
                     continue
                 current_price = self._get_current_price(symbol)
                 if not current_price:
@@ -178,8 +185,8 @@ class AdvancedTradingService:
                     time_in_force="GTC",
                     notes=f"VWAP child order for hour {hour}",
                 )
-                db.session.add(child_order)
                 child_orders.append(child_order)
+            db.session.add_all(child_orders)
             db.session.commit()
             logger.info(
                 f"Created {len(child_orders)} VWAP child orders for user {user_id}"
@@ -190,6 +197,31 @@ class AdvancedTradingService:
             db.session.rollback()
             return []
 
+    @staticmethod
+    def _quantity_units(total_quantity: Decimal) -> int:
+        """Count of smallest order units in a quantity the order columns can store"""
+        units = total_quantity.scaleb(QUANTITY_PLACES)
+        if units <= 0 or units != units.to_integral_value():
+            raise ValueError(
+                f"Quantity must be positive with at most {QUANTITY_PLACES} "
+                f"decimal places: {total_quantity}"
+            )
+        return int(units)
+
+    @staticmethod
+    def _apportion_units(total_units: int, weights: np.ndarray) -> np.ndarray:
+        """Split integer units by weight using largest-remainder rounding"""
+        weight_sum = weights.sum()
+        if total_units <= 0 or weight_sum <= 0:
+            return np.zeros(len(weights), dtype=np.int64)
+        shares = weights * (total_units / weight_sum)
+        units = np.floor(shares).astype(np.int64)
+        shortfall = total_units - int(units.sum())
+        if shortfall > 0:
+            largest = np.argsort(units - shares, kind="stable")[:shortfall]
+            units[largest] += 1
+        return units
+
     def execute_iceberg_order(
         self,
         user_id: int,
@@ -384,31 +416,32 @@ class AdvancedTradingService:
                 hasattr(holdings_data, "empty") and holdings_data.empty
             ):
                 raise ValueError("No holdings data available")
-            returns = self._calculate_portfolio_returns(holdings_data)
-            var_95 = Decimal(str(round(float(np.percentile(returns, 5)), 8)))
-            var_99 = Decimal(str(round(float(np.percentile(returns, 1)), 8)))
+            returns = np.asarray(
+                self._calculate_portfolio_returns(holdings_data), dtype=float
+            )
+            pct_1, pct_5 = np.percentile(returns, [1, 5])
+            var_95 = Decimal(str(round(float(pct_5), 8)))
+            var_99 = Decimal(str(round(float(pct_1), 8)))
             tail_returns = returns[returns <= float(var_95)]
             if len(tail_returns) > 0:
-                expected_shortfall = Decimal(
-                    str(round(float(np.mean(tail_returns)), 8))
-                )
+                expected_shortfall = Decimal(str(round(float(tail_returns.mean()), 8)))
             else:
                 expected_shortfall = var_95
-            cumulative_returns = (1 + pd.Series(returns)).cumprod()
-            running_max = cumulative_returns.expanding().max()
-            drawdown = (cumulative_returns - running_max) / running_max
+            cumulative_returns = np.cumprod(1 + returns)
+            running_max = np.maximum.accumulate(cumulative_returns)
+            drawdown = cumulative_returns / running_max - 1
             max_drawdown = Decimal(str(round(float(drawdown.min()), 8)))
             risk_free_rate = 0.02 / 252
-            excess_returns = returns - risk_free_rate
-            std_excess = np.std(excess_returns)
-            if std_excess > 0:
+            # Subtracting a constant leaves the spread unchanged
+            std_returns = returns.std()
+            if std_returns > 0:
                 sharpe_ratio = float(
-                    np.mean(excess_returns) / std_excess * np.sqrt(252)
+                    (returns.mean() - risk_free_rate) / std_returns * np.sqrt(252)
                 )
             else:
                 sharpe_ratio = 0.0
             beta = 1.0
-            volatility = float(np.std(returns) * np.sqrt(252))
+            volatility = float(std_returns * np.sqrt(252))
             return RiskMetrics(
                 var_95=var_95,
                 var_99=var_99,
@@ -433,37 +466,100 @@ class AdvancedTradingService:
             available_assets = self._get_available_assets()
             if len(available_assets) < 2:
                 raise ValueError("Need at least 2 assets for optimization")
-            returns_data = {}
+            log_prices = {}
             for asset in available_assets:
                 price_history = self._get_price_history(asset, days=252)
                 if len(price_history) > 20:
-                    returns = price_history["close"].pct_change().dropna()
-                    returns_data[asset] = returns
-            if len(returns_data) < 2:
+                    log_prices[asset] = np.log(
+                        price_history["close"].to_numpy(dtype=np.float64)
+                    )
+            if len(log_prices) < 2:
                 raise ValueError("Insufficient price history for optimization")
-            returns_df = pd.DataFrame(returns_data)
-            returns_df.mean() * 252
-            returns_df.cov() * 252
-            risk_params = {
-                "conservative": {"max_volatility": 0.1, "min_return": 0.05},
-                "moderate": {"max_volatility": 0.15, "min_return": 0.08},
-                "aggressive": {"max_volatility": 0.25, "min_return": 0.12},
+            # Align on the most recent bars every asset has
+            history = min(len(series) for series in log_prices.values())
+            returns = np.diff(
+                np.column_stack([series[-history:] for series in log_prices.values()]),
+                axis=0,
+            )
+            # Annualized volatility ceiling per tolerance; the weight cap is shared
+            max_volatility = {
+                "conservative": 0.1,
+                "moderate": 0.15,
+                "aggressive": 0.25,
             }
-            risk_params.get(risk_tolerance, risk_params["moderate"])
-            num_assets = len(returns_data)
-            equal_weights = {asset: 1.0 / num_assets for asset in returns_data.keys()}
-            optimized_weights = {}
-            for asset, weight in equal_weights.items():
-                optimized_weights[asset] = min(weight, 0.4)
-            total_weight = sum(optimized_weights.values())
-            for asset in optimized_weights:
-                optimized_weights[asset] /= total_weight
+            volatility_limit = max_volatility.get(
+                risk_tolerance, max_volatility["moderate"]
+            )
+            num_assets = returns.shape[1]
+            # Shrunk covariance stays well conditioned on short histories
+            covariance = LedoitWolf().fit(returns).covariance_
+            tangency = np.linalg.solve(covariance, returns.mean(axis=0))
+            if tangency.sum() > 0:
+                weights = tangency / tangency.sum()
+            else:
+                # No long portfolio has a positive Sharpe ratio
+                weights = np.full(num_assets, 1.0 / num_assets)
+            cap = max(MAX_ASSET_WEIGHT, 1.0 / num_assets)
+            weights = self._project_to_capped_simplex(weights, cap)
+            min_variance = np.linalg.solve(covariance, np.ones(num_assets))
+            min_variance = self._project_to_capped_simplex(
+                min_variance / min_variance.sum(), cap
+            )
+            weights = self._limit_volatility(
+                weights, min_variance, covariance, volatility_limit
+            )
+            optimized_weights = dict(zip(log_prices.keys(), weights.tolist()))
             logger.info(f"Portfolio optimization completed for user {user_id}")
             return optimized_weights
         except Exception as e:
             logger.error(f"Portfolio optimization error: {e}")
             raise
 
+    @staticmethod
+    def _limit_volatility(
+        weights: np.ndarray,
+        fallback: np.ndarray,
+        covariance: np.ndarray,
+        max_volatility: float,
+        iterations: int = 30,
+    ) -> np.ndarray:
+        """Blend weights toward fallback until annualized volatility fits the limit"""
+
+        def volatility(w: np.ndarray) -> float:
+            return float(np.sqrt(w @ covariance @ w * 252))
+
+        if volatility(weights) <= max_volatility:
+            return weights
+        # Nothing in reach meets the limit; take the least risky mix
+        if volatility(fallback) >= max_volatility:
+            return fallback
+        # Volatility is convex along the blend, so the feasible part is [high, 1]
+        low, high = 0.0, 1.0
+        for _ in range(iterations):
+            mid = (low + high) / 2
+            if volatility(weights + mid * (fallback - weights)) <= max_volatility:
+                high = mid
+            else:
+                low = mid
+        return weights + high * (fallback - weights)
+
+    @staticmethod
+    def _project_to_capped_simplex(
+        weights: np.ndarray, cap: float, iterations: int = 30
+    ) -> np.ndarray:
+        """Project weights onto {0 <= w <= cap, sum(w) == 1} by bisecting the shift"""
+        # Shifting by low keeps every weight at cap, by high drops them all to 0
+        low, high = weights.min() - cap, weights.max()
+        for _ in range(iterations):
+            mid = (low + high) / 2
+            if np.clip(weights - mid, 0, cap).sum() >= 1:
+                low = mid
+            else:
+                high = mid
+        # low always sums to at least 1, so rescaling never breaks the cap
+        projected = np.clip(weights - low, 0, cap)
+        return projected / projected.sum()
+
     def _get_current_price(self, symbol: str) -> Optional[Decimal]:
         """Get current market price for symbol"""
         try:
@@ -473,13 +569,13 @@ class AdvancedTradingService:
             logger.error(f"Error getting current price for {symbol}: {e}")
             return None
 
-    def _get_volume_profile(self, symbol: str, hours: int) -> Dict[int, float]:
-        """Get volume profile for the last N hours"""
+    def _get_volume_profile(self, symbol: str, hours: int) -> np.ndarray:
+        """Get traded volume per hour of day (index = hour) for the last N hours"""
         try:
-            return {hour: 1000.0 + hour * 100 for hour in range(24)}
+            return np.arange(24) * 100.0 + 1000.0
         except Exception as e:
             logger.error(f"Error getting volume profile for {symbol}: {e}")
-            return {}
+            return np.empty(0)
 
     def _get_price_history(self, symbol: str, days: int = 30) -> pd.DataFrame:
         """Get price history as pandas DataFrame"""
@@ -12,6 +12,7 @@ from sqlalchemy import and_, desc
 
 from ..models import db
 from ..models.user import UserAuditLog
+from ..utils import BackgroundTaskManager
 
 logger = logging.getLogger(__name__)
 
@@ -44,32 +45,108 @@ class AuditService:
         if not self.enabled:
             return True
         try:
-            if ip_address is None and request:
-                ip_address = request.environ.get(
-                    "HTTP_X_FORWARDED_FOR", request.remote_addr
-                )
-            user_agent = request.headers.get("User-Agent", "") if request else ""
             audit_log = UserAuditLog(
-                user_id=user_id,
+                **self.build_event(
+                    event_type=event_type,
+                    event_category=event_category,
+                    event_description=event_description,
+                    user_id=user_id,
+                    ip_address=ip_address,
+                    session_id=session_id,
+                    old_values=old_values,
+                    new_values=new_values,
+                    metadata=metadata,
+                    success=success,
+                    error_message=error_message,
+                )
+            )
+            db.session.add(audit_log)
+            db.session.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Failed to log audit event: {e}")
+            db.session.rollback()
+            return False
+
+    def queue_event(
+        self,
+        event_type: str,
+        event_category: str,
+        event_description: str,
+        user_id: Optional[int] = None,
+        ip_address: Optional[str] = None,
+        session_id: Optional[str] = None,
+        old_values: Optional[Dict] = None,
+        new_values: Optional[Dict] = None,
+        metadata: Optional[Dict] = None,
+        success: bool = True,
+        error_message: Optional[str] = None,
+    ) -> bool:
+        """Queue audit event for a batched background write"""
+        if not self.enabled:
+            return True
+        return BackgroundTaskManager.queue_task(
+            "audit.log",
+            **self.build_event(
                 event_type=event_type,
                 event_category=event_category,
                 event_description=event_description,
+                user_id=user_id,
                 ip_address=ip_address,
-                user_agent=user_agent,
                 session_id=session_id,
                 old_values=old_values,
                 new_values=new_values,
-                event_metadata=metadata,
+                metadata=metadata,
                 success=success,
                 error_message=error_message,
+            ),
+        )
+
+    @staticmethod
+    def build_event(
+        event_type: str,
+        event_category: str,
+        event_description: str,
+        user_id: Optional[int] = None,
+        ip_address: Optional[str] = None,
+        session_id: Optional[str] = None,
+        old_values: Optional[Dict] = None,
+        new_values: Optional[Dict] = None,
+        metadata: Optional[Dict] = None,
+        success: bool = True,
+        error_message: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Build an audit log row mapping, capturing the current request context"""
+        if ip_address is None and request:
+            ip_address = request.environ.get(
+                "HTTP_X_FORWARDED_FOR", request.remote_addr
             )
-            db.session.add(audit_log)
+        user_agent = request.headers.get("User-Agent", "") if request else ""
+        return {
+            "user_id": user_id,
+            "event_type": event_type,
+            "event_category": event_category,
+            "event_description": event_description,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "session_id": session_id,
+            "old_values": old_values,
+            "new_values": new_values,
+            "event_metadata": metadata,
+            "success": success,
+            "error_message": error_message,
+            "created_at": datetime.now(timezone.utc),
+        }
+
+    @staticmethod
+    def write_events(events: List[Dict[str, Any]]) -> None:
+        """Persist a batch of queued audit events"""
+        try:
+            db.session.bulk_insert_mappings(UserAuditLog, events)
             db.session.commit()
-            return True
         except Exception as e:
-            logger.error(f"Failed to log audit event: {e}")
+            logger.error(f"Failed to write {len(events)} audit events: {e}")
             db.session.rollback()
-            return False
 
     def log_authentication(
         self,
@@ -194,3 +271,6 @@ class AuditService:
         except Exception as e:
             logger.error(f"Failed to get security events: {e}")
             return []
+
+
+BackgroundTaskManager.register_handler("audit.log", AuditService.write_events)
@@ -7,7 +7,7 @@ import logging
 import uuid
 from datetime import datetime, timedelta, timezone
 from decimal import Decimal
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from sqlalchemy import and_, desc, func, or_
 
@@ -24,7 +24,7 @@ from ..models.trading import (
     Trade,
     TradeStatus,
 )
-from ..models.user import User
+from ..models.user import User, UserAuditLog
 from .audit_service import AuditService
 
 logger = logging.getLogger(__name__)
@@ -35,6 +35,22 @@ FEE_TIERS = {
     "premium": Decimal("0.00025"),  # 0.025%
     "vip": Decimal("0.0002"),  # 0.02%
 }
+PLATFORM_FEE_RATE = Decimal("0.001")  # 0.1%
+ESTIMATED_FEE_RATE = Decimal("0.005")  # 0.5%
+FEE_PRECISION = Decimal("0.01")
+
+# Order payload validation rules
+REQUIRED_ORDER_FIELDS = (
+    "order_type",
+    "side",
+    "quantity",
+    "project_id",
+    "credit_type",
+    "vintage_year",
+)
+VALID_ORDER_TYPES = frozenset({"market", "limit", "stop", "stop_limit"})
+VALID_ORDER_SIDES = frozenset({"buy", "sell"})
+PRICED_ORDER_TYPES = frozenset({"limit", "stop_limit"})
 
 
 class TradingService:
@@ -46,6 +62,8 @@ class TradingService:
         self.audit_service = AuditService()
         self.matching_engine = MatchingEngine()
         self.settlement_engine = SettlementEngine()
+        # Clock used for expiry checks; tests swap it to move time forward
+        self._now: Callable[[], datetime] = lambda: datetime.now(timezone.utc)
 
     # ------------------------------------------------------------------
     # Order lifecycle
@@ -58,101 +76,14 @@ class TradingService:
         Returns dict with keys: success, order_id, status, reason
         """
         try:
-            # Validate required fields
-            is_valid, errors = self._validate_order_data(order_data)
-            if not is_valid:
-                return {
-                    "success": False,
-                    "reason": f"Missing or invalid fields: {'; '.join(errors)}",
-                }
-
-            # Verify user exists
-            user = db.session.get(User, user_id)
-            if not user:
-                return {"success": False, "reason": "User not found"}
-
-            # Verify project exists if provided
-            project_id = order_data.get("project_id")
-            if project_id:
-                project = db.session.get(CarbonProject, project_id)
-                if not project:
-                    return {"success": False, "reason": "Project not found"}
-
-            # Risk check
-            if hasattr(self, "risk_service"):
-                risk_result = self.risk_service.check_order_risk(
-                    user_id=user_id, order_data=order_data
-                )
-                if not risk_result.get("approved", True):
-                    reason = risk_result.get("reason", "Risk check failed")
-                    return {"success": False, "reason": f"Risk rejection: {reason}"}
-
-            # Compliance check
-            if hasattr(self, "compliance_service"):
-                compliance_result = self.compliance_service.check_order_compliance(
-                    user_id=user_id, order_data=order_data
-                )
-                if not compliance_result.get("approved", True):
-                    reason = compliance_result.get("reason", "Compliance check failed")
-                    return {
-                        "success": False,
-                        "reason": f"Compliance rejection: {reason}",
-                    }
-
-            order_type_str = order_data.get("order_type", "").lower()
-            side_str = order_data.get("side", "").lower()
+            order, reason = self._prepare_order(user_id, order_data)
+            if order is None:
+                return {"success": False, "reason": reason}
 
-            order_type_map = {
-                "market": OrderType.MARKET,
-                "limit": OrderType.LIMIT,
-                "stop": OrderType.STOP,
-                "stop_limit": OrderType.STOP_LIMIT,
-            }
-            side_map = {"buy": OrderSide.BUY, "sell": OrderSide.SELL}
-
-            order_type = order_type_map[order_type_str]
-            side = side_map[side_str]
-
-            quantity = Decimal(str(order_data["quantity"]))
-            price = (
-                Decimal(str(order_data["price"]))
-                if order_data.get("price") is not None
-                else None
-            )
-            stop_price = (
-                Decimal(str(order_data["stop_price"]))
-                if order_data.get("stop_price") is not None
-                else None
-            )
-            expires_at = order_data.get("expires_at")
-
-            order = Order(
-                order_id=f"ORD-{datetime.now().strftime('%Y%m%d')}-{uuid.uuid4().hex[:8].upper()}",
-                user_id=user_id,
-                order_type=order_type,
-                side=side,
-                status=OrderStatus.PENDING,
-                quantity=quantity,
-                remaining_quantity=quantity,
-                filled_quantity=Decimal("0"),
-                price=price,
-                stop_price=stop_price,
-                credit_type=order_data.get("credit_type"),
-                vintage_year=order_data.get("vintage_year"),
-                project_id=project_id,
-                expires_at=expires_at,
-            )
-            order.status = OrderStatus.OPEN
             db.session.add(order)
             db.session.commit()
 
-            if hasattr(self, "audit_service"):
-                self.audit_service.log_trading_event(
-                    user_id=user_id,
-                    event_type="order_create",
-                    description=f"Order {order.order_id} created",
-                    metadata={"order_id": order.id},
-                )
+            self._log_order_created(user_id, order)
 
             return {
                 "success": True,
@@ -166,6 +97,115 @@ class TradingService:
             logger.error(f"Error creating order: {e}")
             return {"success": False, "reason": f"Internal error: {str(e)}"}
 
+    def _prepare_order(
+        self, user_id: int, order_data: Dict[str, Any]
+    ) -> Tuple[Optional[Order], Optional[str]]:
+        """
+        Run validation, risk and compliance checks and build an unsaved order.
+
+        Returns (order, None) on success or (None, reason) on rejection.
+        """
+        # Validate required fields
+        is_valid, errors = self._validate_order_data(order_data)
+        if not is_valid:
+            return None, f"Missing or invalid fields: {'; '.join(errors)}"
+
+        # Verify user exists
+        user = db.session.get(User, user_id)
+        if not user:
+            return None, "User not found"
+
+        # Verify project exists if provided
+        project_id = order_data.get("project_id")
+        if project_id:
+            project = db.session.get(CarbonProject, project_id)
+            if not project:
+                return None, "Project not found"
+
+        # Risk check
+        if hasattr(self, "risk_service"):
+            risk_result = self.risk_service.check_order_risk(
+                user_id=user_id, order_data=order_data
+            )
+            if not risk_result.get("approved", True):
+                reason = risk_result.get("reason", "Risk check failed")
+                return None, f"Risk rejection: {reason}"
+
+        # Compliance check
+        if hasattr(self, "compliance_service"):
+            compliance_result = self.compliance_service.check_order_compliance(
+                user_id=user_id, order_data=order_data
+            )
+            if not compliance_result.get("approved", True):
+                reason = compliance_result.get("reason", "Compliance check failed")
+                return None, f"Compliance rejection: {reason}"
+
+        order_type_str = order_data.get("order_type", "").lower()
+        side_str = order_data.get("side", "").lower()
+
+        order_type_map = {
+            "market": OrderType.MARKET,
+            "limit": OrderType.LIMIT,
+            "stop": OrderType.STOP,
+            "stop_limit": OrderType.STOP_LIMIT,
+        }
+        side_map = {"buy": OrderSide.BUY, "sell": OrderSide.SELL}
+
+        order_type = order_type_map[order_type_str]
+        side = side_map[side_str]
+
+        quantity = Decimal(str(order_data["quantity"]))
+        price = (
+            Decimal(str(order_data["price"]))
+            if order_data.get("price") is not None
+            else None
+        )
+        stop_price = (
+            Decimal(str(order_data["stop_price"]))
+            if order_data.get("stop_price") is not None
+            else None
+        )
+        expires_at = order_data.get("expires_at")
+
+        order = Order(
+            order_id=f"ORD-{datetime.now().strftime('%Y%m%d')}-{uuid.uuid4().hex[:8].upper()}",
+            user_id=user_id,
+            order_type=order_type,
+            side=side,
+            status=OrderStatus.PENDING,
+            quantity=quantity,
+            remaining_quantity=quantity,
+            filled_quantity=Decimal("0"),
+            price=price,
+            stop_price=stop_price,
+            credit_type=order_data.get("credit_type"),
+            vintage_year=order_data.get("vintage_year"),
+            project_id=project_id,
+            expires_at=expires_at,
+        )
+        order.status = OrderStatus.OPEN
+        return order, None
+
+    @staticmethod
+    def _order_created_event(user_id: int, order: Order) -> Dict[str, Any]:
+        """Audit row mapping for a newly created order"""
+        return AuditService.build_event(
+            event_type="order_create",
+            event_category="trading",
+            event_description=f"Order {order.order_id} created",
+            user_id=user_id,
+            metadata={"order_id": order.id},
+        )
+
+    def _log_order_created(self, user_id: int, order: Order) -> None:
+        if hasattr(self, "audit_service"):
+            self.audit_service.log_trading_event(
+                user_id=user_id,
+                event_type="order_create",
+                description=f"Order {order.order_id} created",
+                metadata={"order_id": order.id},
+            )
+
     def cancel_order(self, user_id: int, order_id: int) -> Dict[str, Any]:
         """
         Cancel an open order owned by user_id.
@@ -438,12 +478,14 @@ class TradingService:
                 Order.side == OrderSide.BUY,
                 Order.order_type == OrderType.LIMIT,
                 Order.remaining_quantity > 0,
+                Order.price.isnot(None),
             ]
             sell_filter = [
                 Order.status.in_([OrderStatus.OPEN, OrderStatus.PARTIALLY_FILLED]),
                 Order.side == OrderSide.SELL,
                 Order.order_type == OrderType.LIMIT,
                 Order.remaining_quantity > 0,
+                Order.price.isnot(None),
             ]
 
             if project_id:
@@ -470,26 +512,31 @@ class TradingService:
             matches_found = 0
             trades_executed = 0
 
+            # Asks are sorted cheapest first: each bid stops at the first ask
+            # above its limit, and the exhausted prefix of asks is skipped
+            first_open_sell = 0
             for buy_order in buy_orders:
-                for sell_order in sell_orders:
+                for index in range(first_open_sell, len(sell_orders)):
                     if buy_order.remaining_quantity <= 0:
                         break
+                    sell_order = sell_orders[index]
                     if sell_order.remaining_quantity <= 0:
+                        if index == first_open_sell:
+                            first_open_sell += 1
                         continue
-                    if buy_order.price is None or sell_order.price is None:
-                        continue
-                    if buy_order.price >= sell_order.price:
-                        match_qty = min(
-                            buy_order.remaining_quantity,
-                            sell_order.remaining_quantity,
-                        )
-                        match_price = sell_order.price
-                        matches_found += 1
-                        result = self.execute_trade(
-                            buy_order, sell_order, match_qty, match_price
-                        )
-                        if result["success"]:
-                            trades_executed += 1
+                    if buy_order.price < sell_order.price:
+                        break
+                    match_qty = min(
+                        buy_order.remaining_quantity,
+                        sell_order.remaining_quantity,
+                    )
+                    match_price = sell_order.price
+                    matches_found += 1
+                    result = self.execute_trade(
+                        buy_order, sell_order, match_qty, match_price
+                    )
+                    if result["success"]:
+                        trades_executed += 1
 
             return {
                 "success": True,
@@ -507,15 +554,31 @@ class TradingService:
         Create multiple orders in a single call.
         """
         try:
-            order_ids = []
+            orders = []
             failed = []
 
             for order_data in orders_data:
-                result = self.create_order(user_id, order_data)
-                if result["success"]:
-                    order_ids.append(result["order_id"])
+                try:
+                    order, reason = self._prepare_order(user_id, order_data)
+                except Exception as e:
+                    logger.error(f"Error preparing bulk order: {e}")
+                    order, reason = None, f"Internal error: {str(e)}"
+                if order is None:
+                    failed.append({"data": order_data, "reason": reason})
                 else:
-                    failed.append({"data": order_data, "reason": result.get("reason")})
+                    orders.append(order)
+
+            # Every accepted order and its audit row share one flush and commit
+            if orders:
+                db.session.add_all(orders)
+                db.session.flush()
+                if hasattr(self, "audit_service") and self.audit_service.enabled:
+                    db.session.bulk_insert_mappings(
+                        UserAuditLog,
+                        [self._order_created_event(user_id, order) for order in orders],
+                    )
+                db.session.commit()
+            order_ids = [order.id for order in orders]
 
             return {
                 "success": len(failed) == 0,
@@ -525,6 +588,7 @@ class TradingService:
                 "failed": failed,
             }
         except Exception as e:
+            db.session.rollback()
             logger.error(f"Error in bulk order creation: {e}")
             return {
                 "success": False,
@@ -538,7 +602,7 @@ class TradingService:
         Expire all open orders past their expiry time. Returns count expired.
         """
         try:
-            now = datetime.now(timezone.utc)
+            now = self._now()
             expired_orders = Order.query.filter(
                 Order.status.in_([OrderStatus.OPEN, OrderStatus.PARTIALLY_FILLED]),
                 Order.expires_at <= now,
@@ -882,32 +946,22 @@ class TradingService:
         """
         errors = []
 
-        required_fields = [
-            "order_type",
-            "side",
-            "quantity",
-            "project_id",
-            "credit_type",
-            "vintage_year",
-        ]
-        for field in required_fields:
-            if field not in order_data or order_data[field] is None:
+        for field in REQUIRED_ORDER_FIELDS:
+            if order_data.get(field) is None:
                 errors.append(f"Missing required field: {field}")
 
         if errors:
             return False, errors
 
-        valid_order_types = {"market", "limit", "stop", "stop_limit"}
         ot = str(order_data.get("order_type", "")).lower()
-        if ot not in valid_order_types:
-            errors.append(
-                f"Invalid order_type '{ot}'. Must be one of {valid_order_types}"
-            )
+        if ot not in VALID_ORDER_TYPES:
+            allowed = ", ".join(sorted(VALID_ORDER_TYPES))
+            errors.append(f"Invalid order_type '{ot}'. Must be one of {allowed}")
 
-        valid_sides = {"buy", "sell"}
         side = str(order_data.get("side", "")).lower()
-        if side not in valid_sides:
-            errors.append(f"Invalid side '{side}'. Must be one of {valid_sides}")
+        if side not in VALID_ORDER_SIDES:
+            allowed = ", ".join(sorted(VALID_ORDER_SIDES))
+            errors.append(f"Invalid side '{side}'. Must be one of {allowed}")
 
         try:
             qty = Decimal(str(order_data["quantity"]))
@@ -917,7 +971,7 @@ class TradingService:
             errors.append("Quantity must be a valid number")
 
         # Limit orders require a price
-        if ot in {"limit", "stop_limit"}:
+        if ot in PRICED_ORDER_TYPES:
             if order_data.get("price") is None:
                 errors.append("Limit orders require a price")
 
@@ -938,15 +992,15 @@ class TradingService:
         """
         trade_value = quantity * price
         fee_rate = FEE_TIERS.get(user_tier, FEE_TIERS["standard"])
-        return (trade_value * fee_rate).quantize(Decimal("0.01"))
+        return (trade_value * fee_rate).quantize(FEE_PRECISION)
 
     def _calculate_platform_fee(self, trade_value: Decimal) -> Decimal:
         """Calculate platform fee"""
-        return (trade_value * Decimal("0.001")).quantize(Decimal("0.01"))
+        return (trade_value * PLATFORM_FEE_RATE).quantize(FEE_PRECISION)
 
     def _calculate_estimated_fees(self, amount: Decimal) -> Decimal:
         """Calculate estimated trading fees"""
-        return (amount * Decimal("0.005")).quantize(Decimal("0.01"))
+        return (amount * ESTIMATED_FEE_RATE).quantize(FEE_PRECISION)
 
     # ------------------------------------------------------------------
     # Balance checks
@@ -980,7 +1034,7 @@ class TradingService:
 
     def _check_sufficient_buying_power(self, order: Order) -> bool:
         """Check if user has sufficient buying power for buy order"""
-        user = User.query.get(order.user_id)
+        user = db.session.get(User, order.user_id)
         if not user:
             return False
         if order.order_type == OrderType.MARKET:
@@ -1063,6 +1117,7 @@ class TradingService:
     # ------------------------------------------------------------------
 
     def _order_to_dict(self, order: Order) -> Dict[str, Any]:
+        # Decimal amounts are emitted as exact strings, never via float
         return {
             "id": order.id,
             "order_id": order.order_id,
@@ -1070,10 +1125,10 @@ class TradingService:
             "order_type": order.order_type.value,
             "side": order.side.value,
             "status": order.status.value,
-            "quantity": float(order.quantity),
-            "filled_quantity": float(order.filled_quantity or 0),
-            "remaining_quantity": float(order.remaining_quantity or 0),
-            "price": float(order.price) if order.price else None,
+            "quantity": str(order.quantity),
+            "filled_quantity": str(order.filled_quantity or 0),
+            "remaining_quantity": str(order.remaining_quantity or 0),
+            "price": str(order.price) if order.price else None,
             "credit_type": order.credit_type,
             "vintage_year": order.vintage_year,
             "project_id": order.project_id,
@@ -1081,14 +1136,15 @@ class TradingService:
         }
 
     def _trade_to_dict(self, trade: Trade) -> Dict[str, Any]:
+        # Decimal amounts are emitted as exact strings, never via float
         return {
             "id": trade.id,
             "trade_id": trade.trade_id,
             "buy_order_id": trade.buy_order_id,
             "sell_order_id": trade.sell_order_id,
-            "quantity": float(trade.quantity),
-            "price": float(trade.price),
-            "total_value": float(trade.total_value),
+            "quantity": str(trade.quantity),
+            "price": str(trade.price),
+            "total_value": str(trade.total_value),
             "credit_type": trade.credit_type,
             "vintage_year": trade.vintage_year,
             "project_id": trade.project_id,
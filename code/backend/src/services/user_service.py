@@ -4,14 +4,28 @@ Handles user management and operations
 """
 
 import logging
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Union
+
+from sqlalchemy import case, literal, update
 
 from ..models import db
-from ..models.user import User, UserProfile, UserStatus
+from ..models.user import User, UserAuditLog, UserProfile, UserStatus
+from ..utils import clear_request_cache, request_cached
 from .audit_service import AuditService
 
 logger = logging.getLogger(__name__)
 
+_USER_UPDATABLE = {column.name for column in User.__table__.columns} - {
+    "id",
+    "uuid",
+    "created_at",
+}
+
+
+def _status_event_type(status: UserStatus) -> str:
+    """Audit event type matching the single-user activate/deactivate paths"""
+    return "user_activated" if status == UserStatus.ACTIVE else "user_deactivated"
+
 
 class UserService:
     """Service for user management"""
@@ -19,11 +33,15 @@ class UserService:
     def __init__(self) -> None:
         self.audit_service = AuditService()
 
-    def get_user(self, user_id: int) -> Optional[User]:
+    @staticmethod
+    @request_cached
+    def get_user(user_id: int) -> Optional[User]:
         """Get user by ID"""
         return User.query.get(user_id)
 
-    def get_user_by_email(self, email: str) -> Optional[User]:
+    @staticmethod
+    @request_cached
+    def get_user_by_email(email: str) -> Optional[User]:
         """Get user by email"""
         return User.query.filter_by(email=email).first()
 
@@ -38,8 +56,9 @@ class UserService:
             profile = UserProfile(user_id=user.id)
             db.session.add(profile)
             db.session.commit()
+            clear_request_cache()
 
-            self.audit_service.log_event(
+            self.audit_service.queue_event(
                 user_id=user.id,
                 event_type="user_created",
                 event_category="user",
@@ -56,17 +75,15 @@ class UserService:
     def update_user(self, user_id: int, update_data: Dict[str, Any]) -> Dict[str, Any]:
         """Update user information"""
         try:
-            user = self.get_user(user_id)
-            if not user:
+            unknown = set(update_data) - _USER_UPDATABLE
+            if unknown:
+                raise ValueError(
+                    f"Cannot update user fields: {', '.join(sorted(unknown))}"
+                )
+            if not self._update_user_columns(user_id, update_data):
                 return {"error": "User not found"}
 
-            for key, value in update_data.items():
-                if hasattr(user, key) and key not in ["id", "uuid", "created_at"]:
-                    setattr(user, key, value)
-
-            db.session.commit()
-
-            self.audit_service.log_event(
+            self.audit_service.queue_event(
                 user_id=user_id,
                 event_type="user_updated",
                 event_category="user",
@@ -105,14 +122,10 @@ class UserService:
     def deactivate_user(self, user_id: int, reason: str = "") -> Dict[str, Any]:
         """Deactivate user account"""
         try:
-            user = self.get_user(user_id)
-            if not user:
+            if not self._update_user_columns(user_id, {"status": UserStatus.SUSPENDED}):
                 return {"error": "User not found"}
 
-            user.status = UserStatus.INACTIVE
-            db.session.commit()
-
-            self.audit_service.log_event(
+            self.audit_service.queue_event(
                 user_id=user_id,
                 event_type="user_deactivated",
                 event_category="user",
@@ -129,14 +142,10 @@ class UserService:
     def activate_user(self, user_id: int) -> Dict[str, Any]:
         """Activate user account"""
         try:
-            user = self.get_user(user_id)
-            if not user:
+            if not self._update_user_columns(user_id, {"status": UserStatus.ACTIVE}):
                 return {"error": "User not found"}
 
-            user.status = UserStatus.ACTIVE
-            db.session.commit()
-
-            self.audit_service.log_event(
+            self.audit_service.queue_event(
                 user_id=user_id,
                 event_type="user_activated",
                 event_category="user",
@@ -150,6 +159,77 @@ class UserService:
             db.session.rollback()
             return {"error": str(e)}
 
+    def bulk_set_status(
+        self,
+        user_ids: List[int],
+        status: Union[UserStatus, Dict[int, UserStatus]],
+        reason: str = "",
+    ) -> Dict[str, Any]:
+        """Set status for many users in one UPDATE with one batched audit insert"""
+        try:
+            if isinstance(status, dict):
+                statuses = {user_id: status[user_id] for user_id in user_ids}
+                new_status: Any = case(
+                    *(
+                        (User.id == uid, literal(value, User.status.type))
+                        for uid, value in statuses.items()
+                    )
+                )
+            else:
+                statuses = dict.fromkeys(user_ids, status)
+                new_status = status
+            if not statuses:
+                return {"updated": 0, "user_ids": []}
+
+            updated_ids = (
+                db.session.execute(
+                    update(User)
+                    .where(User.id.in_(list(statuses)))
+                    .values(status=new_status)
+                    .returning(User.id)
+                )
+                .scalars()
+                .all()
+            )
+            if self.audit_service.enabled:
+                suffix = f": {reason}" if reason else ""
+                db.session.bulk_insert_mappings(
+                    UserAuditLog,
+                    [
+                        self.audit_service.build_event(
+                            user_id=user_id,
+                            event_type=_status_event_type(statuses[user_id]),
+                            event_category="user",
+                            event_description=(
+                                f"User status set to {statuses[user_id].value}{suffix}"
+                            ),
+                            success=True,
+                        )
+                        for user_id in updated_ids
+                    ],
+                )
+            db.session.commit()
+            clear_request_cache()
+
+            return {"updated": len(updated_ids), "user_ids": updated_ids}
+        except Exception as e:
+            logger.error(f"Error bulk updating user status: {e}")
+            db.session.rollback()
+            return {"error": str(e)}
+
+    @staticmethod
+    def _update_user_columns(user_id: int, values: Dict[str, Any]) -> bool:
+        """Update user columns in a single statement, returning False if no user matched"""
+        result = db.session.execute(
+            update(User).where(User.id == user_id).values(**values)
+        )
+        if result.rowcount == 0:
+            db.session.rollback()
+            return False
+        db.session.commit()
+        clear_request_cache()
+        return True
+
     def list_users(
         self,
         filters: Optional[Dict[str, Any]] = None,
@@ -3,23 +3,69 @@ Utility functions for CarbonXchange Backend
 Implements scalability and performance optimization utilities
 """
 
+import atexit
+import concurrent.futures
+import csv
 import functools
+import io
 import json
 import logging
+import os
+import queue
+import secrets
+import threading
 import time
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 from decimal import Decimal
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional
 
 import redis
-from flask import current_app, request
-from sqlalchemy import text
+from flask import current_app, g, has_app_context, has_request_context, request
+from prometheus_client import Histogram
+from sqlalchemy import create_engine, event, func, make_url, select, table, text
 from sqlalchemy.orm import Query
+from werkzeug.exceptions import HTTPException
 
 from .models import db
 
 logger = logging.getLogger(__name__)
 
+# Deep OFFSET scans grow linearly with the offset; beyond this callers should
+# switch to keyset pagination via DatabaseOptimizer.paginate_keyset
+MAX_PAGINATION_OFFSET = 10000
+
+
+class PaginationOffsetError(ValueError):
+    """Raised when an OFFSET page lies beyond MAX_PAGINATION_OFFSET"""
+
+
+def _fetch_offset_page(query: Any, page: int, per_page: int, with_total: bool) -> Any:
+    """Items, total and has_next for an OFFSET page, skipping COUNT(*) on request"""
+    offset = (page - 1) * per_page
+    if offset > MAX_PAGINATION_OFFSET:
+        raise PaginationOffsetError(
+            f"Page offset exceeds {MAX_PAGINATION_OFFSET} rows, use keyset pagination"
+        )
+    if not with_total:
+        # One extra row tells whether a next page exists without counting
+        rows = query.offset(offset).limit(per_page + 1).all()
+        return rows[:per_page], None, len(rows) > per_page
+    total = query.count()
+    items = query.offset(offset).limit(per_page).all()
+    return items, total, offset + per_page < total
+
+
+def _utc_timestamp() -> str:
+    """Current UTC time as an ISO 8601 string"""
+    return datetime.now(timezone.utc).isoformat()
+
+
+# Shared by every CacheManager and RateLimiter so connections are reused
+# instead of each client opening its own pool; built by get_cache_manager
+_redis_pool: Optional[redis.ConnectionPool] = None
+_redis_pool_lock = threading.Lock()
+DEFAULT_REDIS_URL = "redis://localhost:6379/0"
+
 
 class CacheManager:
     """Redis-based caching manager"""
@@ -28,10 +74,9 @@ class CacheManager:
         self.redis_client = redis_client or self._get_redis_client()
 
     def _get_redis_client(self) -> Any:
-        """Get Redis client from app config"""
+        """Get Redis client backed by the shared connection pool"""
         try:
-            redis_url = current_app.config.get("REDIS_URL", "redis://localhost:6379/0")
-            return redis.from_url(redis_url, decode_responses=True)
+            return get_cache_manager().redis_client
         except Exception as e:
             logger.warning(f"Redis not available: {e}")
             return None
@@ -69,20 +114,52 @@ class CacheManager:
             logger.error(f"Cache delete error for key {key}: {e}")
             return False
 
-    def invalidate_pattern(self, pattern: str) -> int:
-        """Invalidate all keys matching pattern"""
+    def invalidate_pattern(self, pattern: str, batch_size: int = 500) -> int:
+        """Invalidate all keys matching pattern using non-blocking SCAN"""
         if not self.redis_client:
             return 0
         try:
-            keys = self.redis_client.keys(pattern)
-            if keys:
-                return self.redis_client.delete(*keys)
+            pipeline = self.redis_client.pipeline(transaction=False)
+            deleted = 0
+            batch = []
+            for key in self.redis_client.scan_iter(match=pattern, count=batch_size):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    pipeline.delete(*batch)
+                    deleted += sum(pipeline.execute())
+                    batch = []
+            if batch:
+                pipeline.delete(*batch)
+                deleted += sum(pipeline.execute())
+            return deleted
         except Exception as e:
             logger.error(f"Cache invalidate pattern error for {pattern}: {e}")
         return 0
 
 
-cache_manager = CacheManager()
+_cache_manager: Optional[CacheManager] = None
+
+
+def get_cache_manager() -> CacheManager:
+    """Return the shared CacheManager, creating it and its pool on first use"""
+    global _cache_manager, _redis_pool
+    if _cache_manager is not None:
+        return _cache_manager
+    with _redis_pool_lock:
+        if _cache_manager is None:
+            if has_app_context():
+                url = current_app.config.get("REDIS_URL", DEFAULT_REDIS_URL)
+            else:
+                url = os.getenv("REDIS_URL", DEFAULT_REDIS_URL)
+            _redis_pool = redis.ConnectionPool.from_url(
+                url,
+                decode_responses=True,
+                max_connections=64,
+                socket_keepalive=True,
+                health_check_interval=30,
+            )
+            _cache_manager = CacheManager(redis.Redis(connection_pool=_redis_pool))
+    return _cache_manager
 
 
 def cached(ttl: int = 3600, key_prefix: str = "") -> Any:
@@ -93,6 +170,7 @@ def cached(ttl: int = 3600, key_prefix: str = "") -> Any:
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             cache_key = f"{key_prefix}:{func.__name__}:{hash(str(args) + str(sorted(kwargs.items())))}"
+            cache_manager = get_cache_manager()
             cached_result = cache_manager.get(cache_key)
             if cached_result is not None:
                 return cached_result
@@ -105,21 +183,50 @@ def cached(ttl: int = 3600, key_prefix: str = "") -> Any:
     return decorator
 
 
+def request_cached(func: Callable) -> Callable:
+    """Decorator memoizing results on flask.g for the current request"""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # Outside a request g can live for the whole process, so never memoize
+        if not has_request_context():
+            return func(*args, **kwargs)
+        key = (func.__qualname__, args, tuple(sorted(kwargs.items())))
+        cache = g.setdefault("_request_cache", {})
+        try:
+            if key in cache:
+                return cache[key]
+        except TypeError:
+            return func(*args, **kwargs)
+        result = cache[key] = func(*args, **kwargs)
+        return result
+
+    return wrapper
+
+
+def clear_request_cache() -> None:
+    """Drop values memoized by request_cached in the current context"""
+    if has_app_context():
+        g.pop("_request_cache", None)
+
+
 class DatabaseOptimizer:
     """Database optimization utilities"""
 
     @staticmethod
     def add_pagination(
-        query: Query, page: int = 1, per_page: int = 20, max_per_page: int = 100
+        query: Query,
+        page: int = 1,
+        per_page: int = 20,
+        max_per_page: int = 100,
+        with_total: bool = True,
     ) -> Dict:
         """Add pagination to SQLAlchemy query"""
         page = max(1, page)
         per_page = min(max_per_page, max(1, per_page))
-        total = query.count()
-        items = query.offset((page - 1) * per_page).limit(per_page).all()
-        total_pages = (total + per_page - 1) // per_page
+        items, total, has_next = _fetch_offset_page(query, page, per_page, with_total)
+        total_pages = None if total is None else (total + per_page - 1) // per_page
         has_prev = page > 1
-        has_next = page < total_pages
         return {
             "items": items,
             "pagination": {
@@ -134,6 +241,46 @@ class DatabaseOptimizer:
             },
         }
 
+    @staticmethod
+    def paginate_keyset(
+        query: Query,
+        id_column: Any,
+        last_id: Optional[Any] = None,
+        per_page: int = 20,
+        max_per_page: int = 100,
+    ) -> Dict:
+        """Seek-based pagination that stays O(log N) regardless of depth"""
+        per_page = min(max_per_page, max(1, per_page))
+        if last_id is not None:
+            query = query.filter(id_column > last_id)
+        rows = query.order_by(id_column).limit(per_page + 1).all()
+        has_next = len(rows) > per_page
+        items = rows[:per_page]
+        next_cursor = getattr(items[-1], id_column.key) if has_next else None
+        return {
+            "items": items,
+            "pagination": {
+                "per_page": per_page,
+                "cursor": last_id,
+                "next_cursor": next_cursor,
+                "has_next": has_next,
+            },
+        }
+
+    @staticmethod
+    def approximate_count(table_name: str) -> int:
+        """Row count from planner statistics, exact count on other dialects"""
+        if db.engine.dialect.name == "postgresql":
+            result = db.session.execute(
+                text("SELECT reltuples::bigint FROM pg_class WHERE relname = :t"),
+                {"t": table_name},
+            ).scalar()
+            if result is not None and result >= 0:
+                return int(result)
+        return db.session.execute(
+            select(func.count()).select_from(table(table_name))
+        ).scalar()
+
     @staticmethod
     def optimize_query_with_indexes(
         model_class: Any, filters: Dict, order_by: Optional[str] = None
@@ -152,22 +299,104 @@ class DatabaseOptimizer:
 
     @staticmethod
     def bulk_insert_optimized(
-        model_class: Any, data_list: List[Dict], batch_size: int = 1000
+        model_class: Any,
+        data_list: List[Dict],
+        batch_size: int = 1000,
+        use_copy: bool = False,
     ) -> Any:
-        """Optimized bulk insert with batching"""
+        """Optimized bulk insert with batching and a single commit"""
+        if use_copy and db.engine.dialect.name == "postgresql":
+            return DatabaseOptimizer._copy_insert(model_class, data_list)
         total_inserted = 0
-        for i in range(0, len(data_list), batch_size):
-            batch = data_list[i : i + batch_size]
-            try:
+        try:
+            for i in range(0, len(data_list), batch_size):
+                batch = data_list[i : i + batch_size]
                 db.session.bulk_insert_mappings(model_class, batch)
-                db.session.commit()
                 total_inserted += len(batch)
-            except Exception as e:
-                logger.error(f"Bulk insert error for batch {i // batch_size + 1}: {e}")
-                db.session.rollback()
-                raise
+            db.session.commit()
+        except Exception as e:
+            logger.error(
+                f"Bulk insert error for batch {total_inserted // batch_size + 1}: {e}"
+            )
+            db.session.rollback()
+            raise
         return total_inserted
 
+    @staticmethod
+    def _copy_insert(model_class: Any, data_list: List[Dict]) -> int:
+        """Load plain scalar rows through PostgreSQL COPY ... FROM STDIN"""
+        if not data_list:
+            return 0
+        table_columns = model_class.__table__.columns
+        keys = set().union(*data_list)
+        unknown = keys - set(table_columns.keys())
+        if unknown:
+            raise ValueError(
+                f"Unknown columns for {model_class.__table__.name}: "
+                f"{', '.join(sorted(unknown))}"
+            )
+        # COPY bypasses the ORM, so Python-side defaults are filled in here
+        columns = [
+            column
+            for column in table_columns
+            if column.key in keys
+            or (column.default is not None and not column.default.is_sequence)
+        ]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in data_list:
+            writer.writerow(
+                [DatabaseOptimizer._copy_value(row, column) for column in columns]
+            )
+        buffer.seek(0)
+        table_name = model_class.__table__.name
+        try:
+            connection = db.session.connection()
+            preparer = connection.dialect.identifier_preparer
+            column_list = ", ".join(preparer.quote(column.name) for column in columns)
+            statement = (
+                f"COPY {preparer.format_table(model_class.__table__)} "
+                f"({column_list}) FROM STDIN WITH CSV"
+            )
+            with connection.connection.cursor() as cursor:
+                cursor.copy_expert(statement, buffer)
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"COPY insert error for {table_name}: {e}")
+            db.session.rollback()
+            raise
+        return len(data_list)
+
+    @staticmethod
+    def _copy_value(row: Dict, column: Any) -> Any:
+        """Row value for a COPY column, falling back to the column default"""
+        if column.key in row:
+            return row[column.key]
+        default = column.default
+        if default is not None and not default.is_sequence:
+            return default.arg(None) if default.is_callable else default.arg
+        if column.server_default is not None:
+            raise ValueError(
+                f"Column {column.key} has a server default and must be set "
+                f"in every row for COPY"
+            )
+        return None
+
+    @staticmethod
+    def apply_sqlite_pragmas(engine: Any) -> None:
+        """Enable WAL journaling, relaxed fsync and in-memory temp storage on SQLite"""
+        if engine.dialect.name != "sqlite":
+            return
+
+        @event.listens_for(engine, "connect")
+        def _set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute("PRAGMA cache_size=10000")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+            cursor.close()
+
     @staticmethod
     def execute_raw_query_with_params(
         query: str, params: Optional[Dict] = None
@@ -175,34 +404,57 @@ class DatabaseOptimizer:
         """Execute raw SQL query with parameters safely"""
         try:
             result = db.session.execute(text(query), params or {})
-            columns = result.keys()
-            rows = []
-            for row in result:
-                rows.append(dict(zip(columns, row)))
-            return rows
+            return [dict(row) for row in result.mappings()]
+        except Exception as e:
+            logger.error(f"Raw query execution error: {e}")
+            raise
+
+    @staticmethod
+    def stream_raw_query(query: str, params: Optional[Dict] = None) -> Iterator[Dict]:
+        """Execute raw SQL query with parameters, yielding rows as they are fetched"""
+        try:
+            result = db.session.execute(
+                text(query).execution_options(stream_results=True), params or {}
+            )
+            for row in result.mappings():
+                yield dict(row)
         except Exception as e:
             logger.error(f"Raw query execution error: {e}")
             raise
 
 
+FUNCTION_LATENCY = Histogram(
+    "function_latency_ms",
+    "Execution time of functions decorated with PerformanceMonitor.time_function",
+    ["function"],
+    buckets=(1, 5, 10, 50, 100, 500, 1000),
+)
+
+
 class PerformanceMonitor:
     """Performance monitoring utilities"""
 
+    # Calls faster than this are only recorded in the latency histogram
+    SLOW_CALL_THRESHOLD_MS = 100
+
     @staticmethod
     def time_function(func: Callable) -> Callable:
         """Decorator to measure function execution time"""
+        observe = FUNCTION_LATENCY.labels(func.__name__).observe
 
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            start_time = time.time()
+            start_time = time.perf_counter_ns()
             try:
                 result = func(*args, **kwargs)
                 return result
             finally:
-                execution_time = (time.time() - start_time) * 1000
-                logger.info(
-                    f"Function {func.__name__} executed in {execution_time:.2f}ms"
-                )
+                execution_time = (time.perf_counter_ns() - start_time) / 1e6
+                observe(execution_time)
+                if execution_time > PerformanceMonitor.SLOW_CALL_THRESHOLD_MS:
+                    logger.info(
+                        f"Function {func.__name__} executed in {execution_time:.2f}ms"
+                    )
 
         return wrapper
 
@@ -214,9 +466,9 @@ class PerformanceMonitor:
 
             @functools.wraps(func)
             def wrapper(*args, **kwargs):
-                start_time = time.time()
+                start_time = time.perf_counter_ns()
                 result = func(*args, **kwargs)
-                execution_time = (time.time() - start_time) * 1000
+                execution_time = (time.perf_counter_ns() - start_time) / 1e6
                 if execution_time > threshold_ms:
                     logger.warning(
                         f"Slow query detected in {func.__name__}: {execution_time:.2f}ms"
@@ -228,36 +480,62 @@ class PerformanceMonitor:
         return decorator
 
 
+@functools.singledispatch
+def _json_default(obj: Any) -> Any:
+    """json.dumps fallback dispatching on type instead of isinstance chains"""
+    raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
+
+
+@_json_default.register
+def _(obj: Decimal) -> float:
+    return float(obj)
+
+
+@_json_default.register
+def _(obj: date) -> str:
+    return obj.isoformat()
+
+
 class DataSerializer:
     """Data serialization utilities for API responses"""
 
     @staticmethod
     def serialize_decimal(obj: Any) -> Any:
         """Serialize Decimal objects to float"""
-        if isinstance(obj, Decimal):
-            return float(obj)
-        raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
+        if not isinstance(obj, Decimal):
+            raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
+        return _json_default(obj)
 
     @staticmethod
     def serialize_datetime(obj: Any) -> Any:
         """Serialize datetime objects to ISO format"""
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
+        if not isinstance(obj, datetime):
+            raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
+        return _json_default(obj)
 
     @staticmethod
     def serialize_model_list(
         models: List, include_sensitive: bool = False
     ) -> List[Dict]:
         """Serialize list of SQLAlchemy models"""
-        return [
-            (
-                model.to_dict(include_sensitive=include_sensitive)
-                if hasattr(model, "to_dict")
-                else str(model)
-            )
-            for model in models
-        ]
+        if not models:
+            return []
+        cls = type(models[0])
+        if any(type(model) is not cls for model in models[1:]):
+            return [
+                (
+                    model.to_dict(include_sensitive=include_sensitive)
+                    if hasattr(model, "to_dict")
+                    else str(model)
+                )
+                for model in models
+            ]
+        if hasattr(cls, "to_dict"):
+            to_dict = cls.to_dict
+            return [
+                to_dict(model, include_sensitive=include_sensitive) for model in models
+            ]
+        return [str(model) for model in models]
 
     @staticmethod
     def paginated_response(
@@ -273,7 +551,7 @@ class DataSerializer:
             "data": items,
             "pagination": paginated_data["pagination"],
             "meta": {
-                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "timestamp": _utc_timestamp(),
                 "request_id": getattr(request, "id", None),
             },
         }
@@ -282,12 +560,96 @@ class DataSerializer:
 class BackgroundTaskManager:
     """Background task management utilities"""
 
-    @staticmethod
-    def queue_task(task_name: str, *args, **kwargs) -> Any:
-        """Queue a background task (Celery integration placeholder)"""
-        logger.info(
-            f"Queuing background task: {task_name} with args: {args}, kwargs: {kwargs}"
-        )
+    QUEUE_MAXSIZE = 10000
+    BATCH_SIZE = 100
+
+    _handlers: Dict[str, Callable[[List[Dict]], Any]] = {}
+    _queue: "queue.Queue" = queue.Queue(maxsize=QUEUE_MAXSIZE)
+    _worker: Optional[threading.Thread] = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def register_handler(
+        cls, task_name: str, handler: Callable[[List[Dict]], Any]
+    ) -> None:
+        """Register a handler that receives batches of queued task payloads"""
+        cls._handlers[task_name] = handler
+
+    @classmethod
+    def queue_task(cls, task_name: str, *args, **kwargs) -> Any:
+        """Queue a background task for the in-process worker"""
+        if task_name not in cls._handlers:
+            logger.info(
+                f"Queuing background task: {task_name} with args: {args}, kwargs: {kwargs}"
+            )
+            return False
+        try:
+            app = current_app._get_current_object()
+        except RuntimeError:
+            app = None
+        try:
+            cls._queue.put_nowait((app, task_name, kwargs))
+        except queue.Full:
+            # Never drop a registered task; run it on the caller's thread instead
+            logger.warning(f"Background task queue full, running {task_name} inline")
+            cls._process_batch([(app, task_name, kwargs)])
+            return True
+        cls._ensure_worker()
+        return True
+
+    @classmethod
+    def _ensure_worker(cls) -> None:
+        """Start the worker thread on first use"""
+        if cls._worker is not None and cls._worker.is_alive():
+            return
+        with cls._lock:
+            if cls._worker is None or not cls._worker.is_alive():
+                cls._worker = threading.Thread(
+                    target=cls._run_worker, name="background-tasks", daemon=True
+                )
+                cls._worker.start()
+
+    @classmethod
+    def _run_worker(cls) -> None:
+        """Drain the queue in batches and dispatch them to their handlers"""
+        while True:
+            batch = [cls._queue.get()]
+            while len(batch) < cls.BATCH_SIZE:
+                try:
+                    batch.append(cls._queue.get_nowait())
+                except queue.Empty:
+                    break
+            cls._process_batch(batch)
+            for _ in batch:
+                cls._queue.task_done()
+
+    @classmethod
+    def _process_batch(cls, batch: List[tuple]) -> None:
+        """Group a batch by app and task name and run each handler once"""
+        groups: Dict[tuple, List[Dict]] = {}
+        for app, task_name, payload in batch:
+            groups.setdefault((app, task_name), []).append(payload)
+        for (app, task_name), payloads in groups.items():
+            handler = cls._handlers[task_name]
+            try:
+                if app is not None:
+                    with app.app_context():
+                        handler(payloads)
+                else:
+                    handler(payloads)
+            except Exception as e:
+                logger.error(f"Background task {task_name} failed: {e}")
+
+    @classmethod
+    def wait_for_tasks(cls) -> None:
+        """Block until every queued task has been processed"""
+        cls._queue.join()
+
+    @classmethod
+    def drain_at_exit(cls) -> None:
+        """Let a live worker finish queued tasks before the process exits"""
+        if cls._worker is not None and cls._worker.is_alive():
+            cls.wait_for_tasks()
 
     @staticmethod
     def schedule_periodic_task(
@@ -299,87 +661,226 @@ class BackgroundTaskManager:
         )
 
 
+# The worker is a daemon thread, so flush its queue before interpreter shutdown
+atexit.register(BackgroundTaskManager.drain_at_exit)
+
+
 class HealthChecker:
     """System health checking utilities"""
 
+    METRICS_INTERVAL_SECONDS = 5
+    # psutil reports 0.0 for a first interval-less call, so the inline sample
+    # measures over a short window instead
+    INITIAL_CPU_INTERVAL_SECONDS = 0.1
+    # libpq rounds a connect_timeout below 2 seconds up to 2, so the probe
+    # deadline matches it rather than abandoning a still-connecting worker
+    HEALTH_CHECK_TIMEOUT_SECONDS = 2
+
+    _health_engines: Dict[str, Any] = {}
+    _health_executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=1, thread_name_prefix="db-health"
+    )
+
+    _metrics: Optional[Dict] = None
+    _sampler: Optional[threading.Thread] = None
+    _sampler_lock = threading.Lock()
+
+    @classmethod
+    def _get_health_engine(cls, database_url: str) -> Any:
+        """Get a single-connection engine reserved for health probes"""
+        engine = cls._health_engines.get(database_url)
+        if engine is None:
+            url = make_url(database_url)
+            options: Dict[str, Any] = {"pool_pre_ping": True}
+            backend = url.get_backend_name()
+            if backend == "postgresql":
+                options.update(
+                    pool_size=1,
+                    max_overflow=0,
+                    pool_timeout=cls.HEALTH_CHECK_TIMEOUT_SECONDS,
+                    connect_args={
+                        "connect_timeout": cls.HEALTH_CHECK_TIMEOUT_SECONDS,
+                        "options": "-c statement_timeout=500",
+                    },
+                )
+            elif backend == "sqlite":
+                options["connect_args"] = {"timeout": cls.HEALTH_CHECK_TIMEOUT_SECONDS}
+            engine = create_engine(url, **options)
+            cls._health_engines[database_url] = engine
+        return engine
+
     @staticmethod
-    def check_database_health() -> Dict:
+    def _ping_database(engine: Any) -> None:
+        """Run the probe query on the health engine"""
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+    @classmethod
+    def check_database_health(cls) -> Dict:
         """Check database connectivity and performance"""
         try:
-            start_time = time.time()
-            db.session.execute(text("SELECT 1"))
-            response_time = (time.time() - start_time) * 1000
+            engine = cls._get_health_engine(
+                current_app.config["SQLALCHEMY_DATABASE_URI"]
+            )
+            start_time = time.perf_counter()
+            cls._health_executor.submit(cls._ping_database, engine).result(
+                timeout=cls.HEALTH_CHECK_TIMEOUT_SECONDS
+            )
+            response_time = (time.perf_counter() - start_time) * 1000
             return {
                 "status": "healthy",
                 "response_time_ms": round(response_time, 2),
-                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "timestamp": _utc_timestamp(),
+            }
+        except concurrent.futures.TimeoutError:
+            return {
+                "status": "unhealthy",
+                "error": "Database health check timed out",
+                "timestamp": _utc_timestamp(),
             }
         except Exception as e:
             return {
                 "status": "unhealthy",
                 "error": str(e),
-                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "timestamp": _utc_timestamp(),
             }
 
     @staticmethod
     def check_redis_health() -> Dict:
         """Check Redis connectivity and performance"""
         try:
-            start_time = time.time()
-            cache_manager.redis_client.ping()
-            response_time = (time.time() - start_time) * 1000
+            start_time = time.perf_counter()
+            get_cache_manager().redis_client.ping()
+            response_time = (time.perf_counter() - start_time) * 1000
             return {
                 "status": "healthy",
                 "response_time_ms": round(response_time, 2),
-                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "timestamp": _utc_timestamp(),
             }
         except Exception as e:
             return {
                 "status": "unhealthy",
                 "error": str(e),
-                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "timestamp": _utc_timestamp(),
             }
 
     @staticmethod
-    def get_system_metrics() -> Dict:
-        """Get basic system metrics"""
+    def _sample_system_metrics(cpu_interval: Optional[float] = None) -> Dict:
+        """Read system metrics; cpu_interval=None returns the delta since last call"""
         import psutil
 
+        return {
+            "cpu_percent": psutil.cpu_percent(interval=cpu_interval),
+            "memory_percent": psutil.virtual_memory().percent,
+            "disk_percent": psutil.disk_usage("/").percent,
+            "timestamp": _utc_timestamp(),
+        }
+
+    @classmethod
+    def _run_metrics_sampler(cls) -> None:
+        """Refresh the cached metrics snapshot in the background"""
+        while True:
+            try:
+                cls._metrics = cls._sample_system_metrics(cls.METRICS_INTERVAL_SECONDS)
+            except Exception as e:
+                logger.error(f"Failed to sample system metrics: {e}")
+                time.sleep(cls.METRICS_INTERVAL_SECONDS)
+
+    @classmethod
+    def _ensure_metrics_sampler(cls) -> None:
+        """Start the metrics sampler thread on first use"""
+        if cls._sampler is not None and cls._sampler.is_alive():
+            return
+        with cls._sampler_lock:
+            if cls._sampler is None or not cls._sampler.is_alive():
+                cls._sampler = threading.Thread(
+                    target=cls._run_metrics_sampler,
+                    name="system-metrics",
+                    daemon=True,
+                )
+                cls._sampler.start()
+
+    @classmethod
+    def get_system_metrics(cls) -> Dict:
+        """Get basic system metrics from the background-sampled snapshot"""
         try:
-            return {
-                "cpu_percent": psutil.cpu_percent(interval=1),
-                "memory_percent": psutil.virtual_memory().percent,
-                "disk_percent": psutil.disk_usage("/").percent,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-            }
+            if cls._metrics is None:
+                cls._metrics = cls._sample_system_metrics(
+                    cls.INITIAL_CPU_INTERVAL_SECONDS
+                )
+            cls._ensure_metrics_sampler()
+            return dict(cls._metrics)
         except Exception as e:
             logger.error(f"Failed to get system metrics: {e}")
             return {
                 "error": "Unable to retrieve system metrics",
-                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "timestamp": _utc_timestamp(),
             }
 
 
+# Sliding window: trim, count and insert in one atomic step
+_SLIDING_WINDOW_LUA = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, now - window)
+if redis.call('ZCARD', KEYS[1]) >= limit then
+    return 1
+end
+redis.call('ZADD', KEYS[1], now, ARGV[1])
+redis.call('EXPIRE', KEYS[1], window)
+return 0
+"""
+
+# Fixed window: a single counter per key, O(1) memory regardless of limit
+_FIXED_WINDOW_LUA = """
+local count = redis.call('INCR', KEYS[1])
+if count == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+if count > tonumber(ARGV[2]) then
+    return 1
+end
+return 0
+"""
+
+
 class RateLimiter:
     """Custom rate limiting utilities"""
 
     def __init__(self, redis_client: Any = None) -> None:
-        self.redis_client = redis_client or cache_manager.redis_client
+        self._redis_client = redis_client
+        self._sliding_window = None
+        self._fixed_window = None
+
+    @property
+    def redis_client(self) -> Any:
+        """Client passed in, or the shared one resolved on first use"""
+        if self._redis_client is None:
+            self._redis_client = get_cache_manager().redis_client
+        return self._redis_client
+
+    def _register_scripts(self) -> None:
+        """Register both window scripts with the client once"""
+        if self._sliding_window is None:
+            self._sliding_window = self.redis_client.register_script(
+                _SLIDING_WINDOW_LUA
+            )
+            self._fixed_window = self.redis_client.register_script(_FIXED_WINDOW_LUA)
 
-    def is_rate_limited(self, key: str, limit: int, window_seconds: int) -> bool:
-        """Check if rate limit is exceeded using sliding window"""
-        if not self.redis_client:
-            return False
+    def is_rate_limited(
+        self, key: str, limit: int, window_seconds: int, sliding: bool = True
+    ) -> bool:
+        """Check if rate limit is exceeded using a sliding or fixed window"""
         try:
-            now = time.time()
-            pipeline = self.redis_client.pipeline()
-            pipeline.zremrangebyscore(key, 0, now - window_seconds)
-            pipeline.zcard(key)
-            pipeline.zadd(key, {str(now): now})
-            pipeline.expire(key, window_seconds)
-            results = pipeline.execute()
-            current_count = results[1]
-            return current_count >= limit
+            self._register_scripts()
+            if sliding:
+                return bool(
+                    self._sliding_window(
+                        keys=[key], args=[repr(time.time()), window_seconds, limit]
+                    )
+                )
+            return bool(self._fixed_window(keys=[key], args=[window_seconds, limit]))
         except Exception as e:
             logger.error(f"Rate limiting error for key {key}: {e}")
             return False
@@ -387,8 +888,6 @@ class RateLimiter:
 
 def generate_api_key() -> str:
     """Generate secure API key"""
-    import secrets
-
     return f"cx_{secrets.token_urlsafe(32)}"
 
 
@@ -431,18 +930,12 @@ def validate_request_data(data: dict, required_fields: list) -> bool:
 
 def handle_api_error(error: Exception) -> tuple:
     """Handle API errors and return appropriate response"""
-    import logging
-
-    from flask import current_app
-    from werkzeug.exceptions import HTTPException
-
-    logger = logging.getLogger(__name__)
     if isinstance(error, HTTPException):
         return (
             {
                 "error": error.description,
                 "code": error.code,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "timestamp": _utc_timestamp(),
             },
             error.code,
         )
@@ -452,7 +945,7 @@ def handle_api_error(error: Exception) -> tuple:
             {
                 "error": "Internal server error",
                 "code": 500,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "timestamp": _utc_timestamp(),
             },
             500,
         )
@@ -462,33 +955,35 @@ def handle_api_error(error: Exception) -> tuple:
                 "error": str(error),
                 "code": 500,
                 "type": type(error).__name__,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "timestamp": _utc_timestamp(),
             },
             500,
         )
 
 
 def paginate_query(
-    query: Any, page: int = 1, per_page: int = 20, max_per_page: int = 100
+    query: Any,
+    page: int = 1,
+    per_page: int = 20,
+    max_per_page: int = 100,
+    with_total: bool = True,
 ) -> Any:
     """Pagination with result wrapper"""
 
     class PaginationResult:
 
-        def __init__(self, items, page, per_page, total):
+        def __init__(self, items, page, per_page, total, has_next):
             self.items = items
             self.page = page
             self.per_page = per_page
             self.total = total
-            self.pages = (total + per_page - 1) // per_page
+            self.pages = None if total is None else (total + per_page - 1) // per_page
             self.has_prev = page > 1
-            self.has_next = page < self.pages
+            self.has_next = has_next
             self.prev_num = page - 1 if self.has_prev else None
             self.next_num = page + 1 if self.has_next else None
 
     page = max(1, int(page))
     per_page = min(max(1, int(per_page)), max_per_page)
-    total = query.count()
-    offset = (page - 1) * per_page
-    items = query.offset(offset).limit(per_page).all()
-    return PaginationResult(items, page, per_page, total)
+    items, total, has_next = _fetch_offset_page(query, page, per_page, with_total)
+    return PaginationResult(items, page, per_page, total, has_next)
@@ -2,67 +2,108 @@
 Test configuration and fixtures for CarbonXchange Backend
 """
 
+import collections
+import functools
 import os
-import tempfile
 import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
 from datetime import datetime, timezone
 from decimal import Decimal
-from typing import Any
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, List, Tuple
 from unittest.mock import MagicMock
 
+import numpy as np
+import pandas as pd
 import pytest
+from flask import has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy import inspect as sa_inspect
 from src.main import create_app
 from src.models import db
-from src.models.carbon_credit import (
-    CarbonCredit,
-    CarbonProject,
-    CreditStatus,
-    ProjectStatus,
-    ProjectType,
+from src.models.user import RiskLevel, User, UserStatus
+
+from tests.factories import (
+    CarbonCreditFactory,
+    CarbonProjectFactory,
+    OrderFactory,
+    PortfolioFactory,
+    TradeFactory,
+    UserFactory,
+    UserKYCFactory,
+    UserProfileFactory,
 )
-from src.models.trading import (
-    Order,
-    OrderSide,
-    OrderStatus,
-    OrderType,
-    Portfolio,
-    Trade,
-)
-from src.models.user import KYCStatus, RiskLevel, User, UserKYC, UserProfile, UserStatus
+
+
+_TOLERANCES = {places: Decimal(10) ** -places for places in range(10)}
 
 
 def assert_decimal_equal(a: Decimal, b: Decimal, places: int = 4) -> None:
     """Assert two Decimal values are equal within precision."""
-    assert (
-        abs(a - b) < Decimal(10) ** -places
-    ), f"{a} != {b} (within {places} decimal places)"
+    tolerance = _TOLERANCES.get(places) or Decimal(10) ** -places
+    assert abs(a - b) < tolerance, f"{a} != {b} (within {places} decimal places)"
+
+
+@functools.lru_cache(maxsize=16)
+def cached_date_range(start: str, periods: int, freq: str = "D") -> pd.DatetimeIndex:
+    """Build a date index once per (start, periods, freq) and share it"""
+    # DatetimeIndex is immutable, so handing out the same instance is safe
+    return pd.date_range(start=start, periods=periods, freq=freq)
+
+
+@contextmanager
+def force_commit_error(session: Any) -> Iterator[None]:
+    """Make every commit on the session fail until the block exits"""
+
+    def _raise(*args: Any) -> None:
+        raise OperationalError("COMMIT", None, Exception("Database error"))
+
+    # Listen on the concrete Session so the real rollback path still runs
+    target = session()
+    event.listen(target, "before_commit", _raise)
+    try:
+        yield
+    finally:
+        event.remove(target, "before_commit", _raise)
+
+
+_TEST_CONFIG = MappingProxyType(
+    {
+        "TESTING": True,
+        "SQLALCHEMY_TRACK_MODIFICATIONS": False,
+        "SECRET_KEY": "test-secret-key-32-chars-minimum!",
+        "JWT_SECRET_KEY": "test-jwt-secret-key-32-chars-min!!",
+        "WTF_CSRF_ENABLED": False,
+        "AUDIT_LOG_ENABLED": True,
+    }
+)
+
+
+@functools.lru_cache(maxsize=4)
+def _build_app(config_items: Tuple[Tuple[str, Any], ...]) -> Any:
+    """Create the testing app once per distinct config override"""
+    app = create_app("testing")
+    app.config.update(dict(config_items))
+    return app
 
 
 @pytest.fixture(scope="session")
 def app() -> Any:
     """Create application for testing"""
-    db_fd, db_path = tempfile.mkstemp()
-    app = create_app("testing")
-    app.config.update(
-        {
-            "TESTING": True,
-            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
-            "SQLALCHEMY_TRACK_MODIFICATIONS": False,
-            "SECRET_KEY": "test-secret-key-32-chars-minimum!",
-            "JWT_SECRET_KEY": "test-jwt-secret-key-32-chars-min!!",
-            "WTF_CSRF_ENABLED": False,
-            "AUDIT_LOG_ENABLED": True,
-        }
-    )
-    with app.app_context():
-        db.create_all()
-        yield app
-    os.close(db_fd)
-    os.unlink(db_path)
+    app = _build_app(tuple(sorted(_TEST_CONFIG.items())))
+    # Pushed once for the whole run; fixtures and helpers rely on it being active
+    ctx = app.app_context()
+    ctx.push()
+    yield app
+    ctx.pop()
 
 
 @pytest.fixture
-def client(app: Any) -> Any:
+def client(app: Any, db_session: Any) -> Any:
     """Create test client"""
     return app.test_client()
 
@@ -73,272 +114,334 @@ def runner(app: Any) -> Any:
     return app.test_cli_runner()
 
 
-@pytest.fixture
-def db_session(app: Any) -> Any:
-    """Create database session for testing"""
-    with app.app_context():
-        yield db.session
-        db.session.rollback()
+class ConnectionBoundSession(Session):
+    """Session that routes every query to the connection it was created with"""
 
+    def get_bind(self, mapper: Any = None, clause: Any = None, **kwargs: Any) -> Any:
+        if self.bind is not None:
+            return self.bind
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
 
-@pytest.fixture
-def sample_user(db_session: Any) -> Any:
-    """Create sample user for testing"""
-    email = f"test_{os.urandom(4).hex()}@example.com"
-    user = User(
-        email=email,
-        password="TestPassword123!",
-        first_name="Test",
-        last_name="User",
-        status=UserStatus.ACTIVE,
-        risk_level=RiskLevel.MEDIUM,
+
+def _emit_begin(conn: Any) -> None:
+    """Emit BEGIN explicitly so pysqlite honours SAVEPOINTs"""
+    conn.exec_driver_sql("BEGIN")
+
+
+@pytest.fixture(scope="session")
+def engine(app: Any) -> Any:
+    """Engine for the test run, disposed at the end"""
+    yield db.engine
+    db.engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def tables(engine: Any) -> Any:
+    """Create the schema once per run"""
+    db.metadata.create_all(engine)
+    yield
+    db.metadata.drop_all(engine)
+
+
+@pytest.fixture(scope="session")
+def db_connection(engine: Any, tables: Any) -> Any:
+    """Single connection shared by the test run"""
+    event.listen(engine, "begin", _emit_begin)
+    connection = engine.connect()
+    # pysqlite otherwise manages transactions itself and breaks SAVEPOINT
+    connection.connection.driver_connection.isolation_level = None
+    yield connection
+    connection.close()
+    event.remove(engine, "begin", _emit_begin)
+
+
+@pytest.fixture(scope="module")
+def module_db_session(db_connection: Any) -> Any:
+    """Session joined to a per-module transaction that is rolled back afterwards"""
+    transaction = db_connection.begin()
+    original_session = db.session
+    db.session = db._make_scoped_session(
+        {
+            "class_": ConnectionBoundSession,
+            "bind": db_connection,
+            "join_transaction_mode": "create_savepoint",
+        }
     )
-    user.email_verified_at = datetime.now(timezone.utc)
-    db_session.add(user)
-    db_session.commit()
-    db_session.refresh(user)
-    return user
+    yield db.session
+    db.session.remove()
+    db.session = original_session
+    transaction.rollback()
 
 
 @pytest.fixture
-def sample_user_profile(db_session: Any, sample_user: Any) -> Any:
+def db_session(module_db_session: Any, db_connection: Any) -> Any:
+    """Create database session for testing, isolated by a per-test SAVEPOINT"""
+    session = module_db_session
+    # Close out module-level fixture work so the test savepoint nests inside it
+    if session().in_transaction():
+        session.commit()
+    savepoint = db_connection.begin_nested()
+    baseline = set(session.identity_map.keys())
+    # Module fixtures are expired by the previous test's rollback; reload them
+    # up front so tests (and threads) don't trigger lazy loads
+    for obj in list(session.identity_map.values()):
+        if sa_inspect(obj).expired_attributes:
+            session.refresh(obj)
+    yield session
+    session.rollback()
+    if savepoint.is_active:
+        savepoint.rollback()
+    # Rows created by the test are gone; forget them so reused ids don't clash
+    for key, obj in list(session.identity_map.items()):
+        if key not in baseline:
+            session.expunge(obj)
+
+
+@pytest.fixture(scope="module")
+def sample_user(module_db_session: Any) -> Any:
+    """Create sample user for testing"""
+    return UserFactory()
+
+
+@pytest.fixture(scope="module")
+def other_user(module_db_session: Any) -> Any:
+    """Create a second user who owns none of the sample records"""
+    return UserFactory(first_name="Other")
+
+
+@pytest.fixture(scope="module")
+def sample_user_profile(module_db_session: Any, sample_user: Any) -> Any:
     """Create sample user profile"""
-    profile = UserProfile(
-        user_id=sample_user.id,
-        country="USA",
-        timezone="UTC",
-    )
-    db_session.add(profile)
-    db_session.commit()
-    return profile
+    return UserProfileFactory(user=sample_user)
 
 
-@pytest.fixture
-def sample_kyc(db_session: Any, sample_user: Any) -> Any:
+@pytest.fixture(scope="module")
+def sample_kyc(module_db_session: Any, sample_user: Any) -> Any:
     """Create sample KYC record"""
-    kyc = UserKYC(
-        user_id=sample_user.id,
-        status=KYCStatus.APPROVED,
-        identity_verified=True,
-        address_verified=True,
-        email_verified=True,
-        approved_at=datetime.now(timezone.utc),
-    )
-    db_session.add(kyc)
-    db_session.commit()
-    return kyc
+    return UserKYCFactory(user=sample_user)
 
 
-@pytest.fixture
-def sample_project(db_session: Any) -> Any:
+@pytest.fixture(scope="module")
+def sample_project(module_db_session: Any) -> Any:
     """Create a sample carbon project"""
-    project = CarbonProject(
-        name="Test Reforestation Project",
-        project_type=ProjectType.REFORESTATION,
-        status=ProjectStatus.ACTIVE,
-        country="BR",
-        description="A test reforestation project",
-        total_credits=Decimal("10000"),
-        available_credits_count=Decimal("8000"),
-    )
-    db_session.add(project)
-    db_session.commit()
-    db_session.refresh(project)
-    return project
+    return CarbonProjectFactory()
 
 
-@pytest.fixture
-def sample_credit(db_session: Any, sample_project: Any) -> Any:
+@pytest.fixture(scope="module")
+def sample_credit(module_db_session: Any, sample_project: Any) -> Any:
     """Create a sample carbon credit"""
-    credit = CarbonCredit(
-        project_id=sample_project.id,
-        serial_number=f"CC-TEST-{os.urandom(4).hex().upper()}",
-        vintage_year=2023,
-        quantity=Decimal("100"),
-        status=CreditStatus.AVAILABLE,
-        price_per_unit=Decimal("25.00"),
-    )
-    db_session.add(credit)
-    db_session.commit()
-    db_session.refresh(credit)
-    return credit
+    return CarbonCreditFactory(project=sample_project)
 
 
-@pytest.fixture
-def sample_portfolio(db_session: Any, sample_user: Any) -> Any:
+@pytest.fixture(scope="module")
+def sample_portfolio(module_db_session: Any, sample_user: Any) -> Any:
     """Create a sample portfolio"""
-    from src.models.trading import PortfolioType
-
-    portfolio = Portfolio(
-        user_id=sample_user.id,
-        name="Test Portfolio",
-        portfolio_type=PortfolioType.PERSONAL,
-    )
-    db_session.add(portfolio)
-    db_session.commit()
-    db_session.refresh(portfolio)
-    return portfolio
+    return PortfolioFactory(user=sample_user)
 
 
 @pytest.fixture
 def sample_order(db_session: Any, sample_user: Any, sample_project: Any) -> Any:
     """Create a sample open limit buy order for testing"""
-    import uuid as uuid_mod
-
-    order = Order(
-        order_id=f"ORD-TEST-{uuid_mod.uuid4().hex[:8].upper()}",
-        user_id=sample_user.id,
-        order_type=OrderType.LIMIT,
-        side=OrderSide.BUY,
-        status=OrderStatus.OPEN,
-        quantity=Decimal("100"),
-        remaining_quantity=Decimal("100"),
-        filled_quantity=Decimal("0"),
-        price=Decimal("45.00"),
-        credit_type="VCS",
-        vintage_year=2023,
-        project_id=sample_project.id,
-    )
-    db_session.add(order)
-    db_session.commit()
-    db_session.refresh(order)
+    with db_session.no_autoflush:
+        order = OrderFactory.build(user=sample_user, project=sample_project)
+        db_session.add(order)
+    db_session.flush()
     return order
 
 
+@pytest.fixture
+def seed_orders(db_session: Any, sample_user: Any, sample_project: Any) -> Any:
+    """Return a helper inserting open orders for the sample user in one flush"""
+
+    def _seed(specs: List[Dict[str, Any]]) -> List[Any]:
+        return OrderFactory.create_many(
+            {
+                "user": sample_user,
+                "project": sample_project,
+                "remaining_quantity": spec["quantity"],
+                **spec,
+            }
+            for spec in specs
+        )
+
+    return _seed
+
+
 @pytest.fixture
 def sample_trade(db_session: Any, sample_user: Any, sample_project: Any) -> Any:
     """Create a sample settled trade for testing"""
-    import uuid as uuid_mod
-
-    from src.models.trading import TradeStatus
-
-    buy_order = Order(
-        order_id=f"ORD-BUY-{uuid_mod.uuid4().hex[:8].upper()}",
-        user_id=sample_user.id,
-        order_type=OrderType.LIMIT,
-        side=OrderSide.BUY,
-        status=OrderStatus.FILLED,
-        quantity=Decimal("100"),
-        remaining_quantity=Decimal("0"),
-        filled_quantity=Decimal("100"),
-        price=Decimal("45.00"),
-        credit_type="VCS",
-        vintage_year=2023,
-        project_id=sample_project.id,
-    )
-    sell_order = Order(
-        order_id=f"ORD-SELL-{uuid_mod.uuid4().hex[:8].upper()}",
-        user_id=sample_user.id,
-        order_type=OrderType.LIMIT,
-        side=OrderSide.SELL,
-        status=OrderStatus.FILLED,
-        quantity=Decimal("100"),
-        remaining_quantity=Decimal("0"),
-        filled_quantity=Decimal("100"),
-        price=Decimal("45.00"),
-        credit_type="VCS",
-        vintage_year=2023,
-        project_id=sample_project.id,
-    )
-    db_session.add(buy_order)
-    db_session.add(sell_order)
+    # Build the orders and trade unflushed, then insert them in one flush
+    with db_session.no_autoflush:
+        trade = TradeFactory.build(buy_order__user=sample_user, project=sample_project)
+        db_session.add(trade)
     db_session.flush()
+    return trade
+
+
+@dataclass(frozen=True)
+class FakeUser:
+    """Plain stand-in for the User attributes services read"""
+
+    id: int = 1
+    email: str = "test@example.com"
+    is_kyc_approved: bool = True
+    risk_level: str = "medium"
+
+
+@pytest.fixture(scope="session")
+def mock_user() -> Any:
+    """Create a detached user stand-in for service tests"""
+    return FakeUser()
+
 
-    trade = Trade(
-        buy_order_id=buy_order.id,
-        sell_order_id=sell_order.id,
-        quantity=Decimal("100"),
-        price=Decimal("45.00"),
-        vintage_year=2023,
-        project_id=sample_project.id,
-        status=TradeStatus.SETTLED,
-        credit_type="VCS",
+@pytest.fixture(scope="session")
+def sample_price_data() -> Any:
+    """Create a year of daily price data for testing"""
+    # Shared by the whole session; tests hand the services a copy because
+    # signal generation adds indicator columns to the frame in place
+    dates = cached_date_range("2023-01-01", 365)
+    rng = np.random.default_rng(42)
+    returns = rng.normal(0.001, 0.02, len(dates))
+    returns[0] = 0.0
+    prices = 100.0 * np.cumprod(1.0 + returns)
+    volumes = rng.normal(10000, 2000, len(dates))
+    np.maximum(volumes, 1000, out=volumes)
+    # The arrays are fresh float64 buffers, so the frame can wrap them as-is
+    return pd.DataFrame(
+        {"timestamp": dates, "close": prices, "volume": volumes}, copy=False
     )
-    db_session.add(trade)
-    db_session.commit()
-    db_session.refresh(trade)
-    return trade
 
 
-@pytest.fixture
-def mock_audit_service() -> Any:
-    """Create a mock audit service"""
-    mock = MagicMock()
-    mock.log_event.return_value = True
-    mock.log_trading_event.return_value = True
-    mock.log_authentication.return_value = True
-    mock.log_data_access.return_value = True
-    mock.log_compliance_event.return_value = True
-    return mock
+def _frozen(array: np.ndarray) -> np.ndarray:
+    """Mark a shared fixture array read-only so no test can alter it"""
+    array.flags.writeable = False
+    return array
 
 
-@pytest.fixture
-def mock_risk_service() -> Any:
-    """Create a mock risk service"""
-    mock = MagicMock()
-    mock.check_order_risk.return_value = {
+@pytest.fixture(scope="session")
+def portfolio_returns_normal() -> Any:
+    """A year of daily portfolio returns drawn once per session"""
+    return _frozen(np.random.default_rng(42).normal(0.001, 0.02, 252))
+
+
+@pytest.fixture(scope="session")
+def portfolio_returns_zeros() -> Any:
+    """A year of flat daily portfolio returns"""
+    return _frozen(np.zeros(252))
+
+
+_FAIR_VALUE = Decimal("46.75")
+
+_AUDIT_SERVICE_DEFAULTS = {
+    "log_event.return_value": True,
+    "log_trading_event.return_value": True,
+    "log_authentication.return_value": True,
+    "log_data_access.return_value": True,
+    "log_compliance_event.return_value": True,
+}
+
+_RISK_SERVICE_DEFAULTS = {
+    "check_order_risk.return_value": {
         "approved": True,
         "reason": None,
         "risk_checks": [],
         "risk_score": 0.1,
-    }
-    mock.get_user_risk_profile.return_value = {
+    },
+    "get_user_risk_profile.return_value": {
         "risk_level": "medium",
         "risk_score": 0.3,
-    }
-    return mock
+    },
+}
 
-
-@pytest.fixture
-def mock_compliance_service() -> Any:
-    """Create a mock compliance service"""
-    mock = MagicMock()
-    mock.check_order_compliance.return_value = {
+_COMPLIANCE_SERVICE_DEFAULTS = {
+    "check_order_compliance.return_value": {
         "approved": True,
         "reason": None,
         "compliance_checks": [],
-    }
-    mock.check_user_compliance.return_value = {
+    },
+    "check_user_compliance.return_value": {
         "compliant": True,
         "issues": [],
-    }
+    },
+}
+
+_PRICING_SERVICE_DEFAULTS = {
+    "get_current_price.return_value": {
+        "price": _FAIR_VALUE,
+        "pricing_method": "market_based",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    },
+    "calculate_fair_value.return_value": _FAIR_VALUE,
+}
+
+
+def _configure_mock(mock: MagicMock, defaults: dict) -> MagicMock:
+    """Clear calls and per-test overrides, then restore the default responses"""
+    mock.reset_mock(return_value=True, side_effect=True)
+    mock.configure_mock(**defaults)
     return mock
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
+def mock_audit_service() -> Any:
+    """Create a mock audit service"""
+    return _configure_mock(MagicMock(), _AUDIT_SERVICE_DEFAULTS)
+
+
+@pytest.fixture(scope="session")
+def mock_risk_service() -> Any:
+    """Create a mock risk service"""
+    return _configure_mock(MagicMock(), _RISK_SERVICE_DEFAULTS)
+
+
+@pytest.fixture(scope="session")
+def mock_compliance_service() -> Any:
+    """Create a mock compliance service"""
+    return _configure_mock(MagicMock(), _COMPLIANCE_SERVICE_DEFAULTS)
+
+
+@pytest.fixture(scope="session")
 def mock_pricing_service() -> Any:
     """Create a mock pricing service"""
-    mock = MagicMock()
-    mock.get_current_price.return_value = {
-        "price": Decimal("46.75"),
-        "pricing_method": "market_based",
-        "timestamp": datetime.now(timezone.utc).isoformat(),
-    }
-    mock.calculate_fair_value.return_value = Decimal("46.75")
-    return mock
+    return _configure_mock(MagicMock(), _PRICING_SERVICE_DEFAULTS)
+
+
+@pytest.fixture(autouse=True)
+def reset_mocks(
+    mock_audit_service: Any,
+    mock_risk_service: Any,
+    mock_compliance_service: Any,
+    mock_pricing_service: Any,
+) -> Any:
+    """Reset the shared service mocks after every test"""
+    yield
+    _configure_mock(mock_audit_service, _AUDIT_SERVICE_DEFAULTS)
+    _configure_mock(mock_risk_service, _RISK_SERVICE_DEFAULTS)
+    _configure_mock(mock_compliance_service, _COMPLIANCE_SERVICE_DEFAULTS)
+    _configure_mock(mock_pricing_service, _PRICING_SERVICE_DEFAULTS)
 
 
 class PerformanceTimer:
     """Timer utility for performance tests"""
 
     def __init__(self) -> None:
-        self._start: float = 0.0
-        self._elapsed: float = 0.0
+        self._start_ns = 0
+        self._elapsed_ns = 0
 
     def start(self) -> None:
-        self._start = time.time()
+        self._start_ns = time.perf_counter_ns()
 
     def stop(self) -> None:
-        self._elapsed = time.time() - self._start
+        self._elapsed_ns = time.perf_counter_ns() - self._start_ns
 
     def assert_under(self, seconds: float) -> None:
         assert (
-            self._elapsed < seconds
-        ), f"Operation took {self._elapsed:.3f}s, expected under {seconds}s"
+            self._elapsed_ns < seconds * 1_000_000_000
+        ), f"Operation took {self.elapsed:.3f}s, expected under {seconds}s"
 
     @property
     def elapsed(self) -> float:
-        return self._elapsed
+        return self._elapsed_ns / 1e9
 
 
 @pytest.fixture
@@ -347,6 +450,77 @@ def performance_timer() -> Any:
     return PerformanceTimer()
 
 
+class QueryCounter:
+    """Counts SQL statements; statement capture is opt-in and bounded"""
+
+    def __init__(self, maxlen: int = 1000) -> None:
+        self.count = 0
+        self.capture = False
+        self.queries: collections.deque = collections.deque(maxlen=maxlen)
+
+    def increment(
+        self,
+        conn: Any,
+        cursor: Any,
+        statement: str,
+        parameters: Any,
+        context: Any,
+        executemany: bool,
+    ) -> None:
+        self.count += 1
+        if self.capture:
+            self.queries.append((statement, parameters))
+
+    def capture_statements(self, enabled: bool = True) -> None:
+        self.capture = enabled
+
+    def reset(self) -> None:
+        self.count = 0
+        self.queries.clear()
+
+
+_counter_stack: List[QueryCounter] = []
+
+
+# Registered once on the Engine class because db.engine needs an app context
+@event.listens_for(Engine, "before_cursor_execute")
+def _dispatch_query_count(*args: Any) -> None:
+    if _counter_stack:
+        _counter_stack[-1].increment(*args)
+
+
+@pytest.fixture
+def db_query_counter(db_session: Any) -> Any:
+    """Count SQL statements executed during a test"""
+    counter = QueryCounter()
+    _counter_stack.append(counter)
+    yield counter
+    _counter_stack.pop()
+
+
+# JWTs keyed by the claims login bakes into them, reused across tests
+_TOKEN_CACHE: Dict[Tuple[Any, ...], str] = {}
+
+
+def login_token(client: Any, user: Any, *passwords: str) -> str:
+    """Return an access token for user, logging in only on a cache miss"""
+    key = (user.uuid, user.role, user.status, user.is_kyc_approved)
+    token = _TOKEN_CACHE.get(key)
+    if token is None:
+        token = ""
+        for password in passwords:
+            resp = client.post(
+                "/api/auth/login",
+                json={"email": user.email, "password": password},
+                content_type="application/json",
+            )
+            if resp.status_code == 200:
+                token = (resp.get_json() or {}).get("access_token", "")
+                _TOKEN_CACHE[key] = token
+                break
+    return token
+
+
 def make_user(db_session: Any, app: Any, **overrides: Any) -> Any:
     """Helper to create a user with defaults"""
     defaults = {
@@ -358,9 +532,9 @@ def make_user(db_session: Any, app: Any, **overrides: Any) -> Any:
         "risk_level": RiskLevel.MEDIUM,
     }
     defaults.update(overrides)
-    with app.app_context():
+    with nullcontext() if has_app_context() else app.app_context():
         user = User(**defaults)
         db_session.add(user)
-        db_session.commit()
+        db_session.flush()
         db_session.refresh(user)
         return user
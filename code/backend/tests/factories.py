@@ -0,0 +1,214 @@
+"""
+Model factories for CarbonXchange Backend tests
+"""
+
+import itertools
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List
+
+import factory
+from factory.alchemy import SQLAlchemyModelFactory
+from sqlalchemy import insert, select
+from src.models import db
+from src.models.carbon_credit import (
+    CarbonCredit,
+    CarbonProject,
+    CreditStatus,
+    ProjectStatus,
+    ProjectType,
+)
+from src.models.trading import (
+    Order,
+    OrderSide,
+    OrderStatus,
+    OrderType,
+    Portfolio,
+    PortfolioType,
+    Trade,
+    TradeStatus,
+)
+from src.models.user import KYCStatus, RiskLevel, User, UserKYC, UserProfile, UserStatus
+from werkzeug.security import generate_password_hash
+
+# Shared defaults, built once per test session
+_DEC_0 = Decimal("0")
+_DEC_100 = Decimal("100")
+_DEC_8K = Decimal("8000")
+_DEC_10K = Decimal("10000")
+_PRICE_25 = Decimal("25.00")
+_PRICE_45 = Decimal("45.00")
+_SESSION_NOW = datetime.now(timezone.utc)
+
+
+class BaseFactory(SQLAlchemyModelFactory):
+    """Base factory persisting through whichever session db.session currently is"""
+
+    class Meta:
+        abstract = True
+        sqlalchemy_session_persistence = "flush"
+
+    @classmethod
+    def _create(cls, model_class: Any, *args: Any, **kwargs: Any) -> Any:
+        # Resolved per call because the test fixtures swap db.session per module
+        cls._meta.sqlalchemy_session = db.session
+        return super()._create(model_class, *args, **kwargs)
+
+    @classmethod
+    def create_many(cls, specs: Iterable[Dict[str, Any]]) -> List[Any]:
+        """Build one object per spec and insert them all in a single flush"""
+        session = db.session
+        with session.no_autoflush:
+            objects = [cls.build(**spec) for spec in specs]
+            session.add_all(objects)
+        session.flush()
+        return objects
+
+
+class UserFactory(BaseFactory):
+    class Meta:
+        model = User
+
+    email = factory.Sequence(lambda n: f"user{n}@example.com")
+    password = "TestPassword123!"
+    first_name = "Test"
+    last_name = "User"
+    status = UserStatus.ACTIVE
+    risk_level = RiskLevel.MEDIUM
+    email_verified_at = _SESSION_NOW
+
+
+_bulk_user_sequence = itertools.count()
+
+
+def bulk_create_users(db_session: Any, count: int, **overrides: Any) -> List[User]:
+    """Insert users with a single multi-row INSERT and load them back"""
+    # Hash the shared password once rather than per User.__init__
+    password_hash = generate_password_hash(
+        UserFactory.password, method="pbkdf2:sha256:150000"
+    )
+    emails = [f"bulk{next(_bulk_user_sequence)}@example.com" for _ in range(count)]
+    rows = [
+        {
+            "email": email,
+            "password_hash": password_hash,
+            "first_name": UserFactory.first_name,
+            "last_name": UserFactory.last_name,
+            "status": UserFactory.status,
+            "risk_level": UserFactory.risk_level,
+            "email_verified_at": _SESSION_NOW,
+            "password_changed_at": _SESSION_NOW,
+            **overrides,
+        }
+        for email in emails
+    ]
+    db_session.execute(insert(User), rows)
+    return list(
+        db_session.scalars(select(User).where(User.email.in_(emails)).order_by(User.id))
+    )
+
+
+class UserProfileFactory(BaseFactory):
+    class Meta:
+        model = UserProfile
+
+    user = factory.SubFactory(UserFactory)
+    country = "USA"
+    timezone = "UTC"
+
+
+class UserKYCFactory(BaseFactory):
+    class Meta:
+        model = UserKYC
+
+    user = factory.SubFactory(UserFactory)
+    status = KYCStatus.APPROVED
+    identity_verified = True
+    address_verified = True
+    email_verified = True
+    approved_at = _SESSION_NOW
+
+
+class CarbonProjectFactory(BaseFactory):
+    class Meta:
+        model = CarbonProject
+
+    name = "Test Reforestation Project"
+    project_type = ProjectType.REFORESTATION
+    status = ProjectStatus.ACTIVE
+    country = "BR"
+    description = "A test reforestation project"
+    total_credits = _DEC_10K
+    available_credits_count = _DEC_8K
+
+
+class CarbonCreditFactory(BaseFactory):
+    class Meta:
+        model = CarbonCredit
+
+    project = factory.SubFactory(CarbonProjectFactory)
+    serial_number = factory.Sequence(lambda n: f"CC-TEST-{n:08d}")
+    vintage_year = 2023
+    quantity = _DEC_100
+    status = CreditStatus.AVAILABLE
+    price_per_unit = _PRICE_25
+
+
+class PortfolioFactory(BaseFactory):
+    class Meta:
+        model = Portfolio
+
+    user = factory.SubFactory(UserFactory)
+    name = "Test Portfolio"
+    portfolio_type = PortfolioType.PERSONAL
+
+
+class OrderFactory(BaseFactory):
+    """Open limit buy order"""
+
+    class Meta:
+        model = Order
+
+    order_id = factory.Sequence(lambda n: f"ORD-TEST-{n:08d}")
+    user = factory.SubFactory(UserFactory)
+    project = factory.SubFactory(CarbonProjectFactory)
+    order_type = OrderType.LIMIT
+    side = OrderSide.BUY
+    status = OrderStatus.OPEN
+    quantity = _DEC_100
+    remaining_quantity = _DEC_100
+    filled_quantity = _DEC_0
+    price = _PRICE_45
+    credit_type = "VCS"
+    vintage_year = 2023
+
+
+class FilledOrderFactory(OrderFactory):
+    status = OrderStatus.FILLED
+    remaining_quantity = _DEC_0
+    filled_quantity = _DEC_100
+
+
+class TradeFactory(BaseFactory):
+    """Settled trade between two filled orders on the same project"""
+
+    class Meta:
+        model = Trade
+
+    project = factory.SubFactory(CarbonProjectFactory)
+    buy_order = factory.SubFactory(
+        FilledOrderFactory,
+        side=OrderSide.BUY,
+        project=factory.SelfAttribute("..project"),
+    )
+    sell_order = factory.SubFactory(
+        FilledOrderFactory,
+        side=OrderSide.SELL,
+        user=factory.SelfAttribute("..buy_order.user"),
+        project=factory.SelfAttribute("..project"),
+    )
+    quantity = _DEC_100
+    price = _PRICE_45
+    vintage_year = 2023
+    status = TradeStatus.SETTLED
+    credit_type = "VCS"
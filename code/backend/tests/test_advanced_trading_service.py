@@ -3,16 +3,21 @@ Comprehensive test suite for Advanced Trading Service
 Tests all trading algorithms, risk management, and portfolio optimization features
 """
 
+import importlib.util
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from decimal import Decimal
+from types import SimpleNamespace
 from typing import Any
-from unittest.mock import Mock, patch
+from unittest.mock import patch
 
 import numpy as np
 import pandas as pd
 import pytest
-from src.models.trading import OrderSide, OrderType
-from src.models.user import User
+from sklearn.covariance import LedoitWolf
+from sqlalchemy import select
+from src.models.trading import Order, OrderSide, OrderType, Portfolio
 from src.services.advanced_trading_service import (
     AdvancedTradingService,
     RiskMetrics,
@@ -20,239 +25,367 @@ from src.services.advanced_trading_service import (
     TradingSignal,
 )
 
+from tests.conftest import cached_date_range
 
-class TestAdvancedTradingService:
-    """Test suite for AdvancedTradingService"""
+_PRICE_8550 = Decimal("85.50")
+_QTY_100 = Decimal("100")
+_QTY_1K = Decimal("1000")
+_QTY_10K = Decimal("10000")
+# Finest total the four-place order columns can hold, and one they cannot
+_QTY_PRECISE = Decimal("1000.1237")
+_QTY_TOO_PRECISE = Decimal("1000.12345678")
 
-    @pytest.fixture(scope="class")
-    def app(self) -> Any:
-        """Create app context for advanced trading tests"""
-        import os
-        import tempfile
+# A 50-day slide, a gap up, then 16 days of small losses: SMA20 sits above
+# SMA50, RSI is 0 and MACD is still above its signal line, so momentum buys
+_MOMENTUM_CLOSES = np.concatenate(
+    [np.linspace(300.0, 100.0, 50), 200.0 - 0.1 * np.arange(16)]
+)
+# A quiet range around 100 that ends with a crash far below the lower band
+_MEAN_REVERSION_CLOSES = np.append(100.0 + np.resize([0.5, -0.5], 59), 50.0)
 
-        from src.main import create_app
 
-        db_fd, db_path = tempfile.mkstemp()
-        application = create_app("testing")
-        application.config.update(
-            {
-                "TESTING": True,
-                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
-            }
-        )
-        from src.models import db
+class _FakeQuery:
+    """Minimal query object answering filter_by(...).first()"""
 
-        with application.app_context():
-            db.create_all()
-            yield application
-        os.close(db_fd)
-        os.unlink(db_path)
+    def __init__(self, result: Any) -> None:
+        self._result = result
 
-    @pytest.fixture
-    def trading_service(self, app: Any) -> Any:
+    def filter_by(self, **kwargs: Any) -> "_FakeQuery":
+        return self
+
+    def first(self) -> Any:
+        return self._result
+
+
+class TestAdvancedTradingService:
+    """Test suite for AdvancedTradingService"""
+
+    @pytest.fixture(scope="class")
+    def trading_service(self, app: Any, tables: Any) -> Any:
         """Create a trading service instance for testing"""
-        with app.app_context():
-            service = AdvancedTradingService()
-            return service
+        return AdvancedTradingService()
+
+    @pytest.fixture
+    def portfolio_query(self, monkeypatch: Any) -> Any:
+        """Serve a canned portfolio from Portfolio.query"""
+        query = _FakeQuery(SimpleNamespace(id=1))
+        monkeypatch.setattr(Portfolio, "query", query)
+        return query
 
     @pytest.fixture
-    def mock_user(self) -> Any:
-        """Create a mock user for testing"""
-        user = Mock(spec=User)
-        user.id = 1
-        user.email = "test@example.com"
-        user.is_kyc_approved = True
-        user.risk_level = "medium"
-        return user
+    def mock_db_session(self) -> Any:
+        """Patch the database session used by order execution"""
+        with patch("src.models.db.session") as mock_session:
+            yield mock_session
 
     @pytest.fixture
-    def sample_price_data(self) -> Any:
-        """Create sample price data for testing"""
-        dates = pd.date_range(start="2023-01-01", end="2023-12-31", freq="D")
-        np.random.seed(42)
-        returns = np.random.normal(0.001, 0.02, len(dates))
-        prices = [100]
-        for ret in returns[1:]:
-            prices.append(prices[-1] * (1 + ret))
-        volumes = np.random.normal(10000, 2000, len(dates))
-        volumes = np.maximum(volumes, 1000)
-        return pd.DataFrame({"timestamp": dates, "close": prices, "volume": volumes})
-
-    def test_twap_order_execution(self, trading_service: Any, mock_user: Any) -> Any:
+    def mock_current_price(self, trading_service: Any, monkeypatch: Any) -> Any:
+        """Pin the current market price used by order execution"""
+        monkeypatch.setattr(
+            trading_service, "_get_current_price", lambda *args: _PRICE_8550
+        )
+
+    def test_twap_order_execution(
+        self,
+        trading_service: Any,
+        mock_user: Any,
+        mock_current_price: Any,
+        mock_db_session: Any,
+    ) -> Any:
         """Test TWAP (Time Weighted Average Price) order execution"""
-        with patch.object(
-            trading_service, "_get_current_price", return_value=Decimal("85.50")
-        ):
-            with patch("src.models.db.session") as mock_session:
-                child_orders = trading_service.execute_twap_order(
-                    user_id=mock_user.id,
-                    symbol="CARBON_CREDIT_A",
-                    total_quantity=Decimal("1000"),
-                    side=OrderSide.BUY,
-                    duration_minutes=60,
-                )
-                assert len(child_orders) > 0
-                assert len(child_orders) <= 20
-                total_child_quantity = sum((order.quantity for order in child_orders))
-                assert total_child_quantity == Decimal("1000")
-                assert all((order.side == OrderSide.BUY for order in child_orders))
-                assert all(
-                    (order.order_type == OrderType.LIMIT for order in child_orders)
-                )
-                mock_session.add.assert_called()
-                mock_session.commit.assert_called()
+        child_orders = trading_service.execute_twap_order(
+            user_id=mock_user.id,
+            symbol="CARBON_CREDIT_A",
+            total_quantity=_QTY_1K,
+            side=OrderSide.BUY,
+            duration_minutes=60,
+        )
+        assert len(child_orders) > 0
+        assert len(child_orders) <= 20
+        total_child_quantity = sum((order.quantity for order in child_orders))
+        assert total_child_quantity == _QTY_1K
+        assert all((order.side == OrderSide.BUY for order in child_orders))
+        assert all((order.order_type == OrderType.LIMIT for order in child_orders))
+        mock_db_session.add_all.assert_called_once()
+        mock_db_session.commit.assert_called()
+
+    def test_twap_conserves_quantity_in_database(
+        self,
+        trading_service: Any,
+        db_session: Any,
+        sample_user: Any,
+        mock_current_price: Any,
+    ) -> Any:
+        """Test TWAP children committed to the database sum to the total exactly"""
+        child_orders = trading_service.execute_twap_order(
+            user_id=sample_user.id,
+            symbol="CARBON_CREDIT_A",
+            total_quantity=_QTY_PRECISE,
+            side=OrderSide.BUY,
+            duration_minutes=60,
+        )
+        assert len(child_orders) == 12
+        db_session.expire_all()
+        stored = db_session.scalars(
+            select(Order.quantity).where(
+                Order.id.in_([order.id for order in child_orders])
+            )
+        ).all()
+        assert sum(stored) == _QTY_PRECISE
+        assert max(stored) - min(stored) == Decimal("0.0001")
 
-    def test_vwap_order_execution(self, trading_service: Any, mock_user: Any) -> Any:
+    def test_twap_rejects_quantity_finer_than_column(
+        self, trading_service: Any, mock_user: Any, mock_db_session: Any
+    ) -> Any:
+        """Test totals the order columns would round are refused up front"""
+        with pytest.raises(ValueError, match="at most 4 decimal places"):
+            trading_service.execute_twap_order(
+                user_id=mock_user.id,
+                symbol="CARBON_CREDIT_A",
+                total_quantity=_QTY_TOO_PRECISE,
+                side=OrderSide.BUY,
+            )
+        mock_db_session.add_all.assert_not_called()
+
+    def test_vwap_order_execution(
+        self,
+        trading_service: Any,
+        mock_user: Any,
+        mock_current_price: Any,
+        mock_db_session: Any,
+        monkeypatch: Any,
+    ) -> Any:
         """Test VWAP (Volume Weighted Average Price) order execution"""
-        volume_profile = {i: 1000 + i * 100 for i in range(24)}
-        with patch.object(
-            trading_service, "_get_volume_profile", return_value=volume_profile
-        ):
-            with patch.object(
-                trading_service, "_get_current_price", return_value=Decimal("85.50")
-            ):
-                with patch("src.models.db.session"):
-                    child_orders = trading_service.execute_vwap_order(
-                        user_id=mock_user.id,
-                        symbol="CARBON_CREDIT_A",
-                        total_quantity=Decimal("1000"),
-                        side=OrderSide.SELL,
-                        lookback_hours=24,
-                    )
-                    assert len(child_orders) > 0
-                    assert all((order.side == OrderSide.SELL for order in child_orders))
-                    total_child_quantity = sum(
-                        (order.quantity for order in child_orders)
-                    )
-                    assert abs(total_child_quantity - Decimal("1000")) < Decimal("1")
-
-    def test_iceberg_order_execution(self, trading_service: Any, mock_user: Any) -> Any:
-        """Test iceberg order execution"""
-        with patch.object(
-            trading_service, "_get_current_price", return_value=Decimal("85.50")
-        ):
-            with patch("src.models.db.session"):
-                iceberg_order = trading_service.execute_iceberg_order(
-                    user_id=mock_user.id,
-                    symbol="CARBON_CREDIT_A",
-                    total_quantity=Decimal("10000"),
-                    side=OrderSide.BUY,
-                    visible_quantity=Decimal("1000"),
-                )
-                assert iceberg_order.quantity == Decimal("10000")
-                assert iceberg_order.iceberg_visible_qty == Decimal("1000")
-                assert iceberg_order.iceberg_remaining_qty == Decimal("10000")
-                assert iceberg_order.side == OrderSide.BUY
-                assert iceberg_order.order_type == OrderType.LIMIT
-
-    def test_momentum_signal_generation(
-        self, trading_service: Any, sample_price_data: Any
+        volume_profile = np.arange(24) * 100.0 + 1000.0
+        monkeypatch.setattr(
+            trading_service, "_get_volume_profile", lambda *args: volume_profile
+        )
+        child_orders = trading_service.execute_vwap_order(
+            user_id=mock_user.id,
+            symbol="CARBON_CREDIT_A",
+            total_quantity=_QTY_1K,
+            side=OrderSide.SELL,
+            lookback_hours=24,
+        )
+        assert len(child_orders) > 0
+        assert all((order.side == OrderSide.SELL for order in child_orders))
+        total_child_quantity = sum((order.quantity for order in child_orders))
+        assert total_child_quantity == _QTY_1K
+
+    def test_vwap_conserves_quantity_in_database(
+        self,
+        trading_service: Any,
+        db_session: Any,
+        sample_user: Any,
+        mock_current_price: Any,
+        monkeypatch: Any,
     ) -> Any:
-        """Test momentum-based trading signal generation"""
-        with patch.object(
-            trading_service, "_get_price_history", return_value=sample_price_data
-        ):
-            signals = trading_service.generate_trading_signals(
-                symbol="CARBON_CREDIT_A", algorithm=TradingAlgorithm.MOMENTUM
+        """Test VWAP children committed to the database sum to the total exactly"""
+        volume_profile = np.arange(24) * 100.0 + 1000.0
+        monkeypatch.setattr(
+            trading_service, "_get_volume_profile", lambda *args: volume_profile
+        )
+        child_orders = trading_service.execute_vwap_order(
+            user_id=sample_user.id,
+            symbol="CARBON_CREDIT_A",
+            total_quantity=_QTY_PRECISE,
+            side=OrderSide.BUY,
+        )
+        assert len(child_orders) == 24
+        db_session.expire_all()
+        stored = db_session.scalars(
+            select(Order.quantity).where(
+                Order.id.in_([order.id for order in child_orders])
             )
-            assert isinstance(signals, list)
-            if signals:
-                signal = signals[0]
-                assert isinstance(signal, TradingSignal)
-                assert signal.symbol == "CARBON_CREDIT_A"
-                assert signal.signal_type in ["buy", "sell", "hold"]
-                assert 0 <= signal.strength <= 1
-                assert 0 <= signal.confidence <= 1
-                assert signal.timestamp is not None
-
-    def test_mean_reversion_signal_generation(
-        self, trading_service: Any, sample_price_data: Any
+        ).all()
+        assert sum(stored) == _QTY_PRECISE
+
+    def test_vwap_rejects_quantity_finer_than_column(
+        self, trading_service: Any, mock_user: Any, mock_db_session: Any
     ) -> Any:
-        """Test mean reversion trading signal generation"""
-        with patch.object(
-            trading_service, "_get_price_history", return_value=sample_price_data
-        ):
-            signals = trading_service.generate_trading_signals(
-                symbol="CARBON_CREDIT_A", algorithm=TradingAlgorithm.MEAN_REVERSION
+        """Test totals the order columns would round are refused up front"""
+        with pytest.raises(ValueError, match="at most 4 decimal places"):
+            trading_service.execute_vwap_order(
+                user_id=mock_user.id,
+                symbol="CARBON_CREDIT_A",
+                total_quantity=_QTY_TOO_PRECISE,
+                side=OrderSide.BUY,
             )
-            assert isinstance(signals, list)
-            if signals:
-                signal = signals[0]
-                assert isinstance(signal, TradingSignal)
-                assert signal.symbol == "CARBON_CREDIT_A"
-                assert signal.price_target is not None
-                assert signal.stop_loss is not None
+        mock_db_session.add_all.assert_not_called()
+
+    def test_iceberg_order_execution(
+        self,
+        trading_service: Any,
+        mock_user: Any,
+        mock_current_price: Any,
+        mock_db_session: Any,
+    ) -> Any:
+        """Test iceberg order execution"""
+        iceberg_order = trading_service.execute_iceberg_order(
+            user_id=mock_user.id,
+            symbol="CARBON_CREDIT_A",
+            total_quantity=_QTY_10K,
+            side=OrderSide.BUY,
+            visible_quantity=_QTY_1K,
+        )
+        assert iceberg_order.quantity == _QTY_10K
+        assert iceberg_order.iceberg_visible_qty == _QTY_1K
+        assert iceberg_order.iceberg_remaining_qty == _QTY_10K
+        assert iceberg_order.side == OrderSide.BUY
+        assert iceberg_order.order_type == OrderType.LIMIT
+
+    @pytest.mark.parametrize(
+        "algorithm, closes",
+        [
+            (TradingAlgorithm.MOMENTUM, _MOMENTUM_CLOSES),
+            (TradingAlgorithm.MEAN_REVERSION, _MEAN_REVERSION_CLOSES),
+        ],
+        ids=["momentum", "mean-reversion"],
+    )
+    def test_signal_generation(
+        self,
+        trading_service: Any,
+        monkeypatch: Any,
+        algorithm: TradingAlgorithm,
+        closes: Any,
+    ) -> Any:
+        """Test momentum and mean reversion trading signal generation"""
+        price_data = pd.DataFrame({"close": closes})
+        monkeypatch.setattr(
+            trading_service, "_get_price_history", lambda symbol, days: price_data
+        )
+        signals = trading_service.generate_trading_signals(
+            symbol="CARBON_CREDIT_A", algorithm=algorithm
+        )
+        assert len(signals) >= 1
+        signal = signals[0]
+        last_close = Decimal(str(closes[-1]))
+        assert isinstance(signal, TradingSignal)
+        assert signal.symbol == "CARBON_CREDIT_A"
+        assert signal.signal_type == "buy"
+        assert 0.4 < signal.strength <= 1
+        assert 0 < signal.confidence < signal.strength
+        assert signal.timestamp is not None
+        # A buy targets above the last close and stops out below it
+        assert signal.price_target > last_close
+        assert signal.stop_loss < last_close
 
     def test_portfolio_risk_calculation(
-        self, trading_service: Any, mock_user: Any
+        self,
+        trading_service: Any,
+        mock_user: Any,
+        portfolio_query: Any,
+        portfolio_returns_normal: Any,
+        monkeypatch: Any,
     ) -> Any:
         """Test portfolio risk metrics calculation"""
-        mock_portfolio = Mock()
-        mock_portfolio.id = 1
-        with patch("src.models.trading.Portfolio.query") as mock_portfolio_query:
-            mock_portfolio_query.filter_by.return_value.first.return_value = (
-                mock_portfolio
-            )
-            with patch.object(
-                trading_service, "_get_portfolio_holdings_data"
-            ) as mock_holdings:
-                mock_holdings.return_value = pd.DataFrame(
-                    {
-                        "asset": ["CARBON_CREDIT_A", "CARBON_CREDIT_B"],
-                        "quantity": [100, 200],
-                        "value": [10000, 15000],
-                    }
-                )
-                with patch.object(
-                    trading_service, "_calculate_portfolio_returns"
-                ) as mock_returns:
-                    np.random.seed(42)
-                    mock_returns.return_value = np.random.normal(0.001, 0.02, 252)
-                    risk_metrics = trading_service.calculate_portfolio_risk(
-                        mock_user.id
-                    )
-                    assert isinstance(risk_metrics, RiskMetrics)
-                    assert isinstance(risk_metrics.var_95, Decimal)
-                    assert isinstance(risk_metrics.var_99, Decimal)
-                    assert isinstance(risk_metrics.expected_shortfall, Decimal)
-                    assert isinstance(risk_metrics.max_drawdown, Decimal)
-                    assert isinstance(risk_metrics.sharpe_ratio, float)
-                    assert isinstance(risk_metrics.beta, float)
-                    assert isinstance(risk_metrics.volatility, float)
-                    assert risk_metrics.var_95 < 0
-                    assert risk_metrics.var_99 < risk_metrics.var_95
-                    assert risk_metrics.volatility > 0
-
-    def test_portfolio_optimization(self, trading_service: Any, mock_user: Any) -> Any:
+        holdings = pd.DataFrame(
+            {
+                "asset": ["CARBON_CREDIT_A", "CARBON_CREDIT_B"],
+                "quantity": [100, 200],
+                "value": [10000, 15000],
+            }
+        )
+        monkeypatch.setattr(
+            trading_service, "_get_portfolio_holdings_data", lambda *args: holdings
+        )
+        monkeypatch.setattr(
+            trading_service,
+            "_calculate_portfolio_returns",
+            lambda *args: portfolio_returns_normal,
+        )
+        risk_metrics = trading_service.calculate_portfolio_risk(mock_user.id)
+        assert isinstance(risk_metrics, RiskMetrics)
+        assert isinstance(risk_metrics.var_95, Decimal)
+        assert isinstance(risk_metrics.var_99, Decimal)
+        assert isinstance(risk_metrics.expected_shortfall, Decimal)
+        assert isinstance(risk_metrics.max_drawdown, Decimal)
+        assert isinstance(risk_metrics.sharpe_ratio, float)
+        assert isinstance(risk_metrics.beta, float)
+        assert isinstance(risk_metrics.volatility, float)
+        assert risk_metrics.var_95 < 0
+        assert risk_metrics.var_99 < risk_metrics.var_95
+        assert risk_metrics.volatility > 0
+
+    def test_portfolio_optimization(
+        self, trading_service: Any, mock_user: Any, monkeypatch: Any
+    ) -> Any:
         """Test portfolio optimization using Modern Portfolio Theory"""
         mock_assets = ["CARBON_CREDIT_A", "CARBON_CREDIT_B", "CARBON_CREDIT_C"]
-        with patch.object(
-            trading_service, "_get_available_assets", return_value=mock_assets
-        ):
-
-            def mock_price_history(asset, days):
-                np.random.seed(hash(asset) % 2**32)
-                dates = pd.date_range(start="2023-01-01", periods=days, freq="D")
-                prices = np.random.normal(100, 10, days)
-                prices = np.maximum(prices, 50)
-                return pd.DataFrame({"timestamp": dates, "close": prices})
-
-            with patch.object(
-                trading_service, "_get_price_history", side_effect=mock_price_history
-            ):
-                optimized_weights = trading_service.optimize_portfolio(
-                    user_id=mock_user.id, risk_tolerance="moderate"
+        # optimize_portfolio asks for a year of trading days per asset
+        days = 252
+        dates = cached_date_range("2023-01-01", days)
+        frames = {}
+        for seed, asset in enumerate(mock_assets):
+            prices = np.random.default_rng(seed).normal(100, 10, days)
+            np.maximum(prices, 50, out=prices)
+            frames[asset] = pd.DataFrame(
+                {"timestamp": dates, "close": prices}, copy=False
+            )
+        monkeypatch.setattr(
+            trading_service, "_get_available_assets", lambda: mock_assets
+        )
+        monkeypatch.setattr(
+            trading_service, "_get_price_history", lambda asset, days: frames[asset]
+        )
+        optimized_weights = trading_service.optimize_portfolio(
+            user_id=mock_user.id, risk_tolerance="moderate"
+        )
+        assert isinstance(optimized_weights, dict)
+        assert len(optimized_weights) == len(mock_assets)
+        total_weight = sum(optimized_weights.values())
+        assert abs(total_weight - 1.0) < 0.01
+        assert all((weight >= 0 for weight in optimized_weights.values()))
+        assert all((weight <= 0.4 for weight in optimized_weights.values()))
+
+    def test_portfolio_optimization_follows_risk_tolerance(
+        self, trading_service: Any, mock_user: Any, monkeypatch: Any
+    ) -> Any:
+        """Test risk tolerance sets the volatility ceiling under a shared weight cap"""
+        assets = ["CARBON_CREDIT_A", "CARBON_CREDIT_B", "CARBON_CREDIT_C", "CARBON_D"]
+        log_returns = np.random.default_rng(7).normal(
+            [0.004, 0.0005, 0.002, 0.003], [0.025, 0.004, 0.012, 0.018], (252, 4)
+        )
+        closes = 100 * np.exp(np.cumsum(log_returns, axis=0))
+        frames = {
+            asset: pd.DataFrame({"close": closes[:, i]})
+            for i, asset in enumerate(assets)
+        }
+        monkeypatch.setattr(trading_service, "_get_available_assets", lambda: assets)
+        monkeypatch.setattr(
+            trading_service, "_get_price_history", lambda asset, days: frames[asset]
+        )
+        covariance = LedoitWolf().fit(np.diff(np.log(closes), axis=0)).covariance_
+        volatilities = {}
+        for tolerance in ["conservative", "moderate", "aggressive"]:
+            weights = np.array(
+                list(
+                    trading_service.optimize_portfolio(
+                        user_id=mock_user.id, risk_tolerance=tolerance
+                    ).values()
                 )
-                assert isinstance(optimized_weights, dict)
-                assert len(optimized_weights) == len(mock_assets)
-                total_weight = sum(optimized_weights.values())
-                assert abs(total_weight - 1.0) < 0.01
-                assert all((weight >= 0 for weight in optimized_weights.values()))
-                assert all((weight <= 0.4 for weight in optimized_weights.values()))
+            )
+            assert weights.sum() == pytest.approx(1.0)
+            assert weights.min() >= 0
+            assert weights.max() <= 0.4 + 1e-9
+            volatilities[tolerance] = float(
+                np.sqrt(weights @ covariance @ weights * 252)
+            )
+        # The capped max-Sharpe mix is too volatile for the two lower ceilings
+        assert volatilities["conservative"] == pytest.approx(0.1, abs=1e-6)
+        assert volatilities["moderate"] == pytest.approx(0.15, abs=1e-6)
+        assert volatilities["aggressive"] < 0.25
+        assert (
+            volatilities["conservative"]
+            < volatilities["moderate"]
+            < volatilities["aggressive"]
+        )
 
     def test_rsi_calculation(self, trading_service: Any) -> Any:
         """Test RSI (Relative Strength Index) calculation"""
-        prices = pd.Series([100, 102, 101, 103, 105, 104, 106, 108, 107, 109])
+        prices = pd.Series(
+            np.array([100, 102, 101, 103, 105, 104, 106, 108, 107, 109], dtype=float)
+        )
         rsi = trading_service._calculate_rsi(prices, period=5)
         assert not rsi.isna().all()
         valid_rsi = rsi.dropna()
@@ -260,110 +393,129 @@ class TestAdvancedTradingService:
 
     def test_macd_calculation(self, trading_service: Any) -> Any:
         """Test MACD calculation"""
-        prices = pd.Series(range(100, 150))
+        prices = pd.Series(np.arange(100.0, 150.0))
         macd, signal = trading_service._calculate_macd(prices)
         assert not macd.isna().all()
         assert not signal.isna().all()
         assert len(macd) == len(signal)
         assert len(macd) == len(prices)
 
+    @pytest.mark.parametrize(
+        "method_name, kwargs",
+        [
+            (
+                "execute_twap_order",
+                {"total_quantity": Decimal("-100"), "duration_minutes": 60},
+            ),
+            (
+                "execute_twap_order",
+                {"total_quantity": _QTY_100, "duration_minutes": 0},
+            ),
+            (
+                "execute_iceberg_order",
+                {
+                    "total_quantity": _QTY_1K,
+                    "visible_quantity": Decimal("1500"),
+                },
+            ),
+        ],
+        ids=["twap-negative-quantity", "twap-zero-duration", "iceberg-too-visible"],
+    )
     def test_invalid_order_parameters(
-        self, trading_service: Any, mock_user: Any
+        self, trading_service: Any, mock_user: Any, method_name: str, kwargs: Any
     ) -> Any:
         """Test handling of invalid order parameters"""
         with pytest.raises(ValueError):
-            trading_service.execute_twap_order(
-                user_id=mock_user.id,
-                symbol="CARBON_CREDIT_A",
-                total_quantity=Decimal("-100"),
-                side=OrderSide.BUY,
-                duration_minutes=60,
-            )
-        with pytest.raises(ValueError):
-            trading_service.execute_twap_order(
+            getattr(trading_service, method_name)(
                 user_id=mock_user.id,
                 symbol="CARBON_CREDIT_A",
-                total_quantity=Decimal("100"),
                 side=OrderSide.BUY,
-                duration_minutes=0,
-            )
-        with pytest.raises(ValueError):
-            trading_service.execute_iceberg_order(
-                user_id=mock_user.id,
-                symbol="CARBON_CREDIT_A",
-                total_quantity=Decimal("1000"),
-                side=OrderSide.BUY,
-                visible_quantity=Decimal("1500"),
+                **kwargs,
             )
 
-    def test_price_data_validation(self, trading_service: Any) -> Any:
+    def test_price_data_validation(self, trading_service: Any, monkeypatch: Any) -> Any:
         """Test price data validation and error handling"""
         insufficient_data = pd.DataFrame(
             {
-                "timestamp": pd.date_range("2023-01-01", periods=5, freq="D"),
+                "timestamp": cached_date_range("2023-01-01", 5),
                 "close": [100, 101, 102, 103, 104],
                 "volume": [1000, 1100, 1200, 1300, 1400],
             }
         )
-        with patch.object(
-            trading_service, "_get_price_history", return_value=insufficient_data
-        ):
-            signals = trading_service.generate_trading_signals(
-                symbol="CARBON_CREDIT_A", algorithm=TradingAlgorithm.MOMENTUM
-            )
-            assert signals == []
-
-    def test_risk_metrics_edge_cases(self, trading_service: Any, mock_user: Any) -> Any:
+        monkeypatch.setattr(
+            trading_service,
+            "_get_price_history",
+            lambda symbol, days: insufficient_data,
+        )
+        signals = trading_service.generate_trading_signals(
+            symbol="CARBON_CREDIT_A", algorithm=TradingAlgorithm.MOMENTUM
+        )
+        assert signals == []
+
+    def test_risk_metrics_edge_cases(
+        self,
+        trading_service: Any,
+        mock_user: Any,
+        portfolio_query: Any,
+        portfolio_returns_zeros: Any,
+        monkeypatch: Any,
+    ) -> Any:
         """Test risk metrics calculation with edge cases"""
-        mock_portfolio = Mock()
-        mock_portfolio.id = 1
-        with patch("src.models.trading.Portfolio.query") as mock_portfolio_query:
-            mock_portfolio_query.filter_by.return_value.first.return_value = (
-                mock_portfolio
-            )
-            with patch.object(
-                trading_service, "_get_portfolio_holdings_data"
-            ) as mock_holdings:
-                mock_holdings.return_value = pd.DataFrame(
-                    {"asset": ["CARBON_CREDIT_A"], "quantity": [100], "value": [10000]}
-                )
-                with patch.object(
-                    trading_service, "_calculate_portfolio_returns"
-                ) as mock_returns:
-                    mock_returns.return_value = np.zeros(252)
-                    risk_metrics = trading_service.calculate_portfolio_risk(
-                        mock_user.id
-                    )
-                    assert risk_metrics.var_95 == Decimal("0")
-                    assert risk_metrics.var_99 == Decimal("0")
-                    assert risk_metrics.volatility == 0.0
+        holdings = pd.DataFrame(
+            {"asset": ["CARBON_CREDIT_A"], "quantity": [100], "value": [10000]}
+        )
+        monkeypatch.setattr(
+            trading_service, "_get_portfolio_holdings_data", lambda *args: holdings
+        )
+        monkeypatch.setattr(
+            trading_service,
+            "_calculate_portfolio_returns",
+            lambda *args: portfolio_returns_zeros,
+        )
+        risk_metrics = trading_service.calculate_portfolio_risk(mock_user.id)
+        assert risk_metrics.var_95 == Decimal("0")
+        assert risk_metrics.var_99 == Decimal("0")
+        assert risk_metrics.volatility == 0.0
 
     def test_concurrent_order_execution(
-        self, trading_service: Any, mock_user: Any
+        self,
+        trading_service: Any,
+        mock_user: Any,
+        mock_current_price: Any,
+        mock_db_session: Any,
     ) -> Any:
         """Test handling of concurrent order execution"""
-        with patch.object(
-            trading_service, "_get_current_price", return_value=Decimal("85.50")
-        ):
-            with patch("src.models.db.session"):
-                orders1 = trading_service.execute_twap_order(
-                    user_id=mock_user.id,
-                    symbol="CARBON_CREDIT_A",
-                    total_quantity=Decimal("1000"),
-                    side=OrderSide.BUY,
-                    duration_minutes=60,
-                )
-                orders2 = trading_service.execute_twap_order(
-                    user_id=mock_user.id,
-                    symbol="CARBON_CREDIT_A",
-                    total_quantity=Decimal("500"),
-                    side=OrderSide.SELL,
-                    duration_minutes=30,
-                )
-                assert len(orders1) > 0
-                assert len(orders2) > 0
-                assert all((order.side == OrderSide.BUY for order in orders1))
-                assert all((order.side == OrderSide.SELL for order in orders2))
+        added = []
+        lock = threading.Lock()
+
+        def record_add_all(orders: Any) -> None:
+            with lock:
+                added.extend(orders)
+
+        mock_db_session.add_all.side_effect = record_add_all
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            future1 = executor.submit(
+                trading_service.execute_twap_order,
+                user_id=mock_user.id,
+                symbol="CARBON_CREDIT_A",
+                total_quantity=_QTY_1K,
+                side=OrderSide.BUY,
+                duration_minutes=60,
+            )
+            future2 = executor.submit(
+                trading_service.execute_twap_order,
+                user_id=mock_user.id,
+                symbol="CARBON_CREDIT_A",
+                total_quantity=Decimal("500"),
+                side=OrderSide.SELL,
+                duration_minutes=30,
+            )
+            orders1, orders2 = future1.result(), future2.result()
+        assert len(added) == len(orders1) + len(orders2)
+        assert len(orders1) > 0
+        assert len(orders2) > 0
+        assert all((order.side == OrderSide.BUY for order in orders1))
+        assert all((order.side == OrderSide.SELL for order in orders2))
 
 
 class TestTradingSignal:
@@ -420,108 +572,130 @@ class TestRiskMetrics:
         assert risk_metrics.volatility == 0.128
 
 
-@pytest.fixture(scope="session")
-def test_database() -> Any:
-    """Set up test database for integration tests"""
+@pytest.mark.skipif(
+    importlib.util.find_spec("pytest_benchmark") is None,
+    reason="pytest-benchmark is not installed",
+)
+class TestPerformanceBenchmarks:
+    """Microbenchmarks for the numeric trading paths"""
 
+    SERIES_LENGTH = 5000
 
-class TestTradingServiceIntegration:
-    """Integration tests for trading service with database"""
+    @pytest.fixture(scope="class")
+    def trading_service(self, app: Any) -> Any:
+        return AdvancedTradingService()
 
     @pytest.fixture(scope="class")
-    def app(self) -> Any:
-        """Create app context for integration tests"""
-        import os
-        import tempfile
+    def prices(self) -> Any:
+        rng = np.random.default_rng(0)
+        return pd.Series(rng.normal(100, 5, self.SERIES_LENGTH))
 
-        from src.main import create_app
+    def test_rsi_benchmark(
+        self, benchmark: Any, trading_service: Any, prices: Any
+    ) -> Any:
+        benchmark.extra_info["size"] = len(prices)
+        rsi = benchmark(trading_service._calculate_rsi, prices, 14)
+        assert len(rsi) == len(prices)
 
-        db_fd, db_path = tempfile.mkstemp()
-        application = create_app("testing")
-        application.config.update(
-            {
-                "TESTING": True,
-                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
-            }
+    def test_macd_benchmark(
+        self, benchmark: Any, trading_service: Any, prices: Any
+    ) -> Any:
+        benchmark.extra_info["size"] = len(prices)
+        macd, signal_line = benchmark(trading_service._calculate_macd, prices)
+        assert len(macd) == len(signal_line) == len(prices)
+
+    def test_portfolio_risk_benchmark(
+        self, benchmark: Any, trading_service: Any, monkeypatch: Any
+    ) -> Any:
+        returns = np.random.default_rng(0).normal(0.001, 0.02, self.SERIES_LENGTH)
+        holdings = pd.DataFrame({"asset": ["A"], "quantity": [100], "value": [5000]})
+        monkeypatch.setattr(Portfolio, "query", _FakeQuery(SimpleNamespace(id=1)))
+        monkeypatch.setattr(
+            trading_service, "_get_portfolio_holdings_data", lambda _: holdings
         )
-        from src.models import db
+        monkeypatch.setattr(
+            trading_service, "_calculate_portfolio_returns", lambda _: returns
+        )
+        benchmark.extra_info["size"] = len(returns)
+        risk = benchmark(trading_service.calculate_portfolio_risk, 1)
+        assert isinstance(risk, RiskMetrics)
 
-        with application.app_context():
-            db.create_all()
-            yield application
-        os.close(db_fd)
-        os.unlink(db_path)
+    def test_optimize_portfolio_benchmark(
+        self, benchmark: Any, trading_service: Any, prices: Any, monkeypatch: Any
+    ) -> Any:
+        assets = ["CARBON_CREDIT_A", "CARBON_CREDIT_B", "CARBON_CREDIT_C"]
+        history = pd.DataFrame({"close": prices.to_numpy()})
+        monkeypatch.setattr(trading_service, "_get_available_assets", lambda: assets)
+        monkeypatch.setattr(
+            trading_service, "_get_price_history", lambda asset, days: history
+        )
+        benchmark.extra_info["size"] = len(history)
+        weights = benchmark(trading_service.optimize_portfolio, 1)
+        assert set(weights) == set(assets)
 
-    @pytest.fixture
-    def trading_service(self, app: Any) -> Any:
-        """Create trading service with app context"""
-        with app.app_context():
-            return AdvancedTradingService()
 
-    @pytest.fixture
-    def mock_user(self) -> Any:
-        """Mock user for integration tests"""
-        from unittest.mock import Mock
+@pytest.fixture(scope="session")
+def test_database() -> Any:
+    """Set up test database for integration tests"""
 
-        user = Mock()
-        user.id = 1
-        user.email = "integration@example.com"
-        return user
+
+class TestTradingServiceIntegration:
+    """Integration tests for trading service with database"""
+
+    @pytest.fixture(scope="class")
+    def trading_service(self, app: Any, tables: Any) -> Any:
+        """Create trading service with app context"""
+        return AdvancedTradingService()
 
     @pytest.mark.integration
-    def test_full_trading_workflow(
-        self, trading_service: Any, mock_user: Any, app: Any
-    ) -> Any:
+    def test_full_trading_workflow(self, trading_service: Any, mock_user: Any) -> Any:
         """Test complete trading workflow from signal generation to execution"""
-        with app.app_context():
-            from unittest.mock import patch
+        from unittest.mock import patch
 
-            with patch.object(trading_service, "_get_price_history") as mock_ph:
-                import numpy as np
-                import pandas as pd
+        with patch.object(trading_service, "_get_price_history") as mock_ph:
+            import numpy as np
+            import pandas as pd
 
-                dates = pd.date_range(start="2023-01-01", periods=60, freq="D")
-                np.random.seed(42)
-                prices = np.random.normal(100, 5, 60)
-                mock_ph.return_value = pd.DataFrame(
-                    {"timestamp": dates, "close": prices, "volume": np.ones(60) * 1000}
-                )
-                signals = trading_service.generate_trading_signals(
-                    "CARBON_TEST", TradingAlgorithm.MOMENTUM
-                )
-                assert isinstance(signals, list)
+            dates = cached_date_range("2023-01-01", 60)
+            prices = np.random.default_rng(42).normal(100, 5, 60)
+            mock_ph.return_value = pd.DataFrame(
+                {"timestamp": dates, "close": prices, "volume": np.ones(60) * 1000}
+            )
+            signals = trading_service.generate_trading_signals(
+                "CARBON_TEST", TradingAlgorithm.MOMENTUM
+            )
+            assert isinstance(signals, list)
 
     @pytest.mark.integration
     def test_risk_management_integration(
-        self, trading_service: Any, mock_user: Any, app: Any
+        self, trading_service: Any, mock_user: Any
     ) -> Any:
         """Test integration between trading service and risk management"""
-        with app.app_context():
-            from unittest.mock import patch
+        from unittest.mock import patch
 
-            import numpy as np
+        import numpy as np
 
-            with patch("src.models.trading.Portfolio.query") as mock_pq:
-                from unittest.mock import Mock
+        with patch("src.models.trading.Portfolio.query") as mock_pq:
+            from unittest.mock import Mock
 
-                mock_p = Mock()
-                mock_p.id = 1
-                mock_pq.filter_by.return_value.first.return_value = mock_p
+            mock_p = Mock()
+            mock_p.id = 1
+            mock_pq.filter_by.return_value.first.return_value = mock_p
+            with patch.object(
+                trading_service, "_get_portfolio_holdings_data"
+            ) as mock_hd:
+                import pandas as pd
+
+                mock_hd.return_value = pd.DataFrame(
+                    {"asset": ["A"], "quantity": [100], "value": [5000]}
+                )
                 with patch.object(
-                    trading_service, "_get_portfolio_holdings_data"
-                ) as mock_hd:
-                    import pandas as pd
-
-                    mock_hd.return_value = pd.DataFrame(
-                        {"asset": ["A"], "quantity": [100], "value": [5000]}
-                    )
-                    with patch.object(
-                        trading_service, "_calculate_portfolio_returns"
-                    ) as mock_r:
-                        np.random.seed(1)
-                        mock_r.return_value = np.random.normal(0.001, 0.02, 252)
-                        risk = trading_service.calculate_portfolio_risk(mock_user.id)
-                        assert isinstance(risk, RiskMetrics)
+                    trading_service, "_calculate_portfolio_returns"
+                ) as mock_r:
+                    rng = np.random.default_rng(1)
+                    mock_r.return_value = rng.normal(0.001, 0.02, 252)
+                    risk = trading_service.calculate_portfolio_risk(mock_user.id)
+                    assert isinstance(risk, RiskMetrics)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,124 @@
+"""
+Tests for batched audit logging
+"""
+
+import queue
+from typing import Any, Dict, List
+
+import pytest
+from sqlalchemy import select
+from src.models.user import UserAuditLog
+from src.services.audit_service import AuditService
+from src.utils import BackgroundTaskManager
+
+from tests.conftest import force_commit_error
+from tests.factories import bulk_create_users
+
+
+class TestQueuedAuditEvents:
+    """Test suite for AuditService.queue_event and write_events"""
+
+    @pytest.fixture
+    def audit_service(self, app: Any) -> Any:
+        return AuditService()
+
+    @pytest.fixture
+    def queued(self, monkeypatch: Any) -> Any:
+        """Capture audit batches instead of writing them from the worker"""
+        batches: List[List[Dict[str, Any]]] = []
+        monkeypatch.setitem(
+            BackgroundTaskManager._handlers, "audit.log", batches.append
+        )
+        yield batches
+        BackgroundTaskManager.wait_for_tasks()
+
+    def test_queue_event_captures_request_context(
+        self, app: Any, audit_service: Any, queued: Any
+    ) -> Any:
+        """Test the queued row carries the caller's IP and user agent"""
+        with app.test_request_context(
+            headers={"User-Agent": "pytest", "X-Forwarded-For": "203.0.113.7"}
+        ):
+            assert audit_service.queue_event(
+                "order_created", "trading", "Order placed", user_id=7
+            )
+        BackgroundTaskManager.wait_for_tasks()
+        assert len(queued) == 1
+        (event,) = queued[0]
+        assert event["event_type"] == "order_created"
+        assert event["user_id"] == 7
+        assert event["ip_address"] == "203.0.113.7"
+        assert event["user_agent"] == "pytest"
+        assert event["created_at"].tzinfo is not None
+
+    def test_queue_event_disabled_queues_nothing(
+        self, audit_service: Any, queued: Any
+    ) -> Any:
+        """Test a disabled service reports success without queuing"""
+        audit_service.enabled = False
+        assert audit_service.queue_event("login", "security", "Login") is True
+        BackgroundTaskManager.wait_for_tasks()
+        assert queued == []
+
+    def test_full_queue_writes_synchronously(
+        self, audit_service: Any, db_session: Any, monkeypatch: Any
+    ) -> Any:
+        """Test an event that cannot be queued is still persisted"""
+        (user,) = bulk_create_users(db_session, 1)
+
+        def put_nowait(item: Any) -> None:
+            raise queue.Full
+
+        monkeypatch.setattr(BackgroundTaskManager._queue, "put_nowait", put_nowait)
+        assert audit_service.queue_event("login", "security", "Login", user_id=user.id)
+        rows = db_session.scalars(
+            select(UserAuditLog).where(UserAuditLog.user_id == user.id)
+        ).all()
+        assert [row.event_type for row in rows] == ["login"]
+
+    def test_log_event_uses_built_event(
+        self, app: Any, audit_service: Any, db_session: Any
+    ) -> Any:
+        """Test a synchronous event captures the same context as a queued one"""
+        (user,) = bulk_create_users(db_session, 1)
+        with app.test_request_context(
+            headers={"User-Agent": "pytest", "X-Forwarded-For": "203.0.113.7"}
+        ):
+            assert audit_service.log_event(
+                "login", "security", "Login", user_id=user.id
+            )
+        row = db_session.scalars(
+            select(UserAuditLog).where(UserAuditLog.user_id == user.id)
+        ).one()
+        assert (row.ip_address, row.user_agent) == ("203.0.113.7", "pytest")
+        assert row.created_at is not None
+
+    def test_write_events_persists_the_batch(self, db_session: Any) -> Any:
+        """Test a batch of built events is inserted in one commit"""
+        users = bulk_create_users(db_session, 2)
+        events = [
+            AuditService.build_event(
+                "user_activated", "user", "Activated", user_id=user.id
+            )
+            for user in users
+        ]
+        AuditService.write_events(events)
+        rows = db_session.scalars(
+            select(UserAuditLog).where(
+                UserAuditLog.user_id.in_([user.id for user in users])
+            )
+        ).all()
+        assert sorted(row.user_id for row in rows) == [user.id for user in users]
+        assert {row.event_type for row in rows} == {"user_activated"}
+
+    def test_write_events_rolls_back_on_failure(self, db_session: Any) -> Any:
+        """Test a failed commit is logged, rolled back and not raised"""
+        (user,) = bulk_create_users(db_session, 1)
+        db_session.commit()
+        event = AuditService.build_event("login", "security", "Login", user_id=user.id)
+        with force_commit_error(db_session):
+            AuditService.write_events([event])
+        rows = db_session.scalars(
+            select(UserAuditLog).where(UserAuditLog.user_id == user.id)
+        ).all()
+        assert rows == []
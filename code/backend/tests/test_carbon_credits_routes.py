@@ -9,6 +9,8 @@ from typing import Any
 import pytest
 from src.models.user import RiskLevel, User, UserRole, UserStatus
 
+from tests.conftest import login_token
+
 # ---------------------------------------------------------------------------
 # Fixtures
 # ---------------------------------------------------------------------------
@@ -28,29 +30,15 @@ def admin_user(db_session: Any) -> Any:
     from datetime import datetime, timezone
 
     user.email_verified_at = datetime.now(timezone.utc)
-    db_session.add(user)
-    db_session.commit()
+    with db_session.begin_nested():
+        db_session.add(user)
     db_session.refresh(user)
     return user
 
 
 def _login(client: Any, user: Any) -> str:
     """Return a JWT access token for the given user."""
-    resp = client.post(
-        "/api/auth/login",
-        json={"email": user.email, "password": "AdminPass123!"},
-        content_type="application/json",
-    )
-    if resp.status_code != 200:
-        resp2 = client.post(
-            "/api/auth/login",
-            json={"email": user.email, "password": "TestPassword123!"},
-            content_type="application/json",
-        )
-        data = resp2.get_json() or {}
-    else:
-        data = resp.get_json() or {}
-    return data.get("access_token", "")
+    return login_token(client, user, "AdminPass123!", "TestPassword123!")
 
 
 # ---------------------------------------------------------------------------
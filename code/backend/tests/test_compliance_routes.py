@@ -20,6 +20,8 @@ from src.models.compliance import (
 )
 from src.models.user import RiskLevel, User, UserRole, UserStatus
 
+from tests.conftest import login_token
+
 # ---------------------------------------------------------------------------
 # Fixtures
 # ---------------------------------------------------------------------------
@@ -41,8 +43,8 @@ def admin_user(db_session: Any) -> Any:
         role=UserRole.ADMIN,
     )
     user.email_verified_at = datetime.now(timezone.utc)
-    db_session.add(user)
-    db_session.commit()
+    with db_session.begin_nested():
+        db_session.add(user)
     db_session.refresh(user)
     return user
 
@@ -59,8 +61,8 @@ def sample_compliance_record(db_session: Any, sample_user: Any) -> Any:
         rule_description="Routine AML screening check",
         status=ComplianceStatus.PENDING_REVIEW,
     )
-    db_session.add(record)
-    db_session.commit()
+    with db_session.begin_nested():
+        db_session.add(record)
     db_session.refresh(record)
     return record
 
@@ -80,20 +82,14 @@ def sample_report(db_session: Any, admin_user: Any) -> Any:
         prepared_by=admin_user.id,
         description="Quarterly AML report",
     )
-    db_session.add(report)
-    db_session.commit()
+    with db_session.begin_nested():
+        db_session.add(report)
     db_session.refresh(report)
     return report
 
 
 def _login(client: Any, user: Any, password: str) -> str:
-    resp = client.post(
-        "/api/auth/login",
-        json={"email": user.email, "password": password},
-        content_type="application/json",
-    )
-    data = resp.get_json() or {}
-    return data.get("access_token", "")
+    return login_token(client, user, password)
 
 
 # ---------------------------------------------------------------------------
@@ -181,7 +177,7 @@ class TestGetComplianceRecords:
             status=ComplianceStatus.COMPLIANT,
         )
         db.session.add(rec)
-        db.session.commit()
+        db.session.flush()
 
         token = _login(client, sample_user, USER_PASS)
         resp = client.get(
@@ -36,8 +36,8 @@ def sample_market_data(db_session: Any, sample_project: Any) -> Any:
         data_source="test",
         timestamp=datetime.now(timezone.utc),
     )
-    db_session.add(entry)
-    db_session.commit()
+    with db_session.begin_nested():
+        db_session.add(entry)
     db_session.refresh(entry)
     return entry
 
@@ -67,9 +67,9 @@ def sample_price_history(db_session: Any, sample_project: Any) -> Any:
             timeframe=TimeFrame.DAY_1,
             data_source="test",
         )
-        db_session.add(ph)
         entries.append(ph)
-    db_session.commit()
+    with db_session.begin_nested():
+        db_session.add_all(entries)
     return entries
 
 
@@ -106,13 +106,9 @@ def sample_settled_trade(db_session: Any, sample_user: Any, sample_project: Any)
         vintage_year=2023,
         project_id=sample_project.id,
     )
-    db_session.add(buy_order)
-    db_session.add(sell_order)
-    db_session.flush()
-
     trade = Trade(
-        buy_order_id=buy_order.id,
-        sell_order_id=sell_order.id,
+        buy_order=buy_order,
+        sell_order=sell_order,
         quantity=Decimal("100"),
         price=Decimal("26.50"),
         vintage_year=2023,
@@ -121,8 +117,8 @@ def sample_settled_trade(db_session: Any, sample_user: Any, sample_project: Any)
         credit_type="VCS",
         executed_at=datetime.now(timezone.utc),
     )
-    db_session.add(trade)
-    db_session.commit()
+    with db_session.begin_nested():
+        db_session.add_all([buy_order, sell_order, trade])
     db_session.refresh(trade)
     return trade
 
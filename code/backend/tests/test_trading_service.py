@@ -3,19 +3,68 @@ Comprehensive tests for Trading Service
 Tests all trading functionality with financial industry standards
 """
 
+import importlib.util
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from decimal import Decimal
+from types import MappingProxyType
 from typing import Any
-from unittest.mock import patch
 
+import numpy as np
 import pytest
+from sqlalchemy import event, func, select
 from src.models import db
 from src.models.trading import Order, OrderSide, OrderStatus, OrderType, Trade
-from src.models.user import User
+from src.models.user import UserAuditLog
 from src.services.trading_service import TradingService
-from tests.conftest import assert_decimal_equal
-
-
+from tests.conftest import assert_decimal_equal, force_commit_error
+
+# Decimal literals shared across tests, parsed once at import
+_DEC_50 = Decimal("50")
+_DEC_75 = Decimal("75")
+_DEC_100 = Decimal("100")
+_PRICE_45 = Decimal("45.00")
+_PRICE_46_75 = Decimal("46.75")
+_VALUE_4500 = Decimal("4500.00")
+# Fixed instant for tests that only need relative times
+_FIXED_NOW = datetime(2024, 1, 1, tzinfo=timezone.utc)
+# Order payloads shared by tests; callers merge in a project_id
+_MARKET_BUY = MappingProxyType(
+    {
+        "order_type": "market",
+        "side": "buy",
+        "quantity": 100,
+        "credit_type": "VCS",
+        "vintage_year": 2023,
+    }
+)
+_LIMIT_BUY = MappingProxyType(
+    {
+        "order_type": "limit",
+        "side": "buy",
+        "quantity": 100,
+        "price": 45.0,
+        "credit_type": "VCS",
+        "vintage_year": 2023,
+    }
+)
+_LIMIT_SELL = MappingProxyType({**_LIMIT_BUY, "side": "sell"})
+# Limit orders submitted together by the bulk order test
+_BULK_ORDERS = (
+    {"order_type": "limit", "side": "buy", "quantity": 50, "price": 44.0},
+    {"order_type": "limit", "side": "buy", "quantity": 75, "price": 44.5},
+    {"order_type": "limit", "side": "sell", "quantity": 60, "price": 46.0},
+    {"order_type": "limit", "side": "sell", "quantity": 40, "price": 46.5},
+)
+
+
+def _count_user_orders(session: Any, user_id: int) -> int:
+    """Count a user's orders with one COUNT query instead of loading rows"""
+    return session.scalar(select(func.count(Order.id)).where(Order.user_id == user_id))
+
+
+@pytest.mark.usefixtures("db_session")
 class TestTradingService:
     """Test suite for TradingService"""
 
@@ -29,26 +78,48 @@ class TestTradingService:
         mock_audit_service: Any,
     ) -> Any:
         """Create trading service with mocked dependencies"""
-        with app.app_context():
-            service = TradingService()
-            service.risk_service = mock_risk_service
-            service.compliance_service = mock_compliance_service
-            service.pricing_service = mock_pricing_service
-            service.audit_service = mock_audit_service
-            return service
-
-    def test_create_market_buy_order_success(
+        service = TradingService()
+        service.risk_service = mock_risk_service
+        service.compliance_service = mock_compliance_service
+        service.pricing_service = mock_pricing_service
+        service.audit_service = mock_audit_service
+        return service
+
+    @pytest.mark.parametrize(
+        "order_fields, expected",
+        [
+            (
+                {"order_type": "market", "side": "buy", "quantity": 100},
+                {
+                    "order_type": OrderType.MARKET,
+                    "side": OrderSide.BUY,
+                    "quantity": _DEC_100,
+                    "price": None,
+                },
+            ),
+            (
+                {"order_type": "limit", "side": "sell", "quantity": 50, "price": 47.5},
+                {
+                    "order_type": OrderType.LIMIT,
+                    "side": OrderSide.SELL,
+                    "quantity": _DEC_50,
+                    "price": Decimal("47.50"),
+                },
+            ),
+        ],
+        ids=["market-buy", "limit-sell"],
+    )
+    def test_create_order_success(
         self,
         trading_service: Any,
-        db_session: Any,
         sample_user: Any,
         sample_project: Any,
+        order_fields: Any,
+        expected: Any,
     ) -> Any:
-        """Test successful market buy order creation"""
+        """Test successful order creation for each order type and side"""
         order_data = {
-            "order_type": "market",
-            "side": "buy",
-            "quantity": 100,
+            **order_fields,
             "project_id": sample_project.id,
             "credit_type": "VCS",
             "vintage_year": 2023,
@@ -61,33 +132,13 @@ class TestTradingService:
         assert order is not None
         assert order.user_id == sample_user.id
         assert order.project_id == sample_project.id
-        assert order.order_type == OrderType.MARKET
-        assert order.side == OrderSide.BUY
-        assert order.quantity == Decimal("100")
-
-    def test_create_limit_sell_order_success(
-        self,
-        trading_service: Any,
-        db_session: Any,
-        sample_user: Any,
-        sample_project: Any,
-    ) -> Any:
-        """Test successful limit sell order creation"""
-        order_data = {
-            "order_type": "limit",
-            "side": "sell",
-            "quantity": 50,
-            "price": 47.5,
-            "project_id": sample_project.id,
-            "credit_type": "VCS",
-            "vintage_year": 2023,
-        }
-        result = trading_service.create_order(sample_user.id, order_data)
-        assert result["success"] is True
-        order = db.session.get(Order, result["order_id"])
-        assert order.order_type == OrderType.LIMIT
-        assert order.side == OrderSide.SELL
-        assert_decimal_equal(order.price, Decimal("47.50"))
+        assert order.order_type == expected["order_type"]
+        assert order.side == expected["side"]
+        assert order.quantity == expected["quantity"]
+        if expected["price"] is None:
+            assert order.price is None
+        else:
+            assert_decimal_equal(order.price, expected["price"])
 
     def test_create_order_risk_rejection(
         self,
@@ -104,23 +155,18 @@ class TestTradingService:
             "risk_checks": [{"severity": "HIGH", "message": "Daily limit exceeded"}],
         }
         order_data = {
-            "order_type": "market",
-            "side": "buy",
+            **_MARKET_BUY,
             "quantity": 10000,
             "project_id": sample_project.id,
-            "credit_type": "VCS",
-            "vintage_year": 2023,
         }
         result = trading_service.create_order(sample_user.id, order_data)
         assert result["success"] is False
         assert "risk" in result["reason"].lower()
-        orders = Order.query.filter_by(user_id=sample_user.id).all()
-        assert len(orders) == 0
+        assert _count_user_orders(db_session, sample_user.id) == 0
 
     def test_create_order_compliance_rejection(
         self,
         trading_service: Any,
-        db_session: Any,
         sample_user: Any,
         sample_project: Any,
         mock_compliance_service: Any,
@@ -131,14 +177,7 @@ class TestTradingService:
             "reason": "KYC verification required",
             "compliance_checks": [{"rule": "KYC_VERIFICATION", "blocking": True}],
         }
-        order_data = {
-            "order_type": "market",
-            "side": "buy",
-            "quantity": 100,
-            "project_id": sample_project.id,
-            "credit_type": "VCS",
-            "vintage_year": 2023,
-        }
+        order_data = {**_MARKET_BUY, "project_id": sample_project.id}
         result = trading_service.create_order(sample_user.id, order_data)
         assert result["success"] is False
         assert (
@@ -147,33 +186,19 @@ class TestTradingService:
         )
 
     def test_create_order_invalid_user(
-        self, trading_service: Any, db_session: Any, sample_project: Any
+        self, trading_service: Any, sample_project: Any
     ) -> Any:
         """Test order creation with invalid user ID"""
-        order_data = {
-            "order_type": "market",
-            "side": "buy",
-            "quantity": 100,
-            "project_id": sample_project.id,
-            "credit_type": "VCS",
-            "vintage_year": 2023,
-        }
+        order_data = {**_MARKET_BUY, "project_id": sample_project.id}
         result = trading_service.create_order(999999, order_data)
         assert result["success"] is False
         assert "user" in result["reason"].lower()
 
     def test_create_order_invalid_project(
-        self, trading_service: Any, db_session: Any, sample_user: Any
+        self, trading_service: Any, sample_user: Any
     ) -> Any:
         """Test order creation with invalid project ID"""
-        order_data = {
-            "order_type": "market",
-            "side": "buy",
-            "quantity": 100,
-            "project_id": 999999,
-            "credit_type": "VCS",
-            "vintage_year": 2023,
-        }
+        order_data = {**_MARKET_BUY, "project_id": 999999}
         result = trading_service.create_order(sample_user.id, order_data)
         assert result["success"] is False
         assert "project" in result["reason"].lower()
@@ -181,7 +206,6 @@ class TestTradingService:
     def test_create_order_missing_required_fields(
         self,
         trading_service: Any,
-        db_session: Any,
         sample_user: Any,
         sample_project: Any,
     ) -> Any:
@@ -200,19 +224,16 @@ class TestTradingService:
             or "missing" in result["reason"].lower()
         )
 
-    def test_cancel_order_success(
-        self, trading_service: Any, db_session: Any, sample_order: Any
-    ) -> Any:
+    def test_cancel_order_success(self, trading_service: Any, sample_order: Any) -> Any:
         """Test successful order cancellation"""
         result = trading_service.cancel_order(sample_order.user_id, sample_order.id)
         assert result["success"] is True
         assert result["status"] == "cancelled"
-        db_session.refresh(sample_order)
         assert sample_order.status == OrderStatus.CANCELLED
         assert sample_order.cancelled_at is not None
 
     def test_cancel_order_not_found(
-        self, trading_service: Any, db_session: Any, sample_user: Any
+        self, trading_service: Any, sample_user: Any
     ) -> Any:
         """Test cancellation of non-existent order"""
         result = trading_service.cancel_order(sample_user.id, 999999)
@@ -220,17 +241,9 @@ class TestTradingService:
         assert "not found" in result["reason"].lower()
 
     def test_cancel_order_wrong_user(
-        self, trading_service: Any, db_session: Any, sample_order: Any
+        self, trading_service: Any, sample_order: Any, other_user: Any
     ) -> Any:
         """Test cancellation by wrong user"""
-        other_user = User(
-            email="other@example.com",
-            password="TestPassword123!",
-            first_name="Other",
-            last_name="User",
-        )
-        db_session.add(other_user)
-        db_session.commit()
         result = trading_service.cancel_order(other_user.id, sample_order.id)
         assert result["success"] is False
         assert (
@@ -243,7 +256,7 @@ class TestTradingService:
     ) -> Any:
         """Test cancellation of already executed order"""
         sample_order.status = OrderStatus.EXECUTED
-        db_session.commit()
+        db_session.flush()
         result = trading_service.cancel_order(sample_order.user_id, sample_order.id)
         assert result["success"] is False
         assert "cannot be cancelled" in result["reason"].lower()
@@ -251,61 +264,59 @@ class TestTradingService:
     def test_get_user_orders(
         self,
         trading_service: Any,
-        db_session: Any,
         sample_user: Any,
-        sample_project: Any,
+        seed_orders: Any,
+        db_query_counter: Any,
     ) -> Any:
         """Test retrieving user orders"""
-        orders_data = [
-            {"order_type": "market", "side": "buy", "quantity": 100},
-            {"order_type": "limit", "side": "sell", "quantity": 50, "price": 47.5},
-            {"order_type": "market", "side": "buy", "quantity": 75},
-        ]
-        created_orders = []
-        for order_data in orders_data:
-            order_data.update(
+        created_orders = seed_orders(
+            [
                 {
-                    "project_id": sample_project.id,
-                    "credit_type": "VCS",
-                    "vintage_year": 2023,
-                }
-            )
-            result = trading_service.create_order(sample_user.id, order_data)
-            created_orders.append(result["order_id"])
+                    "order_type": OrderType.MARKET,
+                    "quantity": _DEC_100,
+                    "price": None,
+                },
+                {"side": OrderSide.SELL, "quantity": _DEC_50},
+                {
+                    "order_type": OrderType.MARKET,
+                    "quantity": _DEC_75,
+                    "price": None,
+                },
+            ]
+        )
+        db_query_counter.reset()
         result = trading_service.get_user_orders(sample_user.id)
+        # Serialization reads only order columns, so one SELECT serves every row
+        assert db_query_counter.count == 1
         assert result["success"] is True
         assert len(result["orders"]) == 3
-        returned_order_ids = [order["id"] for order in result["orders"]]
-        for order_id in created_orders:
-            assert order_id in returned_order_ids
+        returned_orders = {order["id"]: order for order in result["orders"]}
+        for order in created_orders:
+            order_data = returned_orders[order.id]
+            assert Decimal(order_data["quantity"]) == order.quantity
+            assert Decimal(order_data["remaining_quantity"]) == order.remaining_quantity
+            if order.price is None:
+                assert order_data["price"] is None
+            else:
+                assert Decimal(order_data["price"]) == order.price
 
     def test_get_user_orders_with_filters(
         self,
         trading_service: Any,
-        db_session: Any,
         sample_user: Any,
-        sample_project: Any,
+        seed_orders: Any,
     ) -> Any:
         """Test retrieving user orders with filters"""
-        buy_order_data = {
-            "order_type": "market",
-            "side": "buy",
-            "quantity": 100,
-            "project_id": sample_project.id,
-            "credit_type": "VCS",
-            "vintage_year": 2023,
-        }
-        sell_order_data = {
-            "order_type": "limit",
-            "side": "sell",
-            "quantity": 50,
-            "price": 47.5,
-            "project_id": sample_project.id,
-            "credit_type": "VCS",
-            "vintage_year": 2023,
-        }
-        trading_service.create_order(sample_user.id, buy_order_data)
-        trading_service.create_order(sample_user.id, sell_order_data)
+        seed_orders(
+            [
+                {
+                    "order_type": OrderType.MARKET,
+                    "quantity": _DEC_100,
+                    "price": None,
+                },
+                {"side": OrderSide.SELL, "quantity": _DEC_50},
+            ]
+        )
         result = trading_service.get_user_orders(
             sample_user.id, filters={"side": "buy"}
         )
@@ -316,77 +327,56 @@ class TestTradingService:
     def test_get_order_book(
         self,
         trading_service: Any,
-        db_session: Any,
-        sample_user: Any,
         sample_project: Any,
+        seed_orders: Any,
+        db_query_counter: Any,
     ) -> Any:
         """Test retrieving order book"""
-        buy_orders = [
-            {"side": "buy", "quantity": 100, "price": 44.5},
-            {"side": "buy", "quantity": 150, "price": 44.0},
-            {"side": "buy", "quantity": 75, "price": 43.5},
-        ]
-        sell_orders = [
-            {"side": "sell", "quantity": 80, "price": 45.5},
-            {"side": "sell", "quantity": 120, "price": 46.0},
-            {"side": "sell", "quantity": 60, "price": 46.5},
-        ]
-        all_orders = buy_orders + sell_orders
-        for order_data in all_orders:
-            order_data.update(
-                {
-                    "order_type": "limit",
-                    "project_id": sample_project.id,
-                    "credit_type": "VCS",
-                    "vintage_year": 2023,
-                }
-            )
-            trading_service.create_order(sample_user.id, order_data)
+        seed_orders(
+            [
+                {"side": side, "quantity": Decimal(quantity), "price": Decimal(price)}
+                for side, quantity, price in [
+                    (OrderSide.BUY, "100", "44.5"),
+                    (OrderSide.BUY, "150", "44.0"),
+                    (OrderSide.BUY, "75", "43.5"),
+                    (OrderSide.SELL, "80", "45.5"),
+                    (OrderSide.SELL, "120", "46.0"),
+                    (OrderSide.SELL, "60", "46.5"),
+                ]
+            ]
+        )
+        project_id = sample_project.id
+        db_query_counter.reset()
         result = trading_service.get_order_book(
-            project_id=sample_project.id, credit_type="VCS", vintage_year=2023
+            project_id=project_id, credit_type="VCS", vintage_year=2023
         )
+        # One SELECT per side of the book, however many levels it has
+        assert db_query_counter.count == 2
         assert result["success"] is True
         assert "bids" in result
         assert "asks" in result
         assert len(result["bids"]) == 3
         assert len(result["asks"]) == 3
-        bid_prices = [bid["price"] for bid in result["bids"]]
-        assert bid_prices == sorted(bid_prices, reverse=True)
-        ask_prices = [ask["price"] for ask in result["asks"]]
-        assert ask_prices == sorted(ask_prices)
+        bid_prices = np.array([bid["price"] for bid in result["bids"]], dtype=float)
+        assert np.all(np.diff(bid_prices) <= 0)
+        ask_prices = np.array([ask["price"] for ask in result["asks"]], dtype=float)
+        assert np.all(np.diff(ask_prices) >= 0)
 
     def test_execute_trade_success(
         self,
         trading_service: Any,
-        db_session: Any,
         sample_user: Any,
         sample_project: Any,
     ) -> Any:
         """Test successful trade execution"""
-        buy_order_data = {
-            "order_type": "limit",
-            "side": "buy",
-            "quantity": 100,
-            "price": 45.0,
-            "project_id": sample_project.id,
-            "credit_type": "VCS",
-            "vintage_year": 2023,
-        }
-        sell_order_data = {
-            "order_type": "limit",
-            "side": "sell",
-            "quantity": 100,
-            "price": 45.0,
-            "project_id": sample_project.id,
-            "credit_type": "VCS",
-            "vintage_year": 2023,
-        }
+        buy_order_data = {**_LIMIT_BUY, "project_id": sample_project.id}
+        sell_order_data = {**_LIMIT_SELL, "project_id": sample_project.id}
         buy_result = trading_service.create_order(sample_user.id, buy_order_data)
         sell_result = trading_service.create_order(sample_user.id, sell_order_data)
         buy_order = db.session.get(Order, buy_result["order_id"])
         sell_order = db.session.get(Order, sell_result["order_id"])
         result = trading_service.execute_trade(
-            buy_order, sell_order, Decimal("100"), Decimal("45.00")
+            buy_order, sell_order, _DEC_100, _PRICE_45
         )
         assert result["success"] is True
         assert "trade_id" in result
@@ -394,75 +384,54 @@ class TestTradingService:
         assert trade is not None
         assert trade.buy_order_id == buy_order.id
         assert trade.sell_order_id == sell_order.id
-        assert_decimal_equal(trade.quantity, Decimal("100"))
-        assert_decimal_equal(trade.price, Decimal("45.00"))
-        assert_decimal_equal(trade.total_value, Decimal("4500.00"))
+        assert_decimal_equal(trade.quantity, _DEC_100)
+        assert_decimal_equal(trade.price, _PRICE_45)
+        assert_decimal_equal(trade.total_value, _VALUE_4500)
 
     def test_execute_trade_partial_fill(
         self,
         trading_service: Any,
-        db_session: Any,
         sample_user: Any,
         sample_project: Any,
     ) -> Any:
         """Test partial trade execution"""
         buy_order_data = {
-            "order_type": "limit",
-            "side": "buy",
+            **_LIMIT_BUY,
             "quantity": 150,
-            "price": 45.0,
             "project_id": sample_project.id,
-            "credit_type": "VCS",
-            "vintage_year": 2023,
-        }
-        sell_order_data = {
-            "order_type": "limit",
-            "side": "sell",
-            "quantity": 100,
-            "price": 45.0,
-            "project_id": sample_project.id,
-            "credit_type": "VCS",
-            "vintage_year": 2023,
         }
+        sell_order_data = {**_LIMIT_SELL, "project_id": sample_project.id}
         buy_result = trading_service.create_order(sample_user.id, buy_order_data)
         sell_result = trading_service.create_order(sample_user.id, sell_order_data)
         buy_order = db.session.get(Order, buy_result["order_id"])
         sell_order = db.session.get(Order, sell_result["order_id"])
         result = trading_service.execute_trade(
-            buy_order, sell_order, Decimal("100"), Decimal("45.00")
+            buy_order, sell_order, _DEC_100, _PRICE_45
         )
         assert result["success"] is True
-        db_session.refresh(buy_order)
-        db_session.refresh(sell_order)
         assert buy_order.status == OrderStatus.PARTIALLY_FILLED
-        assert_decimal_equal(buy_order.filled_quantity, Decimal("100"))
+        assert_decimal_equal(buy_order.filled_quantity, _DEC_100)
         assert sell_order.status == OrderStatus.EXECUTED
-        assert_decimal_equal(sell_order.filled_quantity, Decimal("100"))
+        assert_decimal_equal(sell_order.filled_quantity, _DEC_100)
 
     def test_match_orders_success(
         self,
         trading_service: Any,
-        db_session: Any,
-        sample_user: Any,
         sample_project: Any,
+        seed_orders: Any,
     ) -> Any:
         """Test order matching algorithm"""
-        orders_data = [
-            {"side": "buy", "quantity": 100, "price": 45.0},
-            {"side": "buy", "quantity": 50, "price": 44.5},
-            {"side": "sell", "quantity": 75, "price": 45.0},
-            {"side": "sell", "quantity": 25, "price": 45.5},
-        ]
-        for order_data in orders_data:
-            order_data.update(
-                {
-                    "order_type": "limit",
-                    "project_id": sample_project.id,
-                    "credit_type": "VCS",
-                    "vintage_year": 2023,
-                }
-            )
-            trading_service.create_order(sample_user.id, order_data)
+        seed_orders(
+            [
+                {"side": side, "quantity": Decimal(quantity), "price": Decimal(price)}
+                for side, quantity, price in [
+                    (OrderSide.BUY, "100", "45.0"),
+                    (OrderSide.BUY, "50", "44.5"),
+                    (OrderSide.SELL, "75", "45.0"),
+                    (OrderSide.SELL, "25", "45.5"),
+                ]
+            ]
+        )
         result = trading_service.match_orders(
             project_id=sample_project.id, credit_type="VCS", vintage_year=2023
         )
@@ -470,78 +439,95 @@ class TestTradingService:
         assert result["matches_found"] > 0
         assert "trades_executed" in result
 
+    def test_match_orders_stops_at_limit_price(
+        self,
+        trading_service: Any,
+        sample_project: Any,
+        seed_orders: Any,
+    ) -> Any:
+        """Test a bid sweeps asks up to its limit and leaves dearer asks alone"""
+        bid, cheap_ask, at_limit_ask, dear_ask = seed_orders(
+            [
+                {"side": side, "quantity": Decimal(quantity), "price": Decimal(price)}
+                for side, quantity, price in [
+                    (OrderSide.BUY, "100", "45.0"),
+                    (OrderSide.SELL, "30", "44.0"),
+                    (OrderSide.SELL, "30", "45.0"),
+                    (OrderSide.SELL, "30", "46.0"),
+                ]
+            ]
+        )
+        result = trading_service.match_orders(
+            project_id=sample_project.id, credit_type="VCS", vintage_year=2023
+        )
+        assert result["success"] is True
+        assert result["matches_found"] == 2
+        assert result["trades_executed"] == 2
+        assert_decimal_equal(bid.remaining_quantity, Decimal("40"))
+        assert_decimal_equal(cheap_ask.remaining_quantity, Decimal("0"))
+        assert_decimal_equal(at_limit_ask.remaining_quantity, Decimal("0"))
+        assert_decimal_equal(dear_ask.remaining_quantity, Decimal("30"))
+
     def test_get_trade_history(
-        self, trading_service: Any, db_session: Any, sample_trade: Any
+        self,
+        trading_service: Any,
+        sample_trade: Any,
+        db_query_counter: Any,
     ) -> Any:
         """Test retrieving trade history"""
+        db_query_counter.reset()
         result = trading_service.get_trade_history(
             project_id=sample_trade.project_id,
             credit_type=sample_trade.credit_type,
             vintage_year=sample_trade.vintage_year,
         )
+        assert db_query_counter.count == 1
         assert result["success"] is True
         assert len(result["trades"]) >= 1
         trade_data = result["trades"][0]
         assert trade_data["id"] == sample_trade.id
-        assert_decimal_equal(Decimal(str(trade_data["price"])), sample_trade.price)
-        assert_decimal_equal(
-            Decimal(str(trade_data["quantity"])), sample_trade.quantity
-        )
+        assert Decimal(trade_data["price"]) == sample_trade.price
+        assert Decimal(trade_data["quantity"]) == sample_trade.quantity
 
     def test_get_user_trade_history(
-        self, trading_service: Any, db_session: Any, sample_user: Any, sample_trade: Any
+        self, trading_service: Any, sample_user: Any, sample_trade: Any
     ) -> Any:
         """Test retrieving user-specific trade history"""
         result = trading_service.get_user_trade_history(sample_user.id)
         assert result["success"] is True
         assert len(result["trades"]) >= 1
 
-    def test_calculate_trading_fees(self, trading_service: Any) -> Any:
+    @pytest.mark.parametrize(
+        "quantity, price, user_tier, expected_fee",
+        [
+            (Decimal("100"), Decimal("45.00"), "standard", Decimal("2.25")),
+            (Decimal("1000"), Decimal("50.00"), "premium", Decimal("12.50")),
+            (Decimal("50"), Decimal("40.00"), "vip", Decimal("0.40")),
+        ],
+        ids=["standard", "premium", "vip"],
+    )
+    def test_calculate_trading_fees(
+        self,
+        trading_service: Any,
+        quantity: Decimal,
+        price: Decimal,
+        user_tier: str,
+        expected_fee: Decimal,
+    ) -> Any:
         """Test trading fee calculation"""
-        test_cases = [
-            {
-                "quantity": Decimal("100"),
-                "price": Decimal("45.00"),
-                "user_tier": "standard",
-                "expected_fee": Decimal("2.25"),
-            },
-            {
-                "quantity": Decimal("1000"),
-                "price": Decimal("50.00"),
-                "user_tier": "premium",
-                "expected_fee": Decimal("12.50"),
-            },
-            {
-                "quantity": Decimal("50"),
-                "price": Decimal("40.00"),
-                "user_tier": "vip",
-                "expected_fee": Decimal("0.40"),
-            },
-        ]
-        for case in test_cases:
-            fee = trading_service._calculate_trading_fee(
-                case["quantity"], case["price"], case["user_tier"]
-            )
-            assert_decimal_equal(fee, case["expected_fee"])
+        fee = trading_service._calculate_trading_fee(quantity, price, user_tier)
+        assert_decimal_equal(fee, expected_fee)
 
     def test_validate_order_data_success(self, trading_service: Any) -> Any:
         """Test order data validation with valid data"""
-        valid_order_data = {
-            "order_type": "limit",
-            "side": "buy",
-            "quantity": 100,
-            "price": 45.0,
-            "project_id": 1,
-            "credit_type": "VCS",
-            "vintage_year": 2023,
-        }
+        valid_order_data = {**_LIMIT_BUY, "project_id": 1}
         is_valid, errors = trading_service._validate_order_data(valid_order_data)
         assert is_valid is True
         assert len(errors) == 0
 
-    def test_validate_order_data_failures(self, trading_service: Any) -> Any:
-        """Test order data validation with invalid data"""
-        invalid_cases = [
+    @pytest.mark.parametrize(
+        "invalid_data",
+        [
             {"order_type": "market", "side": "buy"},
             {
                 "order_type": "invalid",
@@ -575,78 +561,88 @@ class TestTradingService:
                 "credit_type": "VCS",
                 "vintage_year": 2023,
             },
-        ]
-        for invalid_data in invalid_cases:
-            is_valid, errors = trading_service._validate_order_data(invalid_data)
-            assert is_valid is False
-            assert len(errors) > 0
+        ],
+        ids=[
+            "missing-fields",
+            "bad-order-type",
+            "bad-side",
+            "negative-quantity",
+            "limit-without-price",
+        ],
+    )
+    def test_validate_order_data_failures(
+        self, trading_service: Any, invalid_data: Any
+    ) -> Any:
+        """Test order data validation with invalid data"""
+        is_valid, errors = trading_service._validate_order_data(invalid_data)
+        assert is_valid is False
+        assert len(errors) > 0
 
     def test_performance_order_creation(
         self,
         trading_service: Any,
-        db_session: Any,
         sample_user: Any,
         sample_project: Any,
         performance_timer: Any,
     ) -> Any:
         """Test order creation performance"""
-        order_data = {
-            "order_type": "market",
-            "side": "buy",
-            "quantity": 100,
-            "project_id": sample_project.id,
-            "credit_type": "VCS",
-            "vintage_year": 2023,
-        }
+        order_data = {**_MARKET_BUY, "project_id": sample_project.id}
         performance_timer.start()
         result = trading_service.create_order(sample_user.id, order_data)
         performance_timer.stop()
         assert result["success"] is True
         performance_timer.assert_under(1.0)
 
+    @pytest.mark.skipif(
+        importlib.util.find_spec("pytest_benchmark") is None,
+        reason="pytest-benchmark is not installed",
+    )
+    def test_order_creation_benchmark(
+        self,
+        benchmark: Any,
+        trading_service: Any,
+        sample_user: Any,
+        sample_project: Any,
+    ) -> Any:
+        """Benchmark order creation; every order is rolled back with the test"""
+        order_data = {**_MARKET_BUY, "project_id": sample_project.id}
+        user_id = sample_user.id
+        # Bounded rounds keep the number of rows inserted per run predictable
+        result = benchmark.pedantic(
+            trading_service.create_order,
+            args=(user_id, order_data),
+            rounds=50,
+            warmup_rounds=5,
+        )
+        assert result["success"] is True
+
     def test_concurrent_order_creation(
         self,
         trading_service: Any,
-        db_session: Any,
         sample_user: Any,
         sample_project: Any,
         app: Any,
     ) -> Any:
         """Test concurrent order creation handling"""
-        import threading
-
-        results = []
-        errors = []
         lock = threading.Lock()
 
-        def create_order():
-            try:
-                with app.app_context():
-                    order_data = {
-                        "order_type": "market",
-                        "side": "buy",
-                        "quantity": 10,
-                        "project_id": sample_project.id,
-                        "credit_type": "VCS",
-                        "vintage_year": 2023,
-                    }
-                    with lock:
-                        result = trading_service.create_order(
-                            sample_user.id, order_data
-                        )
-                    results.append(result)
-            except Exception as e:
-                errors.append(str(e))
-
-        threads = []
-        for _ in range(5):
-            thread = threading.Thread(target=create_order)
-            threads.append(thread)
-        for thread in threads:
-            thread.start()
-        for thread in threads:
-            thread.join()
-        assert len(errors) == 0, f"Errors occurred: {errors}"
+        order_data = {
+            **_MARKET_BUY,
+            "quantity": 10,
+            "project_id": sample_project.id,
+        }
+        user_id = sample_user.id
+
+        def create_order() -> Any:
+            # The test database is one shared connection, so each thread's
+            # app context (and the session it owns) must not interleave
+            with lock, app.app_context():
+                return trading_service.create_order(user_id, dict(order_data))
+
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            futures = [executor.submit(create_order) for _ in range(5)]
+            # result() re-raises anything a worker thread raised
+            results = [future.result() for future in futures]
         assert len(results) == 5
         successful_orders = [r for r in results if r.get("success")]
         assert len(successful_orders) == 5
@@ -654,30 +650,25 @@ class TestTradingService:
     def test_order_expiration_handling(
         self,
         trading_service: Any,
-        db_session: Any,
         sample_user: Any,
         sample_project: Any,
+        monkeypatch: Any,
     ) -> Any:
         """Test handling of expired orders"""
         order_data = {
-            "order_type": "limit",
-            "side": "buy",
-            "quantity": 100,
-            "price": 45.0,
+            **_LIMIT_BUY,
             "project_id": sample_project.id,
-            "credit_type": "VCS",
-            "vintage_year": 2023,
-            "expires_at": datetime.now(timezone.utc) + timedelta(seconds=1),
+            "expires_at": _FIXED_NOW + timedelta(seconds=1),
         }
         result = trading_service.create_order(sample_user.id, order_data)
         assert result["success"] is True
         order = db.session.get(Order, result["order_id"])
-        import time
-
-        time.sleep(2)
+        monkeypatch.setattr(trading_service, "_now", lambda: _FIXED_NOW)
+        assert trading_service.process_expired_orders() == 0
+        later = _FIXED_NOW + timedelta(seconds=2)
+        monkeypatch.setattr(trading_service, "_now", lambda: later)
         expired_count = trading_service.process_expired_orders()
         assert expired_count > 0
-        db_session.refresh(order)
         assert order.status == OrderStatus.EXPIRED
 
     def test_market_data_integration(
@@ -685,31 +676,23 @@ class TestTradingService:
     ) -> Any:
         """Test integration with market data for pricing"""
         mock_pricing_service.get_current_price.return_value = {
-            "price": Decimal("46.75"),
+            "price": _PRICE_46_75,
             "pricing_method": "market_based",
-            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "timestamp": _FIXED_NOW.isoformat(),
         }
         current_price = trading_service._get_current_market_price("VCS", 2023)
-        assert_decimal_equal(current_price, Decimal("46.75"))
+        assert_decimal_equal(current_price, _PRICE_46_75)
         mock_pricing_service.get_current_price.assert_called_once()
 
     def test_audit_logging(
         self,
         trading_service: Any,
-        db_session: Any,
         sample_user: Any,
         sample_project: Any,
         mock_audit_service: Any,
     ) -> Any:
         """Test audit logging for trading operations"""
-        order_data = {
-            "order_type": "market",
-            "side": "buy",
-            "quantity": 100,
-            "project_id": sample_project.id,
-            "credit_type": "VCS",
-            "vintage_year": 2023,
-        }
+        order_data = {**_MARKET_BUY, "project_id": sample_project.id}
         result = trading_service.create_order(sample_user.id, order_data)
         assert result["success"] is True
         mock_audit_service.log_trading_event.assert_called()
@@ -725,32 +708,20 @@ class TestTradingService:
         sample_project: Any,
     ) -> Any:
         """Test error handling when database operations fail"""
-        with patch.object(
-            db_session, "commit", side_effect=Exception("Database error")
-        ):
-            order_data = {
-                "order_type": "market",
-                "side": "buy",
-                "quantity": 100,
-                "project_id": sample_project.id,
-                "credit_type": "VCS",
-                "vintage_year": 2023,
-            }
+        with force_commit_error(db_session):
+            order_data = {**_MARKET_BUY, "project_id": sample_project.id}
             result = trading_service.create_order(sample_user.id, order_data)
             assert result["success"] is False
             assert "error" in result["reason"].lower()
 
-    def test_order_modification(
-        self, trading_service: Any, db_session: Any, sample_order: Any
-    ) -> Any:
+    def test_order_modification(self, trading_service: Any, sample_order: Any) -> Any:
         """Test order modification functionality"""
         modification_data = {"quantity": 75, "price": 46.0}
         result = trading_service.modify_order(
             sample_order.user_id, sample_order.id, modification_data
         )
         assert result["success"] is True
-        db_session.refresh(sample_order)
-        assert_decimal_equal(sample_order.quantity, Decimal("75"))
+        assert_decimal_equal(sample_order.quantity, _DEC_75)
         assert_decimal_equal(sample_order.price, Decimal("46.00"))
         assert sample_order.updated_at is not None
 
@@ -763,22 +734,33 @@ class TestTradingService:
     ) -> Any:
         """Test bulk order operations"""
         orders_data = [
-            {"order_type": "limit", "side": "buy", "quantity": 50, "price": 44.0},
-            {"order_type": "limit", "side": "buy", "quantity": 75, "price": 44.5},
-            {"order_type": "limit", "side": "sell", "quantity": 60, "price": 46.0},
-            {"order_type": "limit", "side": "sell", "quantity": 40, "price": 46.5},
+            {
+                **order,
+                "project_id": sample_project.id,
+                "credit_type": "VCS",
+                "vintage_year": 2023,
+            }
+            for order in _BULK_ORDERS
         ]
-        for order_data in orders_data:
-            order_data.update(
-                {
-                    "project_id": sample_project.id,
-                    "credit_type": "VCS",
-                    "vintage_year": 2023,
-                }
-            )
-        result = trading_service.create_bulk_orders(sample_user.id, orders_data)
+        commits = []
+        record_commit = commits.append
+        event.listen(db_session(), "after_commit", record_commit)
+        try:
+            result = trading_service.create_bulk_orders(sample_user.id, orders_data)
+        finally:
+            event.remove(db_session(), "after_commit", record_commit)
         assert result["success"] is True
         assert result["created_count"] == 4
         assert len(result["order_ids"]) == 4
-        orders = Order.query.filter_by(user_id=sample_user.id).all()
-        assert len(orders) == 4
+        assert _count_user_orders(db_session, sample_user.id) == 4
+        # Orders and their audit rows land in a single transaction
+        assert len(commits) == 1
+        audited = db_session.scalars(
+            select(UserAuditLog.event_metadata).where(
+                UserAuditLog.user_id == sample_user.id,
+                UserAuditLog.event_type == "order_create",
+            )
+        ).all()
+        assert sorted(meta["order_id"] for meta in audited) == sorted(
+            result["order_ids"]
+        )
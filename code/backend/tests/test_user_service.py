@@ -0,0 +1,190 @@
+"""
+Tests for User Service status and column updates
+"""
+
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import select
+from src.models.user import User, UserAuditLog, UserStatus
+from src.services.user_service import UserService
+
+from tests.factories import bulk_create_users
+
+
+class TestBulkSetStatus:
+    """Test suite for UserService.bulk_set_status"""
+
+    @pytest.fixture
+    def user_service(self, app: Any) -> Any:
+        return UserService()
+
+    @pytest.fixture
+    def users(self, db_session: Any) -> Any:
+        return bulk_create_users(db_session, 3)
+
+    @staticmethod
+    def _audit_rows(db_session: Any, user_ids: Any) -> Any:
+        return db_session.scalars(
+            select(UserAuditLog)
+            .where(UserAuditLog.user_id.in_(user_ids))
+            .order_by(UserAuditLog.user_id)
+        ).all()
+
+    def test_single_status_updates_only_matching_rows(
+        self, user_service: Any, db_session: Any, users: Any
+    ) -> Any:
+        """Test one status applied to many users, skipping unknown ids"""
+        target, untouched = users[:2], users[2]
+        target_ids = [user.id for user in target]
+        result = user_service.bulk_set_status(
+            target_ids + [999999], UserStatus.SUSPENDED, reason="fraud review"
+        )
+        assert result["updated"] == 2
+        assert sorted(result["user_ids"]) == sorted(target_ids)
+        statuses = dict(
+            db_session.execute(
+                select(User.id, User.status).where(
+                    User.id.in_([user.id for user in users])
+                )
+            ).all()
+        )
+        assert statuses[target_ids[0]] == UserStatus.SUSPENDED
+        assert statuses[target_ids[1]] == UserStatus.SUSPENDED
+        assert statuses[untouched.id] == UserStatus.ACTIVE
+        audit_rows = self._audit_rows(db_session, [user.id for user in users])
+        assert [row.user_id for row in audit_rows] == sorted(target_ids)
+        for row in audit_rows:
+            assert row.event_type == "user_deactivated"
+            assert row.event_category == "user"
+            assert row.event_description.endswith("fraud review")
+
+    def test_per_user_statuses_use_matching_event_types(
+        self, user_service: Any, db_session: Any, users: Any
+    ) -> Any:
+        """Test a status per user applied through one CASE update"""
+        locked, reactivated = users[0], users[1]
+        user_service.bulk_set_status([locked.id], UserStatus.LOCKED)
+        result = user_service.bulk_set_status(
+            [locked.id, reactivated.id],
+            {locked.id: UserStatus.ACTIVE, reactivated.id: UserStatus.DORMANT},
+        )
+        assert result["updated"] == 2
+        assert sorted(result["user_ids"]) == sorted([locked.id, reactivated.id])
+        statuses = dict(
+            db_session.execute(
+                select(User.id, User.status).where(
+                    User.id.in_([locked.id, reactivated.id])
+                )
+            ).all()
+        )
+        assert statuses == {
+            locked.id: UserStatus.ACTIVE,
+            reactivated.id: UserStatus.DORMANT,
+        }
+        event_types = sorted(
+            (row.user_id, row.event_type)
+            for row in self._audit_rows(db_session, [reactivated.id, locked.id])
+        )
+        assert event_types == sorted(
+            [
+                (locked.id, "user_deactivated"),
+                (locked.id, "user_activated"),
+                (reactivated.id, "user_deactivated"),
+            ]
+        )
+
+    def test_empty_id_list_is_a_no_op(self, user_service: Any, db_session: Any) -> Any:
+        """Test no statement is issued for an empty id list"""
+        assert user_service.bulk_set_status([], UserStatus.ACTIVE) == {
+            "updated": 0,
+            "user_ids": [],
+        }
+
+
+class TestSingleUserUpdates:
+    """Test suite for UserService.update_user, activate_user and deactivate_user"""
+
+    @pytest.fixture
+    def user_service(self, app: Any, monkeypatch: Any) -> Any:
+        service = UserService()
+        monkeypatch.setattr(service.audit_service, "queue_event", MagicMock())
+        return service
+
+    @pytest.fixture
+    def user(self, db_session: Any) -> Any:
+        (user,) = bulk_create_users(db_session, 1)
+        # Rejected updates roll back, which must not discard the user itself
+        db_session.commit()
+        return user
+
+    @staticmethod
+    def _row(db_session: Any, user_id: int) -> Any:
+        return db_session.execute(
+            select(User.first_name, User.phone_number, User.status).where(
+                User.id == user_id
+            )
+        ).one()
+
+    def test_update_user_persists_columns(
+        self, user_service: Any, db_session: Any, user: Any
+    ) -> Any:
+        """Test column values are written and the update is audited"""
+        result = user_service.update_user(
+            user.id, {"first_name": "Renamed", "phone_number": "+15550100"}
+        )
+        assert result == {"user_id": user.id, "updated": True}
+        row = self._row(db_session, user.id)
+        assert (row.first_name, row.phone_number) == ("Renamed", "+15550100")
+        user_service.audit_service.queue_event.assert_called_once()
+        assert (
+            user_service.audit_service.queue_event.call_args.kwargs["event_type"]
+            == "user_updated"
+        )
+
+    @pytest.mark.parametrize("field", ["password", "id", "full_name"])
+    def test_update_user_rejects_non_column_fields(
+        self, user_service: Any, db_session: Any, user: Any, field: str
+    ) -> Any:
+        """Test fields the UPDATE cannot write are refused, not silently dropped"""
+        result = user_service.update_user(
+            user.id, {"first_name": "Renamed", field: "Secret1!"}
+        )
+        assert result == {"error": f"Cannot update user fields: {field}"}
+        assert self._row(db_session, user.id).first_name == user.first_name
+        user_service.audit_service.queue_event.assert_not_called()
+
+    @pytest.mark.parametrize(
+        "call",
+        [
+            lambda service: service.update_user(999999, {"first_name": "Ghost"}),
+            lambda service: service.activate_user(999999),
+            lambda service: service.deactivate_user(999999),
+        ],
+        ids=["update_user", "activate_user", "deactivate_user"],
+    )
+    def test_unknown_user_is_not_found(self, user_service: Any, call: Any) -> Any:
+        """Test an UPDATE matching no row reports the user as missing"""
+        assert call(user_service) == {"error": "User not found"}
+        user_service.audit_service.queue_event.assert_not_called()
+
+    def test_deactivate_then_activate_persists_status(
+        self, user_service: Any, db_session: Any, user: Any
+    ) -> Any:
+        """Test both status changes reach the row and each is audited"""
+        assert user_service.deactivate_user(user.id, reason="fraud review") == {
+            "user_id": user.id,
+            "status": "deactivated",
+        }
+        assert self._row(db_session, user.id).status == UserStatus.SUSPENDED
+        assert user_service.activate_user(user.id) == {
+            "user_id": user.id,
+            "status": "active",
+        }
+        assert self._row(db_session, user.id).status == UserStatus.ACTIVE
+        events = [
+            call.kwargs["event_type"]
+            for call in user_service.audit_service.queue_event.call_args_list
+        ]
+        assert events == ["user_deactivated", "user_activated"]
@@ -0,0 +1,1008 @@
+"""
+Tests for shared utilities
+"""
+
+import csv
+import io
+import json
+import queue
+import threading
+import time
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import Any, List
+from unittest.mock import MagicMock
+
+import pytest
+import redis
+import src.utils
+from flask import current_app, g, has_app_context
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import OperationalError
+from src.models import db
+from src.models.user import User, UserAuditLog
+from src.utils import (
+    _FIXED_WINDOW_LUA,
+    _SLIDING_WINDOW_LUA,
+    MAX_PAGINATION_OFFSET,
+    BackgroundTaskManager,
+    CacheManager,
+    DatabaseOptimizer,
+    DataSerializer,
+    HealthChecker,
+    PaginationOffsetError,
+    PerformanceMonitor,
+    RateLimiter,
+    clear_request_cache,
+    get_cache_manager,
+    paginate_query,
+    request_cached,
+)
+
+from tests.factories import bulk_create_users
+
+
+class TestRawQueries:
+    """Test suite for DatabaseOptimizer raw SQL helpers"""
+
+    @pytest.fixture
+    def users(self, db_session: Any) -> Any:
+        return bulk_create_users(db_session, 3)
+
+    def test_execute_raw_query_returns_list_of_dicts(self, users: Any) -> Any:
+        """Test rows are fetched eagerly as plain dicts"""
+        rows = DatabaseOptimizer.execute_raw_query_with_params(
+            "SELECT id, email FROM users WHERE id >= :min_id ORDER BY id",
+            {"min_id": users[0].id},
+        )
+        assert isinstance(rows, list)
+        assert rows == [{"id": user.id, "email": user.email} for user in users]
+
+    def test_execute_raw_query_raises_at_call_time(self, db_session: Any) -> Any:
+        """Test errors surface from the call itself, not on iteration"""
+        with pytest.raises(OperationalError):
+            DatabaseOptimizer.execute_raw_query_with_params("SELECT * FROM nowhere")
+        db_session.rollback()
+
+    def test_stream_raw_query_yields_rows_lazily(
+        self, db_session: Any, users: Any
+    ) -> Any:
+        """Test the streaming variant runs nothing until iterated"""
+        rows = DatabaseOptimizer.stream_raw_query(
+            "SELECT id FROM users WHERE id >= :min_id ORDER BY id",
+            {"min_id": users[0].id},
+        )
+        assert not isinstance(rows, list)
+        assert [row["id"] for row in rows] == [user.id for user in users]
+        stream = DatabaseOptimizer.stream_raw_query("SELECT * FROM nowhere")
+        with pytest.raises(OperationalError):
+            next(stream)
+        db_session.rollback()
+
+
+class TestPagination:
+    """Test suite for offset and keyset pagination helpers"""
+
+    @pytest.fixture
+    def user_query(self, db_session: Any) -> Any:
+        users = bulk_create_users(db_session, 5)
+        return db_session.query(User).filter(User.id >= users[0].id), users
+
+    def test_keyset_walks_every_row_once(self, user_query: Any) -> Any:
+        """Test following next_cursor visits all rows in id order"""
+        query, users = user_query
+        pages, cursor = [], None
+        while True:
+            result = DatabaseOptimizer.paginate_keyset(
+                query, User.id, last_id=cursor, per_page=2
+            )
+            pages.append([user.id for user in result["items"]])
+            assert result["pagination"]["cursor"] == cursor
+            cursor = result["pagination"]["next_cursor"]
+            if not result["pagination"]["has_next"]:
+                assert cursor is None
+                break
+            assert cursor == pages[-1][-1]
+        ids = [user.id for user in users]
+        assert pages == [ids[0:2], ids[2:4], ids[4:5]]
+
+    def test_keyset_exact_page_has_no_next(self, user_query: Any) -> Any:
+        """Test a final full page does not advertise another page"""
+        query, users = user_query
+        result = DatabaseOptimizer.paginate_keyset(
+            query, User.id, last_id=users[0].id, per_page=4
+        )
+        assert [user.id for user in result["items"]] == [u.id for u in users[1:]]
+        assert result["pagination"]["has_next"] is False
+        assert result["pagination"]["next_cursor"] is None
+
+    def test_offset_within_limit_is_served(self, user_query: Any) -> Any:
+        """Test the last page inside the guard is not refused"""
+        query, _ = user_query
+        per_page = 100
+        page = MAX_PAGINATION_OFFSET // per_page + 1
+        result = DatabaseOptimizer.add_pagination(query, page=page, per_page=per_page)
+        assert result["items"] == []
+        assert result["pagination"]["page"] == page
+
+    @pytest.mark.parametrize(
+        "paginate",
+        [DatabaseOptimizer.add_pagination, paginate_query],
+        ids=["add_pagination", "paginate_query"],
+    )
+    def test_offset_beyond_limit_is_refused(
+        self, user_query: Any, paginate: Any
+    ) -> Any:
+        """Test deep offsets raise before any query is issued"""
+        query, _ = user_query
+        page = MAX_PAGINATION_OFFSET // 20 + 2
+        with pytest.raises(PaginationOffsetError, match="keyset pagination"):
+            paginate(query, page=page, per_page=20)
+
+    @pytest.mark.parametrize("page, has_next", [(1, True), (3, False)])
+    def test_without_total_skips_count(
+        self, user_query: Any, monkeypatch: Any, page: int, has_next: bool
+    ) -> Any:
+        """Test with_total=False finds the next page without COUNT(*)"""
+        query, users = user_query
+        monkeypatch.setattr(
+            type(query), "count", MagicMock(side_effect=AssertionError("counted"))
+        )
+        result = DatabaseOptimizer.add_pagination(
+            query.order_by(User.id), page=page, per_page=2, with_total=False
+        )
+        ids = [user.id for user in users]
+        assert [user.id for user in result["items"]] == ids[(page - 1) * 2 :][:2]
+        assert result["pagination"]["total"] is None
+        assert result["pagination"]["total_pages"] is None
+        assert result["pagination"]["has_next"] is has_next
+        wrapped = paginate_query(
+            query.order_by(User.id), page=page, per_page=2, with_total=False
+        )
+        assert wrapped.total is None and wrapped.has_next is has_next
+
+    def test_offset_error_maps_to_bad_request(self, app: Any) -> Any:
+        """Test the API boundary answers a refused offset with a 400"""
+        with app.test_request_context("/api/admin/users?page=100000"):
+            response = app.make_response(
+                app.handle_user_exception(PaginationOffsetError("too deep"))
+            )
+        assert response.status_code == 400
+        assert response.get_json() == {
+            "error": "Bad Request",
+            "message": "too deep",
+            "status_code": 400,
+        }
+
+
+class TestCopyInsert:
+    """Test suite for the PostgreSQL COPY bulk insert path"""
+
+    @pytest.fixture
+    def cursor(self, db_session: Any, monkeypatch: Any) -> Any:
+        cursor = MagicMock()
+        cursor.__enter__.return_value = cursor
+        cursor.copy_expert.side_effect = lambda sql, buffer: setattr(
+            cursor, "loaded", buffer.read()
+        )
+        raw_connection = SimpleNamespace(cursor=lambda: cursor)
+        connection = SimpleNamespace(
+            dialect=postgresql.dialect(), connection=raw_connection
+        )
+        monkeypatch.setattr(db.session, "connection", lambda: connection)
+        return cursor
+
+    def test_columns_follow_table_order_and_are_quoted(self, cursor: Any) -> Any:
+        """Test the column list comes from the table, not the first row's keys"""
+        rows = [
+            {"event_type": "login", "user_id": 1, "event_category": "auth"},
+            {
+                "event_category": "auth",
+                "event_type": "logout",
+                "event_description": "bye, now",
+            },
+        ]
+        inserted = DatabaseOptimizer._copy_insert(UserAuditLog, rows)
+        assert inserted == 2
+        cursor.copy_expert.assert_called_once()
+        statement = cursor.copy_expert.call_args.args[0]
+        assert statement == (
+            "COPY user_audit_logs (user_id, event_type, event_category, "
+            "event_description, success, created_at) FROM STDIN WITH CSV"
+        )
+        loaded = [line[:-2] for line in csv.reader(io.StringIO(cursor.loaded))]
+        assert loaded == [
+            ["1", "login", "auth", ""],
+            ["", "logout", "auth", "bye, now"],
+        ]
+
+    def test_python_defaults_are_filled(self, cursor: Any) -> Any:
+        """Test columns with Python-side defaults are not loaded as NULL"""
+        rows = [
+            {"event_type": "login", "event_category": "auth"},
+            {"event_type": "failed", "event_category": "auth", "success": False},
+        ]
+        DatabaseOptimizer._copy_insert(UserAuditLog, rows)
+        loaded = list(csv.reader(io.StringIO(cursor.loaded)))
+        assert [row[2] for row in loaded] == ["True", "False"]
+        for row in loaded:
+            assert datetime.fromisoformat(row[3]).tzinfo is not None
+
+    def test_missing_server_default_column_is_rejected(
+        self, cursor: Any, monkeypatch: Any
+    ) -> Any:
+        """Test a column only the database can default must be in every row"""
+        column = UserAuditLog.__table__.c.ip_address
+        monkeypatch.setattr(column, "server_default", text("'0.0.0.0'"))
+        rows = [
+            {"event_type": "login", "event_category": "auth", "ip_address": "::1"},
+            {"event_type": "logout", "event_category": "auth"},
+        ]
+        with pytest.raises(ValueError, match="ip_address has a server default"):
+            DatabaseOptimizer._copy_insert(UserAuditLog, rows)
+        cursor.copy_expert.assert_not_called()
+
+    def test_unknown_keys_are_rejected(self, cursor: Any) -> Any:
+        """Test keys that are not table columns never reach the COPY statement"""
+        rows = [{"event_type": "login"}, {"x); DROP TABLE users; --": 1}]
+        with pytest.raises(ValueError, match="Unknown columns for user_audit_logs"):
+            DatabaseOptimizer._copy_insert(UserAuditLog, rows)
+        cursor.copy_expert.assert_not_called()
+
+    def test_empty_list_skips_copy(self, cursor: Any) -> Any:
+        """Test no statement is sent for an empty batch"""
+        assert DatabaseOptimizer._copy_insert(UserAuditLog, []) == 0
+        cursor.copy_expert.assert_not_called()
+
+
+class TestSqlitePragmas:
+    """Test suite for DatabaseOptimizer.apply_sqlite_pragmas"""
+
+    def test_pragmas_applied_on_connect(self, tmp_path: Any) -> Any:
+        """Test every new SQLite connection gets the tuned pragmas"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'pragmas.db'}")
+        DatabaseOptimizer.apply_sqlite_pragmas(engine)
+        try:
+            with engine.connect() as connection:
+                pragma = connection.exec_driver_sql
+                assert pragma("PRAGMA journal_mode").scalar() == "wal"
+                # NORMAL
+                assert pragma("PRAGMA synchronous").scalar() == 1
+                assert pragma("PRAGMA cache_size").scalar() == 10000
+                # MEMORY
+                assert pragma("PRAGMA temp_store").scalar() == 2
+        finally:
+            engine.dispose()
+
+    def test_pragmas_are_opt_in(self, app: Any, db_session: Any) -> Any:
+        """Test the durability-relaxing pragmas stay off unless configured"""
+        assert app.config["SQLITE_PERFORMANCE_PRAGMAS"] is False
+        synchronous = db.session.execute(text("PRAGMA synchronous")).scalar()
+        # FULL, SQLite's default
+        assert synchronous == 2
+
+    def test_other_dialects_are_left_alone(self) -> Any:
+        """Test non-SQLite engines get no connect listener"""
+        engine = MagicMock()
+        engine.dialect.name = "postgresql"
+        DatabaseOptimizer.apply_sqlite_pragmas(engine)
+        assert engine.mock_calls == []
+
+
+class _Plain:
+    """Object without to_dict, serialized through str()"""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __str__(self) -> str:
+        return f"<Plain {self.name}>"
+
+
+class _Redacting:
+    """Object whose to_dict honours include_sensitive"""
+
+    def __init__(self, secret: str) -> None:
+        self.secret = secret
+
+    def to_dict(self, include_sensitive: bool = False) -> dict:
+        return {"secret": self.secret if include_sensitive else "***"}
+
+
+class TestTimeFunction:
+    """Test suite for PerformanceMonitor.time_function"""
+
+    @staticmethod
+    def _timed(monkeypatch: Any, name: str, elapsed_ms: float) -> Any:
+        """Decorate a function whose call appears to take elapsed_ms"""
+        ticks = iter([0, int(elapsed_ms * 1e6)])
+        monkeypatch.setattr(time, "perf_counter_ns", lambda: next(ticks))
+
+        def func() -> str:
+            return "done"
+
+        func.__name__ = name
+        return PerformanceMonitor.time_function(func)
+
+    @staticmethod
+    def _samples(name: str) -> tuple:
+        labels = {"function": name}
+        return (
+            REGISTRY.get_sample_value("function_latency_ms_count", labels) or 0,
+            REGISTRY.get_sample_value("function_latency_ms_sum", labels) or 0,
+        )
+
+    def test_each_call_records_one_observation(self, monkeypatch: Any) -> Any:
+        """Test a call adds exactly one latency sample, in milliseconds"""
+        timed = self._timed(monkeypatch, "timed_once", 12.5)
+        count, total = self._samples("timed_once")
+        assert timed() == "done"
+        assert self._samples("timed_once") == (count + 1, total + 12.5)
+
+    @pytest.mark.parametrize(
+        "elapsed_ms, logged",
+        [
+            (PerformanceMonitor.SLOW_CALL_THRESHOLD_MS, False),
+            (PerformanceMonitor.SLOW_CALL_THRESHOLD_MS + 0.5, True),
+        ],
+    )
+    def test_only_slow_calls_are_logged(
+        self, monkeypatch: Any, caplog: Any, elapsed_ms: float, logged: bool
+    ) -> Any:
+        """Test calls at or under the threshold are only recorded, not logged"""
+        timed = self._timed(monkeypatch, "timed_threshold", elapsed_ms)
+        with caplog.at_level("INFO", logger="src.utils"):
+            timed()
+        messages = [record.getMessage() for record in caplog.records]
+        assert bool(messages) is logged
+        if logged:
+            assert messages == [
+                f"Function timed_threshold executed in {elapsed_ms:.2f}ms"
+            ]
+
+
+class TestJsonDefaults:
+    """Test suite for the DataSerializer json.dumps defaults"""
+
+    def test_decimal_round_trip(self) -> Any:
+        """Test a Decimal payload dumps to a float that loads back equal"""
+        payload = {"price": Decimal("12.3456")}
+        dumped = json.dumps(payload, default=DataSerializer.serialize_decimal)
+        assert json.loads(dumped) == {"price": 12.3456}
+
+    def test_datetime_round_trip(self) -> Any:
+        """Test an aware datetime dumps to ISO 8601 and parses back equal"""
+        moment = datetime(2024, 5, 1, 12, 30, 15, 250, tzinfo=timezone.utc)
+        dumped = json.dumps({"at": moment}, default=DataSerializer.serialize_datetime)
+        assert datetime.fromisoformat(json.loads(dumped)["at"]) == moment
+
+    @pytest.mark.parametrize(
+        "serializer, value",
+        [
+            (DataSerializer.serialize_decimal, datetime(2024, 5, 1)),
+            (DataSerializer.serialize_decimal, date(2024, 5, 1)),
+            (DataSerializer.serialize_datetime, Decimal("1.5")),
+            (DataSerializer.serialize_datetime, date(2024, 5, 1)),
+            (DataSerializer.serialize_decimal, {1, 2}),
+            (DataSerializer.serialize_datetime, object()),
+        ],
+    )
+    def test_other_types_are_rejected(self, serializer: Any, value: Any) -> Any:
+        """Test each entry point only accepts the type it is named for"""
+        with pytest.raises(TypeError, match="is not JSON serializable"):
+            json.dumps({"value": value}, default=serializer)
+
+
+class TestSerializeModelList:
+    """Test suite for DataSerializer.serialize_model_list"""
+
+    def test_to_dict_is_used_with_include_sensitive(self) -> Any:
+        """Test a single-class list goes through the class's to_dict"""
+        models = [_Redacting("a"), _Redacting("b")]
+        assert DataSerializer.serialize_model_list(models) == [
+            {"secret": "***"},
+            {"secret": "***"},
+        ]
+        assert DataSerializer.serialize_model_list(models, include_sensitive=True) == [
+            {"secret": "a"},
+            {"secret": "b"},
+        ]
+
+    def test_objects_without_to_dict_fall_back_to_str(self) -> Any:
+        """Test the str() fallback is kept for single-class lists"""
+        models = [_Plain("x"), _Plain("y")]
+        assert DataSerializer.serialize_model_list(models) == [
+            "<Plain x>",
+            "<Plain y>",
+        ]
+
+    def test_mixed_classes_serialize_per_item(self) -> Any:
+        """Test each item picks its own serializer in a mixed list"""
+        models = [_Redacting("a"), _Plain("x")]
+        assert DataSerializer.serialize_model_list(models) == [
+            {"secret": "***"},
+            "<Plain x>",
+        ]
+
+    def test_empty_list(self) -> Any:
+        """Test an empty list serializes to an empty list"""
+        assert DataSerializer.serialize_model_list([]) == []
+
+
+class TestCacheManagerPool:
+    """Test suite for the lazily built shared Redis pool"""
+
+    @pytest.fixture
+    def fresh_cache(self, app: Any, monkeypatch: Any) -> Any:
+        monkeypatch.setattr(src.utils, "_redis_pool", None)
+        monkeypatch.setattr(src.utils, "_cache_manager", None)
+        monkeypatch.setitem(app.config, "REDIS_URL", "redis://cache.internal:6380/3")
+
+    def test_pool_uses_app_redis_url(self, fresh_cache: Any) -> Any:
+        """Test the pool is built from the app config on first use"""
+        manager = get_cache_manager()
+        kwargs = src.utils._redis_pool.connection_kwargs
+        assert (kwargs["host"], kwargs["port"], kwargs["db"]) == (
+            "cache.internal",
+            6380,
+            3,
+        )
+        assert manager.redis_client.connection_pool is src.utils._redis_pool
+        assert get_cache_manager() is manager
+
+    def test_managers_share_the_pool(self, fresh_cache: Any) -> Any:
+        """Test a directly built CacheManager reuses the shared pool"""
+        client = CacheManager().redis_client
+        assert client.connection_pool is src.utils._redis_pool
+        assert get_cache_manager().redis_client is client
+
+    def test_missing_config_falls_back_to_default_url(
+        self, app: Any, fresh_cache: Any, monkeypatch: Any
+    ) -> Any:
+        """Test an app without REDIS_URL gets the local default"""
+        monkeypatch.delitem(app.config, "REDIS_URL")
+        get_cache_manager()
+        kwargs = src.utils._redis_pool.connection_kwargs
+        assert (kwargs["host"], kwargs["port"], kwargs["db"]) == ("localhost", 6379, 0)
+
+    def test_outside_app_context_uses_environment(
+        self, fresh_cache: Any, monkeypatch: Any
+    ) -> Any:
+        """Test a worker thread without an app context can still build the pool"""
+        monkeypatch.setenv("REDIS_URL", "redis://worker.internal:6381/5")
+        seen = {}
+
+        def build() -> None:
+            seen["has_app_context"] = has_app_context()
+            seen["kwargs"] = (
+                get_cache_manager().redis_client.connection_pool.connection_kwargs
+            )
+
+        worker = threading.Thread(target=build)
+        worker.start()
+        worker.join()
+        assert seen["has_app_context"] is False
+        kwargs = seen["kwargs"]
+        assert (kwargs["host"], kwargs["port"], kwargs["db"]) == (
+            "worker.internal",
+            6381,
+            5,
+        )
+
+    def test_concurrent_first_use_builds_one_pool(
+        self, fresh_cache: Any, monkeypatch: Any
+    ) -> Any:
+        """Test racing first callers share a single pool"""
+        from_url = redis.ConnectionPool.from_url
+        built = []
+
+        def slow_from_url(*args: Any, **kwargs: Any) -> Any:
+            time.sleep(0.01)
+            built.append(from_url(*args, **kwargs))
+            return built[-1]
+
+        monkeypatch.setattr(redis.ConnectionPool, "from_url", slow_from_url)
+        barrier = threading.Barrier(8)
+        managers = []
+
+        def first_use() -> None:
+            barrier.wait()
+            managers.append(get_cache_manager())
+
+        workers = [threading.Thread(target=first_use) for _ in range(8)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert len(built) == 1
+        assert all(manager is managers[0] for manager in managers)
+
+
+class TestRequestCache:
+    """Test suite for request_cached and clear_request_cache"""
+
+    @pytest.fixture
+    def lookup(self) -> Any:
+        calls: List[tuple] = []
+
+        @request_cached
+        def lookup(*args: Any, **kwargs: Any) -> int:
+            calls.append((args, kwargs))
+            return len(calls)
+
+        lookup.calls = calls
+        return lookup
+
+    def test_memoized_within_a_request(self, app: Any, lookup: Any) -> Any:
+        """Test repeated calls in one request run the function once per key"""
+        with app.test_request_context():
+            assert lookup(1, scale=2, unit="t") == 1
+            assert lookup(1, unit="t", scale=2) == 1
+            assert lookup(2) == 2
+        assert len(lookup.calls) == 2
+
+    def test_not_shared_between_requests(self, app: Any, lookup: Any) -> Any:
+        """Test each request starts empty even though g outlives it here"""
+        # The session fixture keeps one app context pushed, so every request
+        # below reuses it and shares the same g
+        with app.test_request_context():
+            assert lookup(1) == 1
+        assert "_request_cache" not in g
+        with app.test_request_context():
+            assert lookup(1) == 2
+
+    def test_not_memoized_outside_a_request(self, app: Any, lookup: Any) -> Any:
+        """Test a bare app context, as in workers and CLI commands, never memoizes"""
+        results: List[int] = []
+
+        def run() -> None:
+            # A new thread starts with no contexts pushed
+            with app.app_context():
+                results.extend([lookup(1), lookup(1)])
+                results.append("_request_cache" in g)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        assert results == [1, 2, False]
+
+    def test_clear_request_cache(self, app: Any, lookup: Any) -> Any:
+        """Test clearing drops memoized values mid-request"""
+        with app.test_request_context():
+            assert lookup(1) == 1
+            clear_request_cache()
+            assert lookup(1) == 2
+            assert lookup(1) == 2
+
+    def test_unhashable_arguments_bypass_the_cache(self, app: Any, lookup: Any) -> Any:
+        """Test calls with unhashable arguments always run"""
+        with app.test_request_context():
+            assert lookup([1]) == 1
+            assert lookup([1]) == 2
+
+
+class TestBackgroundTaskManager:
+    """Test suite for the in-process background task queue"""
+
+    @pytest.fixture
+    def calls(self, monkeypatch: Any) -> Any:
+        """Register recording handlers for the duration of one test"""
+        calls: List[tuple] = []
+
+        def record(payloads: List[Any]) -> None:
+            app = current_app._get_current_object() if has_app_context() else None
+            calls.append(("test.record", app, payloads))
+
+        def fail(payloads: List[Any]) -> None:
+            calls.append(("test.fail", None, payloads))
+            raise RuntimeError("handler failed")
+
+        monkeypatch.setitem(BackgroundTaskManager._handlers, "test.record", record)
+        monkeypatch.setitem(BackgroundTaskManager._handlers, "test.fail", fail)
+        yield calls
+        BackgroundTaskManager.wait_for_tasks()
+
+    def test_unregistered_task_is_not_queued(self, calls: Any) -> Any:
+        """Test unknown task names are logged and reported as not queued"""
+        assert BackgroundTaskManager.queue_task("test.unknown", value=1) is False
+        BackgroundTaskManager.wait_for_tasks()
+        assert calls == []
+
+    def test_wait_for_tasks_drains_every_payload(self, calls: Any) -> Any:
+        """Test every queued payload reaches its handler before the wait returns"""
+        for value in range(250):
+            assert BackgroundTaskManager.queue_task("test.record", value=value)
+        BackgroundTaskManager.wait_for_tasks()
+        delivered = [payload["value"] for _, _, batch in calls for payload in batch]
+        assert sorted(delivered) == list(range(250))
+        batch_size = BackgroundTaskManager.BATCH_SIZE
+        assert all(len(batch) <= batch_size for *_, batch in calls)
+        assert BackgroundTaskManager._queue.unfinished_tasks == 0
+
+    def test_handler_runs_in_the_queuing_app_context(self, app: Any, calls: Any) -> Any:
+        """Test the worker pushes the app that was current when the task was queued"""
+        BackgroundTaskManager.queue_task("test.record", value=1)
+        BackgroundTaskManager.wait_for_tasks()
+        assert calls == [("test.record", app, [{"value": 1}])]
+
+    def test_task_queued_outside_app_context_runs_without_one(self, calls: Any) -> Any:
+        """Test tasks queued with no current app are run without pushing one"""
+        # The session app context is only active on the main thread
+        thread = threading.Thread(
+            target=BackgroundTaskManager.queue_task, args=("test.record",)
+        )
+        thread.start()
+        thread.join()
+        BackgroundTaskManager.wait_for_tasks()
+        assert calls == [("test.record", None, [{}])]
+
+    def test_failing_handler_does_not_stop_the_worker(self, calls: Any) -> Any:
+        """Test a raising handler is logged and later tasks still run"""
+        BackgroundTaskManager.queue_task("test.fail", value=1)
+        BackgroundTaskManager.queue_task("test.record", value=2)
+        BackgroundTaskManager.wait_for_tasks()
+        assert sorted(name for name, *_ in calls) == ["test.fail", "test.record"]
+        BackgroundTaskManager.queue_task("test.record", value=3)
+        BackgroundTaskManager.wait_for_tasks()
+        assert calls[-1][2] == [{"value": 3}]
+        assert BackgroundTaskManager._worker.is_alive()
+
+    def test_dead_worker_is_restarted(self, calls: Any) -> Any:
+        """Test queuing after the worker has exited starts a new one"""
+        BackgroundTaskManager.queue_task("test.record", value=1)
+        BackgroundTaskManager.wait_for_tasks()
+        dead = threading.Thread(target=lambda: None)
+        dead.start()
+        dead.join()
+        # The previous worker stays blocked on the queue and keeps serving it
+        BackgroundTaskManager._worker = dead
+        BackgroundTaskManager.queue_task("test.record", value=2)
+        BackgroundTaskManager.wait_for_tasks()
+        assert BackgroundTaskManager._worker is not dead
+        assert calls[-1][2] == [{"value": 2}]
+
+    def test_full_queue_runs_the_task_inline(
+        self, app: Any, calls: Any, monkeypatch: Any
+    ) -> Any:
+        """Test a full queue falls back to a synchronous run, not a drop"""
+
+        def put_nowait(item: Any) -> None:
+            raise queue.Full
+
+        with monkeypatch.context() as patched:
+            patched.setattr(BackgroundTaskManager._queue, "put_nowait", put_nowait)
+            assert BackgroundTaskManager.queue_task("test.record", value=1) is True
+            # Already handled before queue_task returned
+            assert calls == [("test.record", app, [{"value": 1}])]
+
+    def test_drain_at_exit_waits_for_the_worker(
+        self, calls: Any, monkeypatch: Any
+    ) -> Any:
+        """Test the exit hook returns only once queued tasks have run"""
+        release = threading.Event()
+
+        def slow(payloads: List[Any]) -> None:
+            release.wait(5)
+            calls.append(("test.slow", payloads))
+
+        monkeypatch.setitem(BackgroundTaskManager._handlers, "test.slow", slow)
+        BackgroundTaskManager.queue_task("test.slow", value=1)
+        threading.Timer(0.05, release.set).start()
+        BackgroundTaskManager.drain_at_exit()
+        assert calls == [("test.slow", [{"value": 1}])]
+
+    def test_drain_at_exit_skips_a_dead_worker(self, monkeypatch: Any) -> Any:
+        """Test the exit hook cannot hang when no worker is left to drain"""
+        join = MagicMock()
+        monkeypatch.setattr(BackgroundTaskManager, "_worker", None)
+        monkeypatch.setattr(BackgroundTaskManager._queue, "join", join)
+        BackgroundTaskManager.drain_at_exit()
+        join.assert_not_called()
+
+
+class TestHealthChecker:
+    """Test suite for HealthChecker database probes and metrics sampling"""
+
+    @pytest.fixture
+    def health_engines(self, monkeypatch: Any) -> Any:
+        engines: dict = {}
+        monkeypatch.setattr(HealthChecker, "_health_engines", engines)
+        yield engines
+        for engine in engines.values():
+            engine.dispose()
+
+    def test_health_engine_is_dedicated_and_reused(self, health_engines: Any) -> Any:
+        """Test probes get their own engine, built once per URL"""
+        engine = HealthChecker._get_health_engine("sqlite://")
+        assert engine is not db.engine
+        assert HealthChecker._get_health_engine("sqlite://") is engine
+        assert list(health_engines) == ["sqlite://"]
+
+    def test_postgres_health_engine_is_single_connection(
+        self, health_engines: Any
+    ) -> Any:
+        """Test the PostgreSQL probe pool never grows or waits past the timeout"""
+        engine = HealthChecker._get_health_engine(
+            "postgresql://health@db.internal/carbonxchange"
+        )
+        assert engine.pool.size() == 1
+        assert engine.pool._max_overflow == 0
+        assert engine.pool._timeout == HealthChecker.HEALTH_CHECK_TIMEOUT_SECONDS
+
+    @pytest.mark.parametrize(
+        "database_url, timeout_arg",
+        [
+            ("postgresql://health@db.internal/carbonxchange", "connect_timeout"),
+            ("sqlite:///health.db", "timeout"),
+        ],
+    )
+    def test_connect_is_bounded_by_probe_timeout(
+        self, health_engines: Any, monkeypatch: Any, database_url: str, timeout_arg: str
+    ) -> Any:
+        """Test opening a probe connection cannot outlast the probe itself"""
+        engine_factory = MagicMock()
+        monkeypatch.setattr(src.utils, "create_engine", engine_factory)
+        HealthChecker._get_health_engine(database_url)
+        connect_args = engine_factory.call_args.kwargs["connect_args"]
+        assert (
+            0 < connect_args[timeout_arg] <= HealthChecker.HEALTH_CHECK_TIMEOUT_SECONDS
+        )
+
+    def test_database_health_reports_response_time(
+        self, app: Any, health_engines: Any, monkeypatch: Any
+    ) -> Any:
+        """Test a working database is reported healthy via the probe engine"""
+        monkeypatch.setattr(time, "time", MagicMock(side_effect=[100.0, 90.0]))
+        result = HealthChecker.check_database_health()
+        assert result["status"] == "healthy"
+        assert result["response_time_ms"] >= 0
+        assert list(health_engines) == [app.config["SQLALCHEMY_DATABASE_URI"]]
+
+    def test_database_health_times_out(
+        self, app: Any, health_engines: Any, monkeypatch: Any
+    ) -> Any:
+        """Test a hung probe is abandoned after the timeout"""
+        release = threading.Event()
+        monkeypatch.setattr(
+            HealthChecker, "_ping_database", staticmethod(lambda engine: release.wait())
+        )
+        monkeypatch.setattr(HealthChecker, "HEALTH_CHECK_TIMEOUT_SECONDS", 0.05)
+        try:
+            result = HealthChecker.check_database_health()
+        finally:
+            # Free the single probe worker for later checks
+            release.set()
+        assert result["status"] == "unhealthy"
+        assert result["error"] == "Database health check timed out"
+
+    def test_database_health_reports_errors(
+        self, app: Any, health_engines: Any, monkeypatch: Any
+    ) -> Any:
+        """Test probe failures are reported rather than raised"""
+
+        def ping(engine: Any) -> None:
+            raise ConnectionError("connection refused")
+
+        monkeypatch.setattr(HealthChecker, "_ping_database", staticmethod(ping))
+        result = HealthChecker.check_database_health()
+        assert result["status"] == "unhealthy"
+        assert result["error"] == "connection refused"
+
+    @pytest.fixture
+    def samples(self, monkeypatch: Any) -> Any:
+        """Feed the metrics sampler from a queue instead of psutil"""
+        background: "queue.Queue" = queue.Queue()
+
+        def sample(cpu_interval: Any = None) -> dict:
+            # A None interval would read psutil's unprimed 0.0
+            assert cpu_interval is not None
+            if cpu_interval == HealthChecker.INITIAL_CPU_INTERVAL_SECONDS:
+                return {"sample": "initial"}
+            assert cpu_interval == HealthChecker.METRICS_INTERVAL_SECONDS
+            return background.get()
+
+        monkeypatch.setattr(HealthChecker, "_sample_system_metrics", sample)
+        monkeypatch.setattr(HealthChecker, "_metrics", None)
+        monkeypatch.setattr(HealthChecker, "_sampler", None)
+        return background
+
+    def test_metrics_served_from_background_snapshot(self, samples: Any) -> Any:
+        """Test the first call samples inline and later calls read the snapshot"""
+        assert HealthChecker.get_system_metrics() == {"sample": "initial"}
+        sampler = HealthChecker._sampler
+        assert sampler.is_alive() and sampler.daemon
+        samples.put({"sample": "background"})
+        deadline = time.monotonic() + 5
+        while HealthChecker._metrics != {"sample": "background"}:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        metrics = HealthChecker.get_system_metrics()
+        assert metrics == {"sample": "background"}
+        assert HealthChecker._sampler is sampler
+        # Callers get a copy, not the shared snapshot
+        metrics["sample"] = "changed"
+        assert HealthChecker._metrics == {"sample": "background"}
+
+    def test_metrics_failure_returns_error(self, monkeypatch: Any) -> Any:
+        """Test a failing first sample is reported rather than raised"""
+
+        def sample(cpu_interval: Any = None) -> dict:
+            raise OSError("no /proc")
+
+        monkeypatch.setattr(HealthChecker, "_sample_system_metrics", sample)
+        monkeypatch.setattr(HealthChecker, "_metrics", None)
+        result = HealthChecker.get_system_metrics()
+        assert result["error"] == "Unable to retrieve system metrics"
+
+
+class _RecordingPipeline:
+    """Pipeline double that records each flush and deletes one key per name"""
+
+    def __init__(self) -> None:
+        self.pending: List[str] = []
+        self.flushes: List[List[str]] = []
+
+    def delete(self, *keys: str) -> None:
+        self.pending.append(list(keys))
+
+    def execute(self) -> List[int]:
+        self.flushes.append([key for keys in self.pending for key in keys])
+        results = [len(keys) for keys in self.pending]
+        self.pending = []
+        return results
+
+
+class TestInvalidatePattern:
+    """Test suite for CacheManager.invalidate_pattern"""
+
+    @pytest.fixture
+    def pipeline(self) -> Any:
+        return _RecordingPipeline()
+
+    @pytest.fixture
+    def cache(self, pipeline: Any) -> Any:
+        client = MagicMock()
+        client.pipeline.return_value = pipeline
+        client.scan_iter.return_value = iter(f"orders:{i}" for i in range(5))
+        return CacheManager(redis_client=client)
+
+    def test_flushes_each_full_batch_and_the_remainder(
+        self, cache: Any, pipeline: Any
+    ) -> Any:
+        """Test batches are sent as they fill, not buffered until the end"""
+        assert cache.invalidate_pattern("orders:*", batch_size=2) == 5
+        assert pipeline.flushes == [
+            ["orders:0", "orders:1"],
+            ["orders:2", "orders:3"],
+            ["orders:4"],
+        ]
+        cache.redis_client.scan_iter.assert_called_once_with(match="orders:*", count=2)
+
+    def test_no_matches_sends_nothing(self, cache: Any, pipeline: Any) -> Any:
+        """Test an empty scan issues no pipeline round trips"""
+        cache.redis_client.scan_iter.return_value = iter(())
+        assert cache.invalidate_pattern("orders:*") == 0
+        assert pipeline.flushes == []
+
+    def test_redis_error_returns_zero(self, cache: Any) -> Any:
+        """Test errors are logged and reported as nothing deleted"""
+        cache.redis_client.scan_iter.side_effect = ConnectionError("down")
+        assert cache.invalidate_pattern("orders:*") == 0
+
+
+class TestRateLimiter:
+    """Test suite for RateLimiter script dispatch"""
+
+    @pytest.fixture
+    def scripts(self) -> Any:
+        client = MagicMock()
+        registered = {
+            source: MagicMock(return_value=0)
+            for source in (_SLIDING_WINDOW_LUA, _FIXED_WINDOW_LUA)
+        }
+        client.register_script.side_effect = registered.__getitem__
+        return RateLimiter(redis_client=client), registered
+
+    def test_scripts_registered_once(self, scripts: Any) -> Any:
+        """Test both window scripts are registered once, on first use"""
+        limiter, _ = scripts
+        limiter.redis_client.register_script.assert_not_called()
+        limiter.is_rate_limited("rl:a", limit=5, window_seconds=60)
+        registered_sources = {
+            call.args[0] for call in limiter.redis_client.register_script.call_args_list
+        }
+        assert registered_sources == {_SLIDING_WINDOW_LUA, _FIXED_WINDOW_LUA}
+        limiter.is_rate_limited("rl:a", limit=5, window_seconds=60)
+        limiter.is_rate_limited("rl:a", limit=5, window_seconds=60, sliding=False)
+        assert limiter.redis_client.register_script.call_count == 2
+
+    def test_shared_client_resolved_at_call_time(self, monkeypatch: Any) -> Any:
+        """Test a limiter built without an app context defers get_cache_manager"""
+        resolve = MagicMock(side_effect=AssertionError("resolved eagerly"))
+        monkeypatch.setattr(src.utils, "get_cache_manager", resolve)
+        built = []
+        worker = threading.Thread(target=lambda: built.append(RateLimiter()))
+        worker.start()
+        worker.join()
+        client = MagicMock()
+        client.register_script.return_value = MagicMock(return_value=1)
+        resolve.side_effect = None
+        resolve.return_value = SimpleNamespace(redis_client=client)
+        assert built[0].is_rate_limited("rl:b", limit=1, window_seconds=60)
+        resolve.assert_called_once_with()
+
+    def test_sliding_window_arguments(self, scripts: Any, monkeypatch: Any) -> Any:
+        """Test the sliding script gets the key, a timestamp, window and limit"""
+        limiter, registered = scripts
+        monkeypatch.setattr(time, "time", lambda: 1700000000.25)
+        registered[_SLIDING_WINDOW_LUA].return_value = 1
+        assert limiter.is_rate_limited("rl:user:1", limit=5, window_seconds=60)
+        registered[_SLIDING_WINDOW_LUA].assert_called_once_with(
+            keys=["rl:user:1"], args=["1700000000.25", 60, 5]
+        )
+        registered[_FIXED_WINDOW_LUA].assert_not_called()
+
+    def test_fixed_window_arguments(self, scripts: Any) -> Any:
+        """Test the fixed script gets the key, window and limit"""
+        limiter, registered = scripts
+        assert not limiter.is_rate_limited(
+            "rl:user:1", limit=5, window_seconds=60, sliding=False
+        )
+        registered[_FIXED_WINDOW_LUA].assert_called_once_with(
+            keys=["rl:user:1"], args=[60, 5]
+        )
+
+    def test_redis_errors_fail_open(self, scripts: Any) -> Any:
+        """Test a Redis failure lets the request through"""
+        limiter, registered = scripts
+        registered[_SLIDING_WINDOW_LUA].side_effect = redis.ConnectionError("down")
+        assert limiter.is_rate_limited("rl:a", limit=1, window_seconds=1) is False
+
+
+class TestRateLimiterScripts:
+    """Test suite running the window scripts on a live Redis"""
+
+    @pytest.fixture
+    def live_limiter(self, app: Any) -> Any:
+        client = redis.Redis.from_url(app.config["REDIS_URL"], decode_responses=True)
+        try:
+            client.ping()
+        except redis.RedisError:
+            pytest.skip("Redis is not reachable")
+        prefix = f"test:ratelimit:{time.time_ns()}"
+        yield RateLimiter(redis_client=client), prefix
+        for key in client.scan_iter(match=f"{prefix}:*"):
+            client.delete(key)
+        client.close()
+
+    def test_fixed_window_counts_and_expires(self, live_limiter: Any) -> Any:
+        """Test the counter allows limit calls and sets the window TTL once"""
+        limiter, prefix = live_limiter
+        key = f"{prefix}:fixed"
+        results = [
+            limiter.is_rate_limited(key, limit=3, window_seconds=60, sliding=False)
+            for _ in range(5)
+        ]
+        assert results == [False, False, False, True, True]
+        assert int(limiter.redis_client.get(key)) == 5
+        assert 0 < limiter.redis_client.ttl(key) <= 60
+
+    def test_sliding_window_trims_old_requests(
+        self, live_limiter: Any, monkeypatch: Any
+    ) -> Any:
+        """Test requests older than the window stop counting toward the limit"""
+        limiter, prefix = live_limiter
+        key = f"{prefix}:sliding"
+        clock = iter([1000.0, 1001.0, 1002.0, 1011.5, 1012.0, 1012.5])
+        monkeypatch.setattr(time, "time", lambda: next(clock))
+        results = [
+            limiter.is_rate_limited(key, limit=2, window_seconds=10) for _ in range(6)
+        ]
+        # By 1011.5 both earlier accepted requests have left the window
+        assert results == [False, False, True, False, False, True]
+        # Rejected requests are not recorded
+        assert limiter.redis_client.zcard(key) == 2
+        assert 0 < limiter.redis_client.ttl(key) <= 10